@@ -0,0 +1,81 @@
+# benchmarks/bench_budget.py
+#
+# Cost of run budgets (explaincode/budget.py) on a tight FOR loop, compiled
+# and in the step interpreter: no budget, a budget that is never reached,
+# and how quickly a runaway WHILE, and a runaway recursion with no loop in
+# it, are stopped.
+#
+#   python benchmarks/bench_budget.py [iterations]
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.budget import Budget, BudgetExceeded
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+LOOP = """ALGORITHM Sum
+INPUT: n
+OUTPUT: total
+STEP 1: Set total ← 0
+STEP 2: FOR i ← 1 to n DO
+STEP 3:     Set total ← total + i
+STEP 4: END FOR
+STEP 5: RETURN total
+END ALGORITHM
+"""
+
+RUNAWAY = """ALGORITHM Spin
+STEP 1: Set x ← 0
+STEP 2: WHILE x >= 0 DO
+STEP 3:     Set x ← x + 1
+STEP 4: END WHILE
+STEP 5: RETURN x
+END ALGORITHM
+"""
+
+RECURSION = """ALGORITHM Fib
+INPUT: n
+STEP 1: IF n < 2 THEN
+STEP 2:     RETURN n
+STEP 3: END IF
+STEP 4: CALL Fib(n - 1) → a
+STEP 5: CALL Fib(n - 2) → b
+STEP 6: RETURN a + b
+END ALGORITHM
+"""
+
+
+def run(source, mode, budget, n=None):
+    tree = ExplainCodeParser().parse(source.splitlines())
+    interpreter = ExplainCodeInterpreter(tree, lambda text: None, lambda prompt: (str(n), True),
+                                         mode=mode, budget=budget)
+    start = time.perf_counter()
+    try:
+        interpreter.run()
+    except BudgetExceeded:
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    iterations = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    for mode, n in (("compiled", iterations), ("step", iterations // 10)):
+        for label, budget in (("no budget", None), ("budget not reached", Budget(max_steps=10 * n, max_seconds=3600))):
+            elapsed = run(LOOP, mode, budget, n)
+            print(f"{mode:9} {label:20} {elapsed:8.3f}s  {elapsed / n * 1e9:8.0f} ns/iteration")
+    for mode in ("compiled", "step"):
+        elapsed = run(RUNAWAY, mode, Budget(max_seconds=0.25))
+        print(f"{mode:9} {'runaway, 0.25s limit':20} {elapsed:8.3f}s")
+    # Only compiled programs CALL themselves without MEMOIZE
+    elapsed = run(RECURSION, "compiled", Budget(max_seconds=0.25), 34)
+    print(f"{'compiled':9} {'recursion, 0.25s':20} {elapsed:8.3f}s")
+    if elapsed > 1:
+        raise AssertionError(f"Fib(34) ran {elapsed:.1f}s past a 0.25s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_dispatch.py
+#
+# Statement dispatch in the step interpreter: the opcode-indexed handler
+# table against a type-string comparison chain (how _execute_body used to
+# pick a branch), on examples/loops_demo.epd with its FOR loop scaled up.
+# Also reports the memory held by one parsed node against the equivalent dict.
+#
+#   python benchmarks/bench_dispatch.py [iterations]
+
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+from explaincode.nodes import NODE_TYPES
+
+
+class ChainInterpreter(ExplainCodeInterpreter):
+    # The previous behaviour: compare the step type against each branch in
+    # turn until one matches.
+    def _execute_body(self, body):
+        chain = [(node.type, getattr(self, '_op_' + node.type)) for node in NODE_TYPES]
+        self._body = body
+        self._stack = []
+        self._try_stack = []
+        self._result = None
+        i = 0
+        while i < len(body):
+            stmt = body[i]
+            t = stmt['type']
+            try:
+                for name, handler in chain:
+                    if t == name:
+                        i = handler(stmt, i)
+                        break
+            except Exception as e:
+                i = self._catch(e, stmt)
+        return self._result
+
+
+def load_program(iterations):
+    with open(os.path.join(ROOT, "examples", "loops_demo.epd"), encoding="utf-8") as f:
+        source = f.read()
+    source = source.replace("FOR i ← 1 to 10 DO", f"FOR i ← 1 to {iterations} DO")
+    return source.splitlines()
+
+
+def run(cls, lines):
+    tree = ExplainCodeParser().parse(lines)
+    interpreter = cls(tree, lambda text: None, lambda prompt: ("5", True), mode="step")
+    start = time.perf_counter()
+    interpreter.run()
+    return time.perf_counter() - start
+
+
+def node_memory(lines, repeat=1000):
+    # Bytes allocated per node for a parsed program, held as nodes and as dicts
+    body = ExplainCodeParser().parse(lines)["body"] * repeat
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [type(stmt)(*[stmt[f] for f in stmt.fields]) for stmt in body]
+    as_nodes = tracemalloc.get_traced_memory()[0] - before
+    before = tracemalloc.get_traced_memory()[0]
+    dicts = [stmt.as_dict() for stmt in body]
+    as_dicts = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return as_nodes / len(nodes), as_dicts / len(dicts)
+
+
+def main():
+    iterations = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    lines = load_program(iterations)
+    for label, cls in (("before (type chain)", ChainInterpreter),
+                       ("after (opcode table)", ExplainCodeInterpreter)):
+        elapsed = run(cls, lines)
+        print(f"{label:24} {elapsed:8.2f}s  {elapsed / iterations * 1e9:8.0f} ns/iteration")
+    per_node, per_dict = node_memory(lines)
+    print(f"{'memory per node':24} {per_node:8.0f} B (dict: {per_dict:.0f} B)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_expr_cache.py
+#
+# Per-iteration cost of the step interpreter with and without the compiled
+# expression cache, on examples/loops_demo.epd with its FOR loop scaled up.
+#
+#   python benchmarks/bench_expr_cache.py [iterations]
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+
+class UncachedInterpreter(ExplainCodeInterpreter):
+    # The previous behaviour: every expression is compiled on every execution.
+    def _code(self, stmt, field, mode="eval"):
+        return compile(stmt[field], "<explaincode>", mode)
+
+    def _eval_args(self, stmt):
+        return [eval(a, self.globals, self.env) for a in stmt['args']]
+
+
+def load_program(iterations):
+    with open(os.path.join(ROOT, "examples", "loops_demo.epd"), encoding="utf-8") as f:
+        source = f.read()
+    source = source.replace("FOR i ← 1 to 10 DO", f"FOR i ← 1 to {iterations} DO")
+    return source.splitlines()
+
+
+def run(cls, lines):
+    tree = ExplainCodeParser().parse(lines)
+    interpreter = cls(tree, lambda text: None, lambda prompt: ("5", True), mode="step")
+    start = time.perf_counter()
+    interpreter.run()
+    return time.perf_counter() - start
+
+
+def main():
+    iterations = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    lines = load_program(iterations)
+    for label, cls in (("before (eval per step)", UncachedInterpreter),
+                       ("after (cached code)", ExplainCodeInterpreter)):
+        elapsed = run(cls, lines)
+        print(f"{label:24} {elapsed:8.2f}s  {elapsed / iterations * 1e9:8.0f} ns/iteration")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_fetch.py
+#
+# FETCH fan-out (explaincode/fetch.py) against a local stub HTTP server that
+# delays every response: an API_CALL program fetching N URLs one at a time
+# with FETCH, and all at once with FETCH ALL, compiled and in the step
+# interpreter, next to the slowest single delay. FETCH ALL runs with the
+# default limit on requests in flight and with no effective limit. Also
+# counts the connections the server accepted, to show keep-alive reuse
+# across runs.
+#
+#   python benchmarks/bench_fetch.py [urls]
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode import fetch
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+ONE_BY_ONE = """API_CALL FetchEach
+INPUT: urls
+STEP 1: LIST bodies ← []
+STEP 2: FOREACH url IN urls DO
+STEP 3:     FETCH url → response
+STEP 4:     APPEND bodies ← response.json()
+STEP 5: END FOREACH
+STEP 6: RETURN bodies
+END API_CALL
+"""
+
+ALL_AT_ONCE = """API_CALL FetchAll
+INPUT: urls
+STEP 1: FETCH ALL urls → responses
+STEP 2: MAP responses WITH x.json() → bodies
+STEP 3: RETURN bodies
+END API_CALL
+"""
+
+
+class Stub(BaseHTTPRequestHandler):
+    # GET /<ms>: replies {"ms": ms} after ms milliseconds, keeping the
+    # connection open
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        Stub.connections += 1
+
+    def do_GET(self):
+        ms = int(self.path.strip("/").split("?")[0])
+        time.sleep(ms / 1000)
+        body = json.dumps({"ms": ms}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(source, mode, urls):
+    tree = ExplainCodeParser().parse(source.splitlines())
+    interpreter = ExplainCodeInterpreter(tree, lambda text: None, lambda prompt: (repr(urls), True), mode=mode)
+    start = time.perf_counter()
+    bodies = interpreter.run()
+    elapsed = time.perf_counter() - start
+    assert [body["ms"] for body in bodies] == [int(url.rsplit("/", 1)[1]) for url in urls]
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = serve()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    rng = random.Random(0)
+    delays = [rng.randint(20, 150) for _ in range(count)]
+    urls = [f"{base}/{ms}" for ms in delays]
+    print(f"{count} URLs, {sum(delays) / 1000:.2f}s of delays in total, slowest {max(delays) / 1000:.3f}s")
+
+    sequential = urls[:50]
+    for mode in ("compiled", "step"):
+        elapsed = run(ONE_BY_ONE, mode, sequential)
+        print(f"{mode:9} FETCH one by one   {elapsed:7.3f}s  ({len(sequential)} URLs)")
+    # With the default limit on requests in flight, then with one
+    # connection per URL
+    for limit in (fetch.MAX_CONNECTIONS, count):
+        fetch.close()
+        fetch.MAX_CONNECTIONS = limit
+        for mode in ("compiled", "step"):
+            for attempt in ("cold", "warm"):
+                before = Stub.connections
+                elapsed = run(ALL_AT_ONCE, mode, urls)
+                print(f"{mode:9} FETCH ALL, {attempt}, limit {limit:4} {elapsed:7.3f}s"
+                      f"  {Stub.connections - before:4} new connections")
+    fetch.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
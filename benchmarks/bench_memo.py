@@ -0,0 +1,66 @@
+# benchmarks/bench_memo.py
+#
+# MEMOIZE (explaincode/memo.py) on the naive recursive Fibonacci: the plain
+# compiled program against the memoized one, compiled and in the step
+# interpreter (where CALLs of the program itself need MEMOIZE), then
+# MEMOIZE(disk=True) run twice from a temporary .epd file, the second run
+# answering from the SQLite tier. Results are checked to be identical.
+#
+#   python benchmarks/bench_memo.py [n]
+
+import os
+import sys
+import time
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+PROGRAM = """ALGORITHM Fib{header}
+INPUT: n
+STEP 1: IF n < 2 THEN
+STEP 2:     RETURN n
+STEP 3: END IF
+STEP 4: CALL Fib(n - 1) → a
+STEP 5: CALL Fib(n - 2) → b
+STEP 6: RETURN a + b
+END ALGORITHM
+"""
+
+
+def run(source, mode, n, filename="<explaincode>"):
+    tree = ExplainCodeParser().parse(source.splitlines())
+    interpreter = ExplainCodeInterpreter(tree, lambda text: None, lambda prompt: (str(n), True), mode=mode,
+                                         filename=filename)
+    start = time.perf_counter()
+    result = interpreter.run()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 27
+    plain, memoized = PROGRAM.format(header=""), PROGRAM.format(header=" MEMOIZE")
+    before, expected = run(plain, "compiled", n)
+    print(f"compiled  Fib({n})  plain   {before:8.4f}s")
+    for mode in ("compiled", "step"):
+        after, result = run(memoized, mode, n)
+        assert result == expected
+        print(f"{mode:9} Fib({n})  MEMOIZE {after:8.4f}s  ({before / after:5.0f}x)")
+
+    # Deep, but inside the default recursion limit
+    big = 900
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "fib.epd")
+        source = PROGRAM.format(header=" MEMOIZE(maxsize=None, disk=True)")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(source)
+        cold, expected = run(source, "compiled", big, filename)
+        warm, result = run(source, "compiled", big, filename)
+        assert result == expected
+        print(f"compiled  Fib({big})  disk cold {cold:8.4f}s  disk warm {warm:8.4f}s")
+
+
+if __name__ == "__main__":
+    main()
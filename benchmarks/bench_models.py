@@ -0,0 +1,67 @@
+# benchmarks/bench_models.py
+#
+# The model registry (explaincode/models.py) with a stub pipeline factory in
+# place of transformers, so it runs offline: examples/sentiment_model.eai is
+# run repeatedly, compiled and in the step interpreter, and the factory must
+# be called exactly once. The stub takes LOAD_SECONDS to "load", so the
+# first run shows the cost every later run skips.
+#
+#   python benchmarks/bench_models.py [runs]
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode import models
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+LOAD_SECONDS = 0.5
+
+
+class StubFactory:
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, name, device):
+        self.loads.append((name, device))
+        time.sleep(LOAD_SECONDS)
+        return self.pipeline
+
+    @staticmethod
+    def pipeline(inputs):
+        # Like a transformers pipeline: one result per text, in a list for a
+        # single text too
+        texts = inputs if isinstance(inputs, list) else [inputs]
+        return [{"label": "NEGATIVE" if "bad" in text else "POSITIVE", "score": 0.99} for text in texts]
+
+
+def run(source, mode, text):
+    tree = ExplainCodeParser().parse(source.splitlines())
+    interpreter = ExplainCodeInterpreter(tree, lambda line: None, lambda prompt: (repr(text), True), mode=mode)
+    start = time.perf_counter()
+    result = interpreter.run()
+    return time.perf_counter() - start, result
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with open(os.path.join(ROOT, "examples", "sentiment_model.eai"), encoding="utf-8") as f:
+        source = f.read()
+    factory = StubFactory()
+    models.registry.clear()
+    models.registry.factory = factory
+    for i in range(runs):
+        for mode, text in (("compiled", "a good day"), ("step", "a bad day")):
+            elapsed, result = run(source, mode, text)
+            assert result[0]["label"] == ("POSITIVE" if mode == "compiled" else "NEGATIVE"), result
+            print(f"run {i + 1}  {mode:9} {elapsed * 1e3:8.2f} ms  {result[0]['label']}")
+    if len(factory.loads) != 1:
+        raise AssertionError(f"the model was loaded {len(factory.loads)} times: {factory.loads}")
+    print(f"loaded once in {runs * 2} runs; registry: {models.registry.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_optimizer.py
+#
+# The -O optimization pass (explaincode/optimizer.py): compiles each example
+# and a program written to exercise every pass with and without it, checks
+# that both versions print and return exactly the same, and reports how the
+# generated code differs and how long each version runs.
+#
+#   python benchmarks/bench_optimizer.py [iterations]
+
+import io
+import os
+import sys
+import time
+import difflib
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.compiler import compile_program
+
+# Inputs for the examples that run without third-party modules
+EXAMPLES = {
+    "data_structures.epd": ["Ada"],
+    "error_handling.epd": [10, 0],
+    "find_max.epd": [[3, 9, 2, 7], 4],
+    "loops_demo.epd": [5],
+    "sum_until_limit.epd": [[4, 8, 15, 16, 23, 42], 30],
+}
+
+PROGRAM = """ALGORITHM Folding
+INPUT: n, rate
+OUTPUT: total
+
+STEP 1: Set seconds ← 2 * 60 * 60
+STEP 2: Set debug ← False
+STEP 3: Set unused ← [1, 2, 3]
+STEP 4: Set total ← 0
+STEP 5: FOR i ← 1 to n DO
+STEP 6:     Set scale ← rate * seconds / (seconds + 1)
+STEP 7:     Set offset ← (rate + 1) ** 2 - rate
+STEP 8:     IF debug THEN
+STEP 9:         PRINT i
+STEP 10:    END IF
+STEP 11:    IF 10 > 2 * 3 THEN
+STEP 12:        Set total ← total + i * scale + offset
+STEP 13:    ELSE
+STEP 14:        Set total ← total - i
+STEP 15:    END IF
+STEP 16: END FOR
+STEP 17: WHILE 1 > 2 DO
+STEP 18:    PRINT "never"
+STEP 19: END WHILE
+STEP 20: RETURN total
+END ALGORITHM
+"""
+
+# Stores the dead-store pass must keep: each changes or binds a name that
+# is read later, though the target as written is not a name
+TARGETS = """ALGORITHM Targets
+INPUT: n
+STEP 1: Set a ← [0, 0]
+STEP 2: Set a[0] ← 5
+STEP 3: Set box ← type("Box", (), {})()
+STEP 4: Set box.size ← 3
+STEP 5: Set p, q ← 1, 2
+STEP 6: Set unused ← 7
+STEP 7: RETURN (a, box.size, p)
+END ALGORITHM
+"""
+
+# A Set step is not hoisted over a call that changes what it reads
+MUTATION = """ALGORITHM Mutation
+INPUT: n
+STEP 1: Set a ← [1, 2, 3]
+STEP 2: FOR i ← 1 to 2 DO
+STEP 3:     Set s ← a + a
+STEP 4:     PRINT a.pop()
+STEP 5:     PRINT s
+STEP 6: END FOR
+STEP 7: RETURN a
+END ALGORITHM
+"""
+
+# Folding inside a comma-separated PRINT or RETURN must not turn it into a
+# parenthesized tuple
+COMMAS = """ALGORITHM Commas
+INPUT: n
+STEP 1: PRINT "Total:", 1 + 1
+STEP 2: PRINT ("pair", 2 * 3)
+STEP 3: RETURN n, 2 ** 3
+END ALGORITHM
+"""
+
+
+def run(program, args):
+    # (return value, printed output, seconds)
+    namespace = {}
+    exec(program["code"], namespace)
+    function = namespace[program["function_name"]]
+    out = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        result = function(*args)
+    return result, out.getvalue(), time.perf_counter() - start
+
+
+def compare(label, source, filename, args):
+    plain = compile_program(source, filename)
+    optimized = compile_program(source, filename, optimize=True)
+    before, after = run(plain, args), run(optimized, args)
+    if before[:2] != after[:2]:
+        raise AssertionError(f"{label}: -O changed the result: {before[:2]!r} != {after[:2]!r}")
+    diff = [line for line in difflib.unified_diff(plain["py_code"].splitlines(), optimized["py_code"].splitlines(),
+                                                  lineterm="", n=0)
+            if line[:1] in "+-" and line[:3] not in ("+++", "---")]
+    print(f"{label:24} same result  {len(diff):3} lines changed"
+          f"  {before[2] * 1e3:9.2f} ms -> {after[2] * 1e3:9.2f} ms")
+    return diff
+
+
+def main():
+    iterations = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    for name, args in EXAMPLES.items():
+        path = os.path.join(ROOT, "examples", name)
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        compare(name, source, path, args)
+    compare("targets (synthetic)", TARGETS, "<targets>", [0])
+    compare("commas (synthetic)", COMMAS, "<commas>", [0])
+    compare("mutation (synthetic)", MUTATION, "<mutation>", [0])
+    diff = compare("folding (synthetic)", PROGRAM, "<folding>", [iterations, 3])
+    print("\n".join("    " + line for line in diff))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_output.py
+#
+# PRINT throughput (explaincode/output.py): a FOR loop printing one line per
+# iteration, to a terminal (a pty, line-buffered like an interactive stdout)
+# and to a file, through the builtin print per line (how both engines used
+# to write) and through StreamSink. With PyQt5 installed, also the IDE pane:
+# QTextEdit.append per line against a ScrollbackSink drained into a
+# QPlainTextEdit.
+#
+#   python benchmarks/bench_output.py [lines]
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.output import CallbackSink, ScrollbackSink, StreamSink
+from explaincode.interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+PROGRAM = """ALGORITHM Lines
+INPUT: n
+OUTPUT: n
+STEP 1: FOR i ← 1 to n DO
+STEP 2:     PRINT i
+STEP 3: END FOR
+STEP 4: RETURN n
+END ALGORITHM
+"""
+
+
+@contextlib.contextmanager
+def terminal():
+    # stdout on a pty, drained by a thread as a terminal would
+    import pty
+    master, slave = pty.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 1 << 16):
+                pass
+        except OSError:
+            pass
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    with open(slave, "w", buffering=1, encoding="utf-8") as stream, contextlib.redirect_stdout(stream):
+        yield
+    os.close(master)
+
+
+@contextlib.contextmanager
+def file():
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+        yield
+
+
+def run(mode, lines, make_sink, target):
+    tree = ExplainCodeParser().parse(PROGRAM.splitlines())
+    with target():
+        interpreter = ExplainCodeInterpreter(tree, gui_input_fn=lambda prompt: (str(lines), True), mode=mode,
+                                             sink=make_sink())
+        start = time.perf_counter()
+        interpreter.run()
+        return time.perf_counter() - start
+
+
+def ide(lines, append_lines):
+    try:
+        from PyQt5.QtWidgets import QApplication, QPlainTextEdit, QTextEdit
+    except ImportError:
+        print("PyQt5 not installed; skipping the IDE pane")
+        return
+    app = QApplication.instance() or QApplication(["bench"])
+    pane = QTextEdit()
+    start = time.perf_counter()
+    for i in range(append_lines):
+        pane.append(str(i))
+    elapsed = time.perf_counter() - start
+    print(f"{'IDE, QTextEdit.append':36} {elapsed:8.2f}s  {elapsed / append_lines * 1e6:8.1f} us/line ({append_lines} lines)")
+
+    pane = QPlainTextEdit()
+    pane.setMaximumBlockCount(10000)
+    sink = ScrollbackSink(500)
+    start = time.perf_counter()
+    for i in range(lines):
+        sink.write(str(i))
+        if i % 10000 == 0:  # a drain per frame at ~600k lines/s
+            pane.appendPlainText(sink.drain())
+    pane.appendPlainText(sink.drain())
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    print(f"{'IDE, ScrollbackSink + pane':36} {elapsed:8.2f}s  {elapsed / lines * 1e6:8.1f} us/line")
+
+
+def main():
+    lines = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    for where, target in (("terminal", terminal), ("file", file)):
+        for mode in ("compiled", "step"):
+            n = lines if mode == "compiled" else lines // 10
+            # The previous behaviour is the builtin print, once per line
+            for label, make_sink in (("print per line", lambda: CallbackSink(print)),
+                                     ("StreamSink", lambda: StreamSink(sys.stdout))):
+                elapsed = run(mode, n, make_sink, target)
+                print(f"{where + ', ' + mode + ', ' + label:36} {elapsed:8.2f}s  {elapsed / n * 1e6:8.2f} us/line"
+                      f" ({n} lines)")
+    ide(lines, 20000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_parser.py
+#
+# Parse throughput of the shared step parser on a generated program with a
+# mix of every common step kind.
+#
+#   python benchmarks/bench_parser.py [steps]
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explaincode.parser import ExplainParser, link_blocks
+
+# One balanced block of steps, repeated to reach the requested size
+BLOCK = [
+    "Set total ← total + {i}",
+    "FOR i ← 1 to n DO",
+    "IF A[i] > best THEN",
+    "Set best ← A[i]",
+    "ELSE",
+    "CONTINUE",
+    "END IF",
+    "END FOR",
+    "FOREACH x IN items DO",
+    "APPEND out ← x * 2",
+    "END FOREACH",
+    "WHILE total < limit DO",
+    "Set total ← total * 2",
+    "END WHILE",
+    "FILTER out WHERE x > {i} → big",
+    "MAP big WITH x + 1 → bigger",
+    "TRY",
+    "GET lookup[\"key\"] → value",
+    "CATCH error",
+    "PRINT error",
+    "END TRY",
+    "CALL helper(total, {i}) → result",
+    "total = total % 7",
+]
+
+
+def generate(steps):
+    lines = ["ALGORITHM Generated", "INPUT: A, n, items, limit"]
+    while len(lines) - 2 < steps:
+        i = len(lines)
+        for j, step in enumerate(BLOCK):
+            lines.append(f"STEP {i + j}: " + step.format(i=i))
+    lines.append("RETURN total")
+    lines.append("END ALGORITHM")
+    return lines
+
+
+def main():
+    steps = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000
+    lines = generate(steps)
+    best = {}
+    for _ in range(5):
+        start = time.perf_counter()
+        tree = ExplainParser().parse(lines)
+        parsed = time.perf_counter()
+        link_blocks(tree["body"])
+        linked = time.perf_counter()
+        best["parse"] = min(best.get("parse", 1e9), parsed - start)
+        best["link blocks"] = min(best.get("link blocks", 1e9), linked - parsed)
+    count = len(tree["body"])
+    print(f"{count} steps")
+    for label, elapsed in best.items():
+        print(f"{label:12} {elapsed * 1000:8.1f} ms  {count / elapsed / 1e6:6.2f} M steps/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_startup.py
+#
+# Cold-start latency of the CLI: `explaincode --help` and running a trivial
+# program, plus importing the interpreter for headless use, each in a fresh
+# Python process with `-X importtime`. Prints the wall
+# time, the total import time and the slowest top-level imports, and whether
+# any heavy module (PyQt5, transformers, torch) was loaded.
+#
+#   python benchmarks/bench_startup.py [runs]
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("PyQt5", "transformers", "torch")
+
+PROGRAM = """ALGORITHM Hello
+STEP 1: Set x ← 1 + 1
+STEP 2: RETURN x
+END ALGORITHM
+"""
+
+
+def run(args):
+    # (wall seconds, {top-level module: cumulative import us}) for one run
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + args,
+                          env=env, input="", capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    imports = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # top level only
+            imports[name.strip()] = int(cumulative)
+    return elapsed, imports
+
+
+def report(label, args, runs):
+    results = [run(args) for _ in range(runs)]
+    elapsed, imports = min(results, key=lambda r: r[0])
+    heavy = [name for name in imports if name.split(".")[0] in HEAVY]
+    print(f"{label:24} {elapsed * 1e3:8.1f} ms wall  {sum(imports.values()) / 1e3:8.1f} ms imports"
+          f"  heavy: {', '.join(heavy) or 'none'}")
+    for name, us in sorted(imports.items(), key=lambda item: -item[1])[:5]:
+        print(f"    {name:30} {us / 1e3:8.1f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        program = os.path.join(tmp, "hello.epd")
+        with open(program, "w", encoding="utf-8") as f:
+            f.write(PROGRAM)
+        report("explaincode --help", ["-m", "explaincode.compiler", "--help"], runs)
+        report("explaincode hello.epd", ["-m", "explaincode.compiler", program, "--no-cache"], runs)
+        report("import interpreter", ["-c", "import explaincode.interpreter"], runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# explaincode/batch.py
+#
+# Batch runner: one program over many input rows on a process pool.
+#
+#     explaincode examples/find_max.epd --batch rows.jsonl --output results.jsonl
+#
+# Rows come from a CSV file (header = input names, values parsed like
+# interactive input) or JSON Lines (an object keyed by input name or a list
+# in INPUT: order). Each worker compiles the program once (through the
+# on-disk cache) and runs every row it is given; results are written as
+# JSON Lines in input order as soon as they are ready:
+#
+#     {"row": 0, "result": 9, "output": []}
+#     {"row": 1, "error": "list index out of range", "type": "IndexError", "output": []}
+#
+# With a budget (--max-steps/--max-seconds/--max-memory), each row gets the
+# full budget; a row that exceeds it reports "type": "BudgetExceeded" and a
+# "budget" object with the kind, limit and amount used.
+
+import os
+import csv
+import sys
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import deps, parallel
+from .budget import Budget, BudgetExceeded
+from .compiler import bind_inputs, call_program, load_program, parse_input
+from .output import ListSink
+
+# Rows sent to a worker at a time
+BATCH_CHUNK_SIZE = 64
+
+_function = None
+_program = None
+_budget = None
+
+
+def read_rows(path):
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                yield {name: parse_input(value) for name, value in row.items()}
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _init_worker(filename, use_cache, limits=None):
+    global _function, _program, _budget
+    parallel.mark_worker()
+    _program = load_program(filename, use_cache=use_cache, budgeted=limits is not None)
+    scope = {}
+    exec(_program["code"], scope)
+    if limits is not None:
+        # Started again for every row (_run_chunk), so each row gets the
+        # whole budget
+        _budget = Budget(**limits)
+    _function = scope[_program["function_name"]]
+
+
+def _run_chunk(start, rows):
+    results = []
+    for offset, row in enumerate(rows):
+        output = ListSink()
+        record = {"row": start + offset}
+        # PRINT output is captured per row rather than interleaved on stdout
+        _function.__globals__["print"] = output.print
+        if _budget is not None:
+            _budget.attach(_function.__globals__)
+        try:
+            record["result"] = call_program(_function, bind_inputs(_program, row))
+        except Exception as e:
+            record["error"] = str(e)
+            record["type"] = type(e).__name__
+            if isinstance(e, BudgetExceeded):
+                record["budget"] = e.to_dict()
+        record["output"] = output.lines
+        results.append(json.dumps(record, default=str))
+    return results
+
+
+def _chunks(rows, size):
+    chunk, start = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield start, chunk
+            start += size
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def run_batch(filename, rows_path, output_path=None, workers=None, use_cache=True, budget=None):
+    # Compile (and cache) once up front so workers start from the cache and
+    # syntax errors and missing modules surface before any row runs
+    program = load_program(filename, use_cache=use_cache, budgeted=budget is not None)
+    deps.ensure(program["requires"], filename)
+    workers = workers or os.cpu_count() or 1
+    limits = budget.limits() if budget is not None else None
+    out = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    count = 0
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(filename, use_cache, limits)) as pool:
+            # A bounded window of chunks in flight keeps memory flat on large
+            # inputs while preserving row order in the output
+            pending = deque()
+            for start, chunk in _chunks(read_rows(rows_path), BATCH_CHUNK_SIZE):
+                pending.append(pool.submit(_run_chunk, start, chunk))
+                if len(pending) >= workers * 2:
+                    count += _write(out, pending.popleft().result())
+            while pending:
+                count += _write(out, pending.popleft().result())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def _write(out, lines):
+    for line in lines:
+        out.write(line + "\n")
+    return len(lines)
@@ -0,0 +1,157 @@
+# explaincode/budget.py
+#
+# Per-run budgets: a maximum number of steps, wall-clock seconds and memory
+# growth, so a runaway WHILE cannot pin a worker forever.
+#
+# Checking every limit on every step would cost more than most steps do, so
+# a run is given an allowance of steps and only calls back (renew) once it
+# has used it up; that is when time and memory are looked at. The step
+# interpreter spends one unit per statement. Compiled programs spend, on
+# every loop iteration, the number of steps in the loop body, and on every
+# call of the program, the number of steps outside its loops (a recursive
+# CALL runs away without any loop), so their step count is the same kind of
+# measure taken at loop and call granularity. Their allowance is a global of
+# the program (_budget_left), so recursive CALLs spend from the same run;
+# the runner starts it with attach().
+#
+# Memory is the growth of the process's resident set size since the run
+# started, so it is only meaningful with one run per process (the batch
+# runner and the server's process workers).
+#
+# A cancellable budget also stops the run, at its next check, once cancel()
+# is called from another thread (the IDE's Stop button).
+
+import os
+import sys
+import time
+
+# Steps between checks of the time and memory limits
+CHECK_EVERY = 1000
+
+
+class BudgetExceeded(RuntimeError):
+    # kind is "steps", "time" or "memory"; limit and used are in steps,
+    # seconds or bytes; step is the STEP running when the limit was found
+    # to be exceeded, if known
+    NAMES = {"steps": "Step", "time": "Time", "memory": "Memory"}
+    UNITS = {"steps": "steps", "time": "s", "memory": "bytes"}
+
+    def __init__(self, kind, limit, used, step=None):
+        self.kind = kind
+        self.limit = limit
+        self.used = used
+        self.step = step
+        used_text = f"{used:.3f}" if kind == "time" else str(used)
+        super().__init__(f"{self.NAMES[kind]} budget exceeded: {used_text} {self.UNITS[kind]} (limit {limit})")
+
+    def to_dict(self):
+        return {"kind": self.kind, "limit": self.limit, "used": self.used, "step": self.step}
+
+
+class Cancelled(BudgetExceeded):
+    # The run was stopped through Budget.cancel()
+    def __init__(self, step=None):
+        RuntimeError.__init__(self, "Run cancelled")
+        self.kind = "cancelled"
+        self.limit = None
+        self.used = None
+        self.step = step
+
+
+class Budget:
+    # Raised through the budget in generated code, which has no import of
+    # its own for it
+    Exceeded = BudgetExceeded
+
+    def __init__(self, max_steps=None, max_seconds=None, max_memory=None, check_every=CHECK_EVERY,
+                 cancellable=False):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_memory = max_memory
+        self.check_every = check_every
+        self.cancellable = cancellable
+        self.cancelled = False
+        self.steps = 0
+        self.started = None
+        self.memory_base = None
+        self.granted = 0
+
+    @property
+    def limited(self):
+        return (self.max_steps is not None or self.max_seconds is not None or self.max_memory is not None
+                or self.cancellable)
+
+    def limits(self):
+        # The constructor arguments, to build the same budget in a worker
+        return {"max_steps": self.max_steps, "max_seconds": self.max_seconds,
+                "max_memory": self.max_memory, "check_every": self.check_every,
+                "cancellable": self.cancellable}
+
+    def cancel(self):
+        # Safe to call from any thread; the run stops at its next check
+        self.cancelled = True
+
+    def start(self):
+        # Begin a run; returns its first allowance of steps
+        self.steps = 0
+        self.started = time.perf_counter()
+        self.memory_base = rss() if self.max_memory is not None else None
+        return self._grant()
+
+    def attach(self, scope):
+        # Begin a run of a program compiled for budgets, whose globals are
+        # scope: its functions spend from this budget
+        scope["_budget"] = self
+        scope["_budget_left"] = self.start()
+
+    def renew(self, left, step=None):
+        # Called when a run's allowance is used up, with what is left of it
+        # (zero or less); raises BudgetExceeded or returns the next allowance
+        self.steps += self.granted - left
+        self.check(step)
+        return self._grant()
+
+    def check(self, step=None):
+        if self.cancelled:
+            raise Cancelled(step)
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise BudgetExceeded("steps", self.max_steps, self.steps, step)
+        if self.max_seconds is not None:
+            elapsed = time.perf_counter() - self.started
+            if elapsed > self.max_seconds:
+                raise BudgetExceeded("time", self.max_seconds, elapsed, step)
+        if self.max_memory is not None:
+            grown = rss() - self.memory_base
+            if grown > self.max_memory:
+                raise BudgetExceeded("memory", self.max_memory, grown, step)
+
+    def _grant(self):
+        if not self.limited:
+            allowance = sys.maxsize
+        else:
+            allowance = self.check_every
+            if self.max_steps is not None:
+                # Come back exactly one step past the limit
+                allowance = max(1, min(allowance, self.max_steps - self.steps + 1))
+        self.granted = allowance
+        return allowance
+
+
+# Used when a run has no budget; it never calls back
+UNLIMITED = Budget()
+
+
+def rss():
+    # Resident set size of this process in bytes; the peak size where the
+    # current one cannot be read, 0 where neither can
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,83 @@
+# explaincode/cache.py
+#
+# On-disk cache of compiled ExplainCode programs, kept next to the source in
+# __pycache__/ the way Python caches bytecode. An entry is only used when the
+# source hash, the compiler version and the Python bytecode magic all match,
+# so editing the file or upgrading either side simply recompiles it.
+
+import os
+import sys
+import glob
+import marshal
+import importlib.util
+
+CACHE_DIR = "__pycache__"
+CACHE_SUFFIX = ".ecc"
+# Results of MEMOIZE(disk=True) programs (memo.py)
+MEMO_SUFFIX = ".memo.sqlite"
+
+
+def source_hash(source):
+    import hashlib  # loads OpenSSL; not needed for --help or --clear-cache
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def cache_path(filename, build=""):
+    # build names the compiler flags ("O", "B", "OBV", ...), so each kind
+    # of build has an entry of its own
+    directory, base = os.path.split(os.path.abspath(filename))
+    name = f"{base}.{sys.implementation.cache_tag}{'.' + build if build else ''}{CACHE_SUFFIX}"
+    return os.path.join(directory, CACHE_DIR, name)
+
+
+def memo_path(filename):
+    directory, base = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIR, base + MEMO_SUFFIX)
+
+
+def load(filename, digest, version, build=""):
+    try:
+        with open(cache_path(filename, build), "rb") as f:
+            magic, cached_version, cached_digest, program = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (magic, cached_version, cached_digest) != (importlib.util.MAGIC_NUMBER, version, digest):
+        return None
+    return program
+
+
+def store(filename, digest, version, program, build=""):
+    path = cache_path(filename, build)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as f:
+            marshal.dump((importlib.util.MAGIC_NUMBER, version, digest, program), f)
+        # Atomic, so concurrent runs never see a half-written entry
+        os.replace(tmp, path)
+    except OSError:
+        # A read-only tree just means running uncached
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def clear(filename):
+    # A directory clears every cached program in it; a file clears its own
+    # entries (for all Python versions). Stored MEMOIZE results go too.
+    if os.path.isdir(filename):
+        patterns = [os.path.join(filename, CACHE_DIR, "*" + suffix) for suffix in (CACHE_SUFFIX, MEMO_SUFFIX)]
+    else:
+        directory, base = os.path.split(os.path.abspath(filename))
+        patterns = [os.path.join(directory, CACHE_DIR, f"{glob.escape(base)}.*{CACHE_SUFFIX}"),
+                    glob.escape(memo_path(filename))]
+    paths = [path for pattern in patterns for path in glob.glob(pattern)]
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
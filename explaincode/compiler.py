@@ -1,221 +1,121 @@
 # explainai_compiler.py
 
-import re
 import sys
 import os
-import ast
-import importlib
 import argparse
 
+from . import cache, deps, optimizer, sourcemap
+from .parser import ExplainParser
+from .models import micro_batching
+from .profiler import StepProfiler
+from .budget import Budget
+from .output import FileSink, StreamSink
+
+# Part of the cache key for compiled programs: bump it whenever the
+# generated code (or what is cached with it) changes, so cached entries are
+# rebuilt.
+COMPILER_VERSION = "2.0.0.12"
+
 # ------------------------------
 # ExplainAI Parser + Compiler
 # ------------------------------
 
-class ExplainAIParser:
-    def __init__(self):
-        self.ast = {
-            "function_name": "",
-            "inputs": [],
-            "body": []
-        }
-
-    def parse(self, lines):
-        lines = [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
-
-        if not lines[0].startswith(("ALGORITHM", "MODEL", "API_CALL")):
-            raise SyntaxError("File must start with ALGORITHM, MODEL, or API_CALL.")
-
-        self.ast["function_name"] = lines[0].split()[1]
-
-        for line in lines[1:]:
-            if line.startswith("INPUT:"):
-                self.ast["inputs"] = [x.strip() for x in line.replace("INPUT:", "").split(",")]
-            elif line.startswith("OUTPUT:"):
-                continue  # Optional
-            elif line.startswith(("END ALGORITHM", "END MODEL", "END API_CALL")):
-                break
-            elif line.startswith("STEP"):
-                step = self._parse_step(line)
-                if step:
-                    self.ast["body"].append(step)
-
-        return self.ast
-
-    def _parse_step(self, line):
-        match = re.match(r"STEP\s+\d+:?\s*(.+)", line)
-        if not match:
-            return None
-        content = match.group(1)
-
-        # === ASSIGNMENT ===
-        if content.startswith("Set"):
-            m = re.match(r"Set\s+(.+?)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "assign", "target": m.group(1), "value": m.group(2)}
-
-        # === IMPORTS ===
-        elif content.startswith("Import"):
-            return {"type": "import", "lib": content.split()[1]}
-
-        elif content.startswith("KEY:"):
-            return {"type": "apikey", "value": content.replace("KEY:", "").strip()}
-
-        # === CONTROL FLOW ===
-        elif content.startswith("FOREACH"):
-            m = re.match(r"FOREACH\s+(\w+)\s+IN\s+(.+?)\s+DO", content)
-            if m:
-                return {"type": "foreach", "var": m.group(1), "iterable": m.group(2)}
-
-        elif content.startswith("FOR"):
-            m = re.match(r"FOR\s+(.+?)\s+←\s+(.+?)\s+to\s+(.+?)\s+DO", content)
-            if m:
-                return {"type": "for", "var": m.group(1), "start": m.group(2), "end": m.group(3)}
-
-        elif content.startswith("WHILE"):
-            condition = content.replace("WHILE", "").replace("DO", "").strip()
-            return {"type": "while", "condition": condition}
-
-        elif content.startswith("IF"):
-            condition = content.replace("IF", "").replace("THEN", "").strip()
-            return {"type": "if", "condition": condition}
-
-        elif content.startswith("END IF"):
-            return {"type": "endif"}
-
-        elif content.startswith("ELSE"):
-            return {"type": "else"}
-
-        elif content.startswith("END FOREACH"):
-            return {"type": "endforeach"}
-
-        elif content.startswith("END FOR"):
-            return {"type": "endfor"}
-
-        elif content.startswith("END WHILE"):
-            return {"type": "endwhile"}
-
-        elif content.startswith("RETURN"):
-            return {"type": "return", "value": content.replace("RETURN", "").strip()}
-
-        elif content.startswith("PRINT"):
-            return {"type": "print", "value": content.replace("PRINT", "").strip()}
-
-        elif content.startswith("BREAK"):
-            return {"type": "break"}
+class ExplainAIParser(ExplainParser):
+    # The compiler emits nested Python blocks, so it needs no jump targets
+    pass
 
-        elif content.startswith("CONTINUE"):
-            return {"type": "continue"}
-
-        # === DATA STRUCTURES ===
-        elif content.startswith("LIST"):
-            m = re.match(r"LIST\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_create", "name": m.group(1), "value": m.group(2)}
-
-        elif content.startswith("DICT"):
-            m = re.match(r"DICT\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "dict_create", "name": m.group(1), "value": m.group(2)}
-
-        elif content.startswith("APPEND"):
-            m = re.match(r"APPEND\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_append", "list_name": m.group(1), "value": m.group(2)}
-
-        elif content.startswith("REMOVE"):
-            m = re.match(r"REMOVE\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_remove", "list_name": m.group(1), "value": m.group(2)}
-
-        elif content.startswith("GET"):
-            m = re.match(r"GET\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "get_value", "source": m.group(1), "target": m.group(2)}
-
-        # === UTILITIES ===
-        elif content.startswith("SORT"):
-            m = re.match(r"SORT\s+(\w+)\s*(?:→\s*(\w+))?", content)
-            if m:
-                return {"type": "sort", "source": m.group(1), "target": m.group(2) or m.group(1)}
-
-        elif content.startswith("FILTER"):
-            m = re.match(r"FILTER\s+(\w+)\s+WHERE\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "filter", "source": m.group(1), "condition": m.group(2), "target": m.group(3)}
-
-        elif content.startswith("MAP"):
-            m = re.match(r"MAP\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "map", "source": m.group(1), "expression": m.group(2), "target": m.group(3)}
-
-        elif content.startswith("REDUCE"):
-            m = re.match(r"REDUCE\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "reduce", "source": m.group(1), "expression": m.group(2), "target": m.group(3)}
-
-        # === ERROR HANDLING ===
-        elif content.startswith("TRY"):
-            return {"type": "try"}
-
-        elif content.startswith("CATCH"):
-            m = re.match(r"CATCH\s+(\w+)", content)
-            error_var = m.group(1) if m else "error"
-            return {"type": "catch", "error_var": error_var}
-
-        elif content.startswith("END TRY"):
-            return {"type": "endtry"}
-
-        # === FUNCTIONS ===
-        elif content.startswith("CALL"):
-            m = re.match(r"CALL\s+(\w+)\((.*?)\)\s*(?:→\s*(\w+))?", content)
-            if m:
-                args = [a.strip() for a in m.group(2).split(",")] if m.group(2) else []
-                return {"type": "call", "func_name": m.group(1), "args": args, "result": m.group(3)}
-
-        # === OOP ===
-        elif content.startswith("CREATE"):
-            m = re.match(r"CREATE\s+(\w+)\s+←\s+(\w+)\((.*?)\)", content)
-            if m:
-                args = [a.strip() for a in m.group(3).split(",")] if m.group(3) else []
-                return {"type": "create_instance", "var": m.group(1), "class_name": m.group(2), "args": args}
-
-        # === AI PIPELINE ===
-        elif content.startswith("LOAD_MODEL"):
-            m = re.match(r"LOAD_MODEL\s+[\"'](.+?)[\"']\s*(?:→\s*(\w+))?", content)
-            if m:
-                return {"type": "load_model", "model_name": m.group(1), "var": m.group(2) or "model"}
-
-        elif content.startswith("PREDICT"):
-            m = re.match(r"PREDICT\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "predict", "input": m.group(1), "output": m.group(2)}
-
-        elif content.startswith("TRAIN"):
-            m = re.match(r"TRAIN\s+(\w+)\s+ON\s+(.+)", content)
-            if m:
-                return {"type": "train", "model": m.group(1), "data": m.group(2)}
-
-        else:
-            return {"type": "raw", "code": content}
 
 class ExplainAICompiler:
-    def __init__(self, ast):
+    def __init__(self, ast, budgeted=False, iteration=None, vectorize=False):
         self.ast = ast
         self.code = []
         self.indent = "    "
         self.level = 0
         self.libs = set()
+        # Names bound to lazy streams, whose FILTER/MAP steps become generators
+        self.streams = set()
+        # Programs with a single-value PREDICT resolve micro-batched
+        # predictions in what they return
+        self.micro_batched = any(s["type"] == "predict" and not s.get("batch") for s in ast["body"])
+        # (source line, STEP) of each generated line, indexed by line
+        # number; None for lines no STEP produced. Filled by compile().
+        self.source_map = []
+        # Emit budget checks (budget.py) in every loop; only code compiled
+        # for budgeted runs pays for them
+        self.budgeted = budgeted
+        # Steps charged to the run's budget per iteration, by loop header
+        self.loop_costs = loop_costs(ast["body"]) if budgeted else {}
+        # API_CALL programs become coroutine functions that await their
+        # FETCH steps (fetch.py)
+        self.is_async = ast.get("kind") == "API_CALL"
+        # Set when compiling the body of a PARALLEL FOREACH into its worker
+        # function (parallel_loop): {outer list: index of its values in
+        # what each iteration returns}
+        self.iteration = iteration
+        # Loops open at the current step, to tell a CONTINUE of the
+        # iteration from one of a nested loop
+        self.loops = 0
+        # Module-level constants: the worker sources of PARALLEL FOREACH loops
+        self.constants = []
+        # FILTER/MAP steps go through vector.py, which runs element-wise
+        # expressions over arrays and large numeric lists with NumPy, as the
+        # step interpreter's vectorize option does
+        self.vectorize = vectorize
+        # MEMOIZE programs look their inputs up in _memo (memo.py) on entry
+        # and store what every RETURN returns
+        self.memoized = ast.get("memoize") is not None and iteration is None
 
     def compile(self):
         fn = self.ast["function_name"]
         args = ", ".join(self.ast["inputs"])
-        self.code.append(f"def {fn}({args}):")
+        self.code.append(f"{'async ' if self.is_async else ''}def {fn}({args}):")
         self.level += 1
-
-        for stmt in self.ast["body"]:
-            self._emit(stmt)
-
-        return "\n".join(sorted(self.libs)) + "\n\n" + "\n".join(self.code)
+        if self.budgeted:
+            # The run's budget and its allowance are globals the runner
+            # replaces (Budget.attach), shared by recursive CALLs; loops
+            # spend from the allowance and only call the budget when that
+            # is used up
+            self.libs.add("from explaincode.budget import UNLIMITED as _budget")
+            if "_budget_left = _budget.start()" not in self.constants:
+                self.constants.append("_budget_left = _budget.start()")
+            self.code.append(f"{self.indent}global _budget_left")
+            # Each call spends its steps outside loops, so recursion is
+            # charged as loops are
+            self._charge(max(1, self.loop_costs[None]), None)
+
+        if self.iteration is not None:
+            # What the iteration APPENDs to lists outside the loop
+            self.code.append(f"{self.indent}_appended = ({'[], ' * len(self.iteration)})")
+        if self.memoized:
+            # Inline rather than a wrapper, so recursive CALLs hit the cache
+            # without an extra frame per level
+            self.code.append(f"{self.indent}_key = ({args},)" if args else f"{self.indent}_key = ()")
+            self.code.append(f"{self.indent}_cached = _memo.lookup(_key)")
+            self.code.append(f"{self.indent}if _cached is not _memo.MISS:")
+            self.code.append(f"{self.indent * 2}return _cached")
+
+        positions = [None] * len(self.code)
+        body = self.ast["body"]
+        i = 0
+        while i < len(body):
+            stmt = body[i]
+            if stmt["type"] == "foreach" and stmt.get("parallel") and self.iteration is None:
+                i = self._parallel(i)
+            else:
+                self._emit(stmt)
+            positions += [(stmt.get("line"), stmt.get("step"))] * (len(self.code) - len(positions))
+            i += 1
+        if self.iteration is not None:
+            self.code.append(f"{self.indent}return _appended")
+            positions.append(None)
+        if self.memoized:
+            self.libs.add("from explaincode.memo import memoize")
+            self.code.append(f"_memo = memoize({fn}{self._memoize_args()})")
+            positions.append(None)
+
+        header = "\n".join(sorted(self.libs) + self.constants) + "\n\n"
+        self.source_map = [None] * (header.count("\n") + 1) + positions
+        return header + "\n".join(self.code)
 
     def _emit(self, stmt):
         indent = self.indent * self.level
@@ -227,7 +127,6 @@ class ExplainAICompiler:
         # === IMPORTS ===
         elif stmt["type"] == "import":
             self.libs.add(f"import {stmt['lib']}")
-            self._try_import(stmt['lib'])
 
         elif stmt["type"] == "apikey":
             self.code.append(f"{indent}api_key = '{stmt['value']}'")
@@ -236,45 +135,71 @@ class ExplainAICompiler:
         elif stmt["type"] == "for":
             self.code.append(f"{indent}for {stmt['var']} in range({stmt['start']}, {stmt['end']}+1):")
             self.level += 1
+            self.loops += 1
+            self._spend(stmt)
 
         elif stmt["type"] == "foreach":
+            # A PARALLEL FOREACH nested in another runs serially in its worker
             self.code.append(f"{indent}for {stmt['var']} in {stmt['iterable']}:")
             self.level += 1
+            self.loops += 1
+            self._spend(stmt)
 
         elif stmt["type"] == "endfor" or stmt["type"] == "endforeach":
+            self._close_block()
             self.level -= 1
+            self.loops -= 1
 
         elif stmt["type"] == "while":
             self.code.append(f"{indent}while {stmt['condition']}:")
             self.level += 1
+            self.loops += 1
+            self._spend(stmt)
 
         elif stmt["type"] == "endwhile":
+            self._close_block()
             self.level -= 1
+            self.loops -= 1
 
         elif stmt["type"] == "if":
             self.code.append(f"{indent}if {stmt['condition']}:")
             self.level += 1
 
         elif stmt["type"] == "else":
+            self._close_block()
             self.level -= 1
             indent = self.indent * self.level
             self.code.append(f"{indent}else:")
             self.level += 1
 
         elif stmt["type"] == "endif":
+            self._close_block()
             self.level -= 1
 
         elif stmt["type"] == "print":
             self.code.append(f"{indent}print({stmt['value']})")
 
         elif stmt["type"] == "return":
-            self.code.append(f"{indent}return {stmt['value']}")
+            if stmt['value'] in self.streams:
+                value = f"list({stmt['value']})"
+            elif self.micro_batched:
+                self.libs.add("from explaincode.models import resolve")
+                value = f"resolve({stmt['value']})"
+            else:
+                value = stmt['value']
+            if self.memoized:
+                value = f"_memo.store(_key, {value})"
+            self.code.append(f"{indent}return {value}")
 
         elif stmt["type"] == "break":
             self.code.append(f"{indent}break")
 
         elif stmt["type"] == "continue":
-            self.code.append(f"{indent}continue")
+            if self.iteration is not None and not self.loops:
+                # Ends this iteration of the PARALLEL FOREACH
+                self.code.append(f"{indent}return _appended")
+            else:
+                self.code.append(f"{indent}continue")
 
         elif stmt["type"] == "comment":
             self.code.append(f"{indent}# {stmt['text']}")
@@ -287,7 +212,10 @@ class ExplainAICompiler:
             self.code.append(f"{indent}{stmt['name']} = {stmt['value']}")
 
         elif stmt["type"] == "list_append":
-            self.code.append(f"{indent}{stmt['list_name']}.append({stmt['value']})")
+            if self.iteration is not None and stmt['list_name'] in self.iteration:
+                self.code.append(f"{indent}_appended[{self.iteration[stmt['list_name']]}].append({stmt['value']})")
+            else:
+                self.code.append(f"{indent}{stmt['list_name']}.append({stmt['value']})")
 
         elif stmt["type"] == "list_remove":
             self.code.append(f"{indent}{stmt['list_name']}.remove({stmt['value']})")
@@ -300,29 +228,63 @@ class ExplainAICompiler:
             self.code.append(f"{indent}{stmt['target']} = sorted({stmt['source']})")
 
         elif stmt["type"] == "filter":
-            cond = stmt['condition'].replace('x', '_x')
-            self.code.append(f"{indent}{stmt['target']} = [_x for _x in {stmt['source']} if {cond}]")
+            if self.vectorize and stmt['source'] not in self.streams:
+                self.libs.add("from explaincode.vector import compiled_filter")
+                self.code.append(f"{indent}{stmt['target']} = compiled_filter({stmt['source']}, "
+                                 f"{stmt['condition']!r}, {{**globals(), **locals()}}, lambda x: {stmt['condition']})")
+                self.streams.discard(stmt['target'])
+            else:
+                items = f"x for x in {stmt['source']} if {stmt['condition']}"
+                self.code.append(f"{indent}{stmt['target']} = {self._sequence(stmt, items)}")
 
         elif stmt["type"] == "map":
-            expr = stmt['expression'].replace('x', '_x')
-            self.code.append(f"{indent}{stmt['target']} = [{expr} for _x in {stmt['source']}]")
+            if self.vectorize and stmt['source'] not in self.streams:
+                self.libs.add("from explaincode.vector import compiled_map")
+                self.code.append(f"{indent}{stmt['target']} = compiled_map({stmt['source']}, "
+                                 f"{stmt['expression']!r}, {{**globals(), **locals()}}, lambda x: {stmt['expression']})")
+                self.streams.discard(stmt['target'])
+            else:
+                items = f"{stmt['expression']} for x in {stmt['source']}"
+                self.code.append(f"{indent}{stmt['target']} = {self._sequence(stmt, items)}")
 
         elif stmt["type"] == "reduce":
             self.libs.add("from functools import reduce")
             self.code.append(f"{indent}{stmt['target']} = reduce(lambda acc, x: {stmt['expression']}, {stmt['source']})")
 
+        # === STREAMS ===
+        elif stmt["type"] == "stream":
+            if stmt['lines']:
+                self.libs.add("from explaincode.stream import read_lines")
+                self.code.append(f"{indent}{stmt['target']} = read_lines({stmt['source']})")
+            else:
+                self.code.append(f"{indent}{stmt['target']} = iter({stmt['source']})")
+            self.streams.add(stmt['target'])
+
+        elif stmt["type"] == "collect":
+            self.code.append(f"{indent}{stmt['target']} = list({stmt['source']})")
+            self.streams.discard(stmt['target'])
+
         # === ERROR HANDLING ===
         elif stmt["type"] == "try":
             self.code.append(f"{indent}try:")
             self.level += 1
 
         elif stmt["type"] == "catch":
+            self._close_block()
             self.level -= 1
             indent = self.indent * self.level
-            self.code.append(f"{indent}except Exception as {stmt['error_var']}:")
+            if self.budgeted:
+                # A budget stops the run; TRY/CATCH cannot catch it
+                self.code.append(f"{indent}except _budget.Exceeded:")
+                self.code.append(f"{indent}{self.indent}raise")
+            self.code.append(f"{indent}except Exception as _error:")
             self.level += 1
+            # Bind the message, as the step interpreter does; an ``as`` name
+            # would also be unbound again after the except block.
+            self.code.append(f"{indent}{self.indent}{stmt['error_var']} = str(_error)")
 
         elif stmt["type"] == "endtry":
+            self._close_block()
             self.level -= 1
 
         # === FUNCTIONS ===
@@ -340,43 +302,420 @@ class ExplainAICompiler:
 
         # === AI PIPELINE ===
         elif stmt["type"] == "load_model":
-            self.libs.add("from transformers import pipeline")
-            self.code.append(f"{indent}{stmt['var']} = pipeline('{stmt['model_name']}')")
+            self.libs.add("from explaincode.models import load_model")
+            self.code.append(f"{indent}{stmt['var']} = load_model('{stmt['model_name']}')")
 
         elif stmt["type"] == "predict":
-            self.code.append(f"{indent}{stmt['output']} = model({stmt['input']})")
+            if stmt['batch']:
+                self.libs.add("from explaincode.models import predict_batch")
+                self.code.append(f"{indent}{stmt['output']} = predict_batch(model, {stmt['input']})")
+            else:
+                self.libs.add("from explaincode.models import predict")
+                self.code.append(f"{indent}{stmt['output']} = predict(model, {stmt['input']})")
 
         elif stmt["type"] == "train":
             self.code.append(f"{indent}# Training {stmt['model']} on {stmt['data']}")
             self.code.append(f"{indent}{stmt['model']}.fit({stmt['data']})")
 
+        # === HTTP ===
+        elif stmt["type"] == "fetch":
+            name = "fetch_all" if stmt['all'] else "fetch"
+            if self.is_async:
+                self.libs.add(f"from explaincode.fetch import {name}")
+                self.code.append(f"{indent}{stmt['target']} = await {name}({stmt['source']})")
+            else:
+                self.libs.add(f"from explaincode.fetch import {name}_blocking")
+                self.code.append(f"{indent}{stmt['target']} = {name}_blocking({stmt['source']})")
+
         elif stmt["type"] == "raw":
             self.code.append(f"{indent}{stmt['code']}")
 
-    def _try_import(self, module):
+    def _parallel(self, i):
+        # The PARALLEL FOREACH at body[i]: its body becomes a worker function
+        # (a module-level source string), mapped over the items on a process
+        # pool; what each iteration printed and appended is replayed here in
+        # item order. Returns the index of the loop's END FOREACH.
+        stmt = self.ast["body"][i]
+        loop = parallel_loop(self.ast, i)
+        name = f"_parallel_{i}"
+        self.constants.append(f"{name} = {loop['source']!r}")
+        self.libs.add("from explaincode.parallel import parallel_foreach")
+        shared = ", ".join(f"{n!r}: {n}" for n in loop["shared"])
+        indent = self.indent * self.level
+        self.code.append(f"{indent}for _printed, _appended in parallel_foreach({name}, {stmt['iterable']}, {{{shared}}}):")
+        self.level += 1
+        self._spend(stmt)
+        indent = self.indent * self.level
+        self.code.append(f"{indent}for _line in _printed:")
+        self.code.append(f"{indent}{self.indent}print(_line)")
+        for k, target in enumerate(loop["appends"]):
+            self.code.append(f"{indent}{target}.extend(_appended[{k}])")
+        self.level -= 1
+        return loop["end"]
+
+    def _memoize_args(self):
+        options = self.ast["memoize"]
+        args = f", maxsize={options['maxsize']!r}" if "maxsize" in options else ""
+        if options.get("disk"):
+            # Stored results are keyed by the program's steps, so editing it
+            # invalidates them
+            steps = repr([(self.ast["inputs"], self.ast["function_name"])]
+                         + [(stmt["type"], [stmt[name] for name in stmt.fields]) for stmt in self.ast["body"]])
+            args += f", disk={cache.source_hash(steps)[:16]!r}"
+        return args
+
+    def _spend(self, stmt):
+        # First lines of a loop body: charge the iteration to the budget
+        if self.budgeted:
+            self._charge(self.loop_costs[id(stmt)], stmt.get('step'))
+
+    def _charge(self, cost, step):
+        indent = self.indent * self.level
+        self.code.append(f"{indent}_budget_left -= {cost}")
+        self.code.append(f"{indent}if _budget_left <= 0: _budget_left = _budget.renew(_budget_left, {step!r})")
+
+    def _close_block(self):
+        # A block nothing was emitted into (no steps, only comments, or all
+        # of them optimized away) still needs a statement
+        header = self.indent * (self.level - 1)
+        for line in reversed(self.code):
+            if line.strip().startswith("#"):
+                continue
+            if line.endswith(":") and len(line) - len(line.lstrip()) == len(header):
+                self.code.append(f"{header}{self.indent}pass")
+            return
+
+    def _sequence(self, stmt, items):
+        # A generator when reading from a stream (and the target becomes one),
+        # a list otherwise
+        if stmt['source'] in self.streams:
+            self.streams.add(stmt['target'])
+            return f"({items})"
+        self.streams.discard(stmt['target'])
+        return f"[{items}]"
+
+def parallel_loop(ast, start):
+    # The worker function for the PARALLEL FOREACH at ast["body"][start]:
+    #   source   Python source defining _iteration(<loop variable>), which
+    #            returns a tuple of the values it appended to each list in
+    #            appends
+    #   shared   variables from outside the loop the body reads
+    #   appends  lists outside the loop the body APPENDs to, collected
+    #   end      index of the loop's END FOREACH
+    # Steps whose effect could not be brought back from a worker, or would
+    # depend on the order iterations run in, are a SyntaxError: assigning or
+    # changing a variable from outside the loop (including through a method
+    # call, which may change it in place), and setting a variable the steps
+    # after the loop read.
+    body = ast["body"]
+    loop = body[start]
+    end = _loop_end(body, start)
+    inner = body[start + 1:end]
+
+    outside = set(ast["inputs"])
+    for stmt in body[:start] + body[end + 1:]:
+        if stmt["type"] in optimizer.STORES:
+            outside.add(stmt[optimizer.STORES[stmt["type"]]])
+    local = {loop["var"]}
+    for stmt in inner:
+        if stmt["type"] in optimizer.STORES and stmt["type"] not in ("list_append", "list_remove"):
+            local.add(stmt[optimizer.STORES[stmt["type"]]])
+        elif stmt["type"] == "raw":
+            local |= _raw_stores(stmt)[0]
+
+    # Modules the body may call functions of, which are not shared data
+    modules = set()
+    for stmt in body:
+        if stmt["type"] == "import":
+            modules.add(stmt["lib"].split(".")[0])
+        elif stmt["type"] == "raw":
+            modules |= _raw_imports(stmt)
+    read_after = set()
+    for stmt in body[end + 1:]:
+        read_after |= _names_read(stmt)
+    for name in sorted((local - outside) & read_after):
+        _parallel_error(loop, f"PARALLEL FOREACH sets {name}, which is read after the loop; iterations run"
+                              " in worker processes, so its value is not kept")
+
+    appends = []
+    loops = 0
+    for stmt in inner:
+        t = stmt["type"]
+        if t in ("return", "train") or (t == "break" and not loops):
+            _parallel_error(stmt, f"{t.upper()} inside PARALLEL FOREACH")
+        if t in ("for", "foreach", "while"):
+            loops += 1
+        elif t in ("endfor", "endforeach", "endwhile"):
+            loops -= 1
+        if t == "list_append" and stmt["list_name"] not in local:
+            if stmt["list_name"] not in appends:
+                appends.append(stmt["list_name"])
+        elif t == "list_remove" and stmt["list_name"] not in local:
+            _parallel_error(stmt, f"REMOVE from {stmt['list_name']}, which is shared between iterations")
+        elif t == "raw":
+            names, shared = _raw_stores(stmt)
+            for name in sorted((names & outside) | (shared - local)):
+                _parallel_error(stmt, f"changes {name}, which is shared between iterations")
+        elif t in optimizer.STORES and stmt[optimizer.STORES[t]] in outside and stmt[optimizer.STORES[t]] != loop["var"]:
+            _parallel_error(stmt, f"assigns {stmt[optimizer.STORES[t]]}, which is shared between iterations;"
+                                  " APPEND to a list instead")
+        for name in sorted(_method_bases(stmt) - local - modules):
+            _parallel_error(stmt, f"calls a method of {name}, which is shared between iterations;"
+                                  " changes it makes would be lost")
+
+    iteration = {"function_name": "_iteration", "kind": "ALGORITHM", "inputs": [loop["var"]], "body": inner}
+    compiler = ExplainAICompiler(iteration, iteration={name: k for k, name in enumerate(appends)})
+    # Modules imported anywhere in the program, which the body may use
+    compiler.libs.update(f"import {stmt['lib']}" for stmt in body if stmt["type"] == "import")
+    source = compiler.compile()
+    shared = _global_names(source)
+    for name in appends:
+        if name in shared:
+            _parallel_error(loop, f"PARALLEL FOREACH reads {name}, which it also appends to")
+    return {"source": source, "shared": sorted(shared), "appends": appends, "end": end}
+
+
+def _loop_end(body, start):
+    depth = 0
+    for j in range(start + 1, len(body)):
+        t = body[j]["type"]
+        if t in ("for", "foreach", "while"):
+            depth += 1
+        elif t in ("endfor", "endforeach", "endwhile"):
+            if depth == 0:
+                return j
+            depth -= 1
+    _parallel_error(body[start], "PARALLEL FOREACH without END FOREACH")
+
+
+def _raw_stores(stmt):
+    # (names a raw step binds, names outside it whose contents it changes
+    # through item or attribute assignment, global or nonlocal)
+    import ast
+    try:
+        tree = ast.parse(stmt["code"])
+    except SyntaxError:
+        return set(), set()
+    names, changed = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            changed.update(node.names)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            base = node.value
+            while isinstance(base, (ast.Subscript, ast.Attribute)):
+                base = base.value
+            if isinstance(base, ast.Name):
+                changed.add(base.id)
+    return names, changed - names
+
+
+def _trees(stmt):
+    # Python syntax trees of what a step runs: a raw step's code, or the
+    # expressions in its fields
+    import ast
+    if stmt["type"] == "raw":
+        texts, mode = [stmt["code"]], "exec"
+    else:
+        store = optimizer.STORES.get(stmt["type"])
+        texts, mode = [], "eval"
+        for name in stmt.fields:
+            value = stmt[name]
+            if name != store:
+                texts += [text for text in (value if isinstance(value, list) else [value]) if isinstance(text, str)]
+    trees = []
+    for text in texts:
         try:
-            importlib.import_module(module)
-        except ImportError:
-            os.system(f"pip install {module}")
+            trees.append(ast.parse(text.strip(), mode=mode))
+        except SyntaxError:
+            pass
+    return trees
+
+
+# The names FILTER, MAP and REDUCE bind for their expression (lambda x: ...,
+# lambda acc, x: ...), which are not variables of the program
+BOUND_NAMES = {"filter": {"x"}, "map": {"x"}, "reduce": {"acc", "x"}}
+
+
+def _names_read(stmt):
+    import ast
+    names = set()
+    for tree in _trees(stmt):
+        names |= {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    if stmt["type"] in BOUND_NAMES:
+        # The source is evaluated outside the lambda, so its x is a real read
+        names -= BOUND_NAMES[stmt["type"]] - _expression_names(stmt["source"])
+    return names
+
+
+def _expression_names(text):
+    import ast
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, AttributeError):
+        return set()
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def _method_bases(stmt):
+    # Variables a step calls a method of (items.pop(), d[k].update(...)),
+    # other than builtins
+    import ast
+    import builtins
+    bases = set()
+    for tree in _trees(stmt):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                base = node.func.value
+                while isinstance(base, (ast.Subscript, ast.Attribute)):
+                    base = base.value
+                if isinstance(base, ast.Name):
+                    bases.add(base.id)
+    return bases - set(dir(builtins))
+
+
+def _raw_imports(stmt):
+    # Names a raw step binds to modules
+    import ast
+    return {(alias.asname or alias.name).split(".")[0] for tree in _trees(stmt) for node in ast.walk(tree)
+            if isinstance(node, (ast.Import, ast.ImportFrom)) for alias in node.names}
+
+
+def _global_names(source):
+    # Names the worker function (and comprehensions and lambdas in it)
+    # read from its globals, less the module's own names and builtins
+    import builtins
+    import symtable
+    module = symtable.symtable(source, "<parallel>", "exec")
+    own = {symbol.get_name() for symbol in module.get_symbols() if symbol.is_assigned() or symbol.is_imported()}
+    names = set()
+    tables = list(module.get_children())
+    while tables:
+        table = tables.pop()
+        names.update(symbol.get_name() for symbol in table.get_symbols() if symbol.is_global())
+        tables.extend(table.get_children())
+    return names - own - set(dir(builtins))
+
+
+def _parallel_error(stmt, message):
+    raise SyntaxError(f"STEP {stmt.get('step', '?')}: {message}")
+
+
+def loop_costs(body):
+    # {id(loop header): steps in its body, not counting nested loop bodies,
+    # plus the header itself; None: steps outside loops}
+    costs = {None: 0}
+    loops = []
+    for stmt in body:
+        if loops:
+            costs[id(loops[-1])] += 1
+        elif stmt["type"] not in ("for", "foreach", "while"):
+            costs[None] += 1
+        if stmt["type"] in ("for", "foreach", "while"):
+            costs[id(stmt)] = 1
+            loops.append(stmt)
+        elif stmt["type"] in ("endfor", "endforeach", "endwhile") and loops:
+            loops.pop()
+    return costs
 
 # ------------------------------
 # Runner
 # ------------------------------
 
-def run_explainai(filename, save_python=False, verbose=False):
+def compile_program(source, filename="<explaincode>", optimize=False, budgeted=False, vectorize=False):
+    ast_tree = ExplainAIParser().parse(source.splitlines())
+    if optimize:
+        ast_tree = optimizer.optimize(ast_tree)
+    compiler = ExplainAICompiler(ast_tree, budgeted, vectorize=vectorize)
+    py_code = compiler.compile()
+    return {
+        "function_name": ast_tree["function_name"],
+        "inputs": ast_tree["inputs"],
+        "filename": filename,
+        "source_map": compiler.source_map,
+        "labels": {stmt["step"]: stmt["type"] for stmt in ast_tree["body"]},
+        # Checked by deps.ensure before a run, never at compile time
+        "requires": deps.requirements(ast_tree),
+        "py_code": py_code,
+        # Positions in the code object are .epd lines, so tracebacks and
+        # profilers point at STEPs
+        "code": sourcemap.compile_mapped(py_code, compiler.source_map, source.splitlines(),
+                                         filename, ast_tree.get("line", 1)),
+    }
+
+
+def load_program(filename, use_cache=True, optimize=False, budgeted=False, vectorize=False):
+    # Compiled with the absolute path, so tracebacks, source maps and the
+    # MEMOIZE disk tier find the file from any working directory, whichever
+    # run put the program in the cache
+    filename = os.path.abspath(filename)
+    with open(filename, "r", encoding="utf-8") as f:
+        source = f.read()
+    if not use_cache:
+        return compile_program(source, filename, optimize, budgeted, vectorize)
+
+    digest = cache.source_hash(source)
+    build = ("O" if optimize else "") + ("B" if budgeted else "") + ("V" if vectorize else "")
+    program = cache.load(filename, digest, COMPILER_VERSION, build)
+    if program is None:
+        program = compile_program(source, filename, optimize, budgeted, vectorize)
+        cache.store(filename, digest, COMPILER_VERSION, program, build)
+    return program
+
+
+def parse_input(text):
+    # Input values are Python literals when they parse as one, strings otherwise
+    import ast  # only needed once there are inputs; keeps it off the startup path
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return text
+
+
+def bind_inputs(program, inputs):
+    # Arguments for the program's function from a dict keyed by input name
+    # or a list in INPUT: order
+    names = [name for name in program["inputs"] if name]
+    if inputs is None:
+        inputs = {}
+    if isinstance(inputs, dict):
+        missing = [name for name in names if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing inputs: {', '.join(missing)}")
+        return [inputs[name] for name in names]
+    if isinstance(inputs, list):
+        if len(inputs) != len(names):
+            raise ValueError(f"Expected {len(names)} inputs ({', '.join(names)}), got {len(inputs)}")
+        return inputs
+    raise ValueError("Inputs must be an object or a list")
+
+
+# co_flags bit of ``async def`` functions (inspect.CO_COROUTINE, without
+# importing inspect)
+CO_COROUTINE = 0x80
+
+
+def call_program(function, args):
+    # Calls a compiled program's function. API_CALL programs are coroutine
+    # functions, run to completion on the thread's event loop (fetch.py).
+    if function.__code__.co_flags & CO_COROUTINE:
+        from .fetch import run
+        return run(function(*args))
+    return function(*args)
+
+
+def run_explainai(filename, save_python=False, verbose=False, use_cache=True, predict_batch_size=None,
+                  profiler=None, optimize=False, budget=None, sink=None, memo_stats=False, vectorize=False):
     if not filename.endswith(".eai") and not filename.endswith(".epd"):
         raise ValueError("Only .eai or .epd files are supported.")
     if not os.path.exists(filename):
         raise FileNotFoundError(f"{filename} does not exist.")
 
-    with open(filename, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    parser = ExplainAIParser()
-    ast_tree = parser.parse(lines)
-
-    compiler = ExplainAICompiler(ast_tree)
-    py_code = compiler.compile()
+    program = load_program(filename, use_cache=use_cache, optimize=optimize, budgeted=budget is not None,
+                           vectorize=vectorize)
+    deps.ensure(program["requires"], filename)
+    py_code = program["py_code"]
 
     if verbose:
         print("\n🔧 Generated Python Code:\n")
@@ -386,22 +725,57 @@ def run_explainai(filename, save_python=False, verbose=False):
         py_filename = os.path.splitext(os.path.basename(filename))[0] + "_compiled.py"
         with open(py_filename, "w", encoding="utf-8") as f:
             f.write(py_code)
-        print(f"💾 Python source saved to {py_filename}")
+        map_filename = os.path.splitext(py_filename)[0] + ".map.json"
+        sourcemap.save(map_filename, filename, program["source_map"])
+        print(f"💾 Python source saved to {py_filename} (source map: {map_filename})")
 
-    print(f"\n📥 Enter values for: {', '.join(ast_tree['inputs'])}")
+    print(f"\n📥 Enter values for: {', '.join(program['inputs'])}")
     user_inputs = []
-    for var in ast_tree['inputs']:
-        val = input(f"→ {var} = ")
-        try:
-            user_inputs.append(ast.literal_eval(val))
-        except:
-            user_inputs.append(val)
-
-    exec_globals = {}
+    for var in program['inputs']:
+        user_inputs.append(parse_input(input(f"→ {var} = ")))
+
+    # PRINT output goes through a sink (output.py), stdout in batches by
+    # default
+    if sink is None:
+        sink = StreamSink(sys.stdout)
+    exec_globals = {"print": sink.print}
     print("\n🚀 Running...\n")
-    exec(py_code, exec_globals)
-    result = exec_globals[ast_tree["function_name"]](*user_inputs)
+    exec(program["code"], exec_globals)
+    if budget is not None:
+        budget.attach(exec_globals)
+    function = exec_globals[program["function_name"]]
+    steps = sourcemap.steps_by_line(program["source_map"])
+    try:
+        with sink, micro_batching(predict_batch_size):
+            if profiler is None:
+                result = call_program(function, user_inputs)
+            else:
+                profiler.labels.update(program["labels"])
+                profiler.lines.update({step: line for line, step in steps.items()})
+                with profiler.tracing(function, steps):
+                    result = call_program(function, user_inputs)
+    except Exception as e:
+        raise sourcemap.annotate(e, program["filename"], steps)
+    finally:
+        sink.close()
     print("\n✅ Output:", result)
+    if memo_stats:
+        from .memo import format_stats
+        memo = getattr(function, "memo", None)
+        print("\n🗃️ " + (format_stats(program["function_name"], memo.stats()) if memo else "Not a MEMOIZE program"),
+              file=sys.stderr)
+
+def check_deps(filename, use_cache=True):
+    # Print the pre-flight report; the exit status is 1 if anything is missing
+    requires = load_program(filename, use_cache=use_cache)["requires"]
+    found = deps.check(requires)
+    for name, origin in found.items():
+        print(f"{'✅' if origin else '❌'} {name:24} {origin or 'not found'}")
+    for name in requires["models"]:
+        print(f"🤖 model {name}")
+    if not found:
+        print("✅ No imports")
+    return 1 if None in found.values() else 0
 
 # ------------------------------
 # Entry Point
@@ -412,13 +786,63 @@ def main():
     parser.add_argument("filename", help="The .eai or .epd file to run")
     parser.add_argument("-s", "--save", action="store_true", help="Save the generated Python code to a file")
     parser.add_argument("-v", "--verbose", action="store_true", help="Print the generated Python code")
+    parser.add_argument("-b", "--batch", metavar="ROWS", help="Run once per input row from a .csv or .jsonl file, in parallel, writing JSON Lines results")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write PRINT output (with --batch: the results) to FILE instead of stdout")
+    parser.add_argument("-w", "--workers", type=int, help="With --batch: number of worker processes (default: one per core)")
+    parser.add_argument("-O", "--optimize", action="store_true", help="Fold constants, drop unreachable steps and unused literal assignments, and hoist loop-invariant Set steps before compiling")
+    parser.add_argument("--vectorize", action="store_true", help="Run FILTER/MAP steps with element-wise expressions through NumPy, over arrays and large numeric lists (their results are then arrays)")
+    parser.add_argument("--predict-batch-size", type=int, metavar="N", help="Queue single PREDICT calls and send them to the model N at a time")
+    parser.add_argument("--no-cache", action="store_true", help="Compile from source without reading or writing the compiled-program cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Remove cached compiled programs for the file (or directory) and exit")
+    parser.add_argument("--check-deps", action="store_true", help="Report whether every imported module (and the LOAD_MODEL backend) can be found, without importing or running anything")
+    parser.add_argument("--lock", action="store_true", help="Check dependencies and record the result in FILE.lock, so later runs skip the check")
+    parser.add_argument("--vendor", metavar="DIR", help="Resolve imported modules from DIR first")
+    parser.add_argument("--max-steps", type=int, metavar="N", help="Stop the run with an error after N steps (compiled programs count loop iterations times the steps in each loop body)")
+    parser.add_argument("--max-seconds", type=float, metavar="S", help="Stop the run with an error after S seconds of wall time")
+    parser.add_argument("--max-memory", type=float, metavar="MB", help="Stop the run with an error once the process has grown by MB megabytes")
+    parser.add_argument("--memo-stats", action="store_true", help="For a MEMOIZE program: report cache hits and misses (in memory and on disk) after the run")
+    parser.add_argument("--profile", action="store_true", help="Report hits, wall time and allocations per STEP after the run")
+    parser.add_argument("--profile-out", metavar="FILE", help="With --profile: also write the profile as JSON (FILE.speedscope.json for speedscope)")
     
     args = parser.parse_args()
 
+    if args.clear_cache:
+        removed = cache.clear(args.filename)
+        print(f"🧹 Removed {removed} cached program(s)")
+        return
+
+    if args.vendor:
+        # Through the environment, so batch and server workers inherit it
+        os.environ["EXPLAINCODE_VENDOR"] = deps.use_vendor(args.vendor)
+
     try:
-        run_explainai(args.filename, save_python=args.save, verbose=args.verbose)
+        if args.check_deps:
+            sys.exit(check_deps(args.filename, use_cache=not args.no_cache))
+        if args.lock:
+            path = deps.write_lock(args.filename, load_program(args.filename, use_cache=not args.no_cache)["requires"])
+            print(f"🔒 Wrote {path}")
+            return
+        budget = Budget(args.max_steps, args.max_seconds,
+                        int(args.max_memory * 1024 * 1024) if args.max_memory is not None else None)
+        budget = budget if budget.limited else None
+        if args.batch:
+            from .batch import run_batch
+            count = run_batch(args.filename, args.batch, args.output, args.workers, use_cache=not args.no_cache,
+                              budget=budget)
+            print(f"✅ {count} rows", file=sys.stderr)
+            return
+        profiler = StepProfiler() if args.profile or args.profile_out else None
+        run_explainai(args.filename, save_python=args.save, verbose=args.verbose, use_cache=not args.no_cache, predict_batch_size=args.predict_batch_size, profiler=profiler, optimize=args.optimize, budget=budget,
+                      sink=FileSink(args.output) if args.output else None, memo_stats=args.memo_stats,
+                      vectorize=args.vectorize)
+        if profiler is not None:
+            print("\n⏱️ Profile:\n" + profiler.report(), file=sys.stderr)
+            if args.profile_out:
+                profiler.save(args.profile_out, os.path.basename(args.filename))
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        location = getattr(e, "explaincode_location", None)
+        where = f" ({sourcemap.describe(location)})" if location else ""
+        print(f"❌ Error: {str(e)}{where}")
         sys.exit(1)
 
 if __name__ == "__main__":
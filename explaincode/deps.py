@@ -0,0 +1,134 @@
+# explaincode/deps.py
+#
+# Dependency pre-flight. Every Import and LOAD_MODEL in a program is
+# collected at compile time and checked in one pass with find_spec, which
+# locates a module without importing it, before the program runs. Nothing is
+# ever installed at run time; a missing module fails the run up front with
+# the full list.
+#
+# A lockfile (<program>.lock, written by `explaincode --lock`) records the
+# result of a successful check for one Python environment. While it matches
+# the program and the environment, runs skip probing entirely. With a vendor
+# directory (--vendor DIR or EXPLAINCODE_VENDOR), modules are resolved from
+# DIR first, so a program can run from a self-contained, pinned tree.
+
+import os
+import sys
+import json
+import importlib.util
+
+LOCK_SUFFIX = ".lock"
+
+# Module that backs LOAD_MODEL with the default model factory
+MODEL_BACKEND = "transformers"
+
+
+class MissingDependencyError(ImportError):
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"Missing modules: {', '.join(missing)} "
+                         f"(install them, e.g. pip install {' '.join(_top(name) for name in missing)})")
+
+
+def requirements(ast):
+    # {"modules": [...], "models": [...]} named by a parsed program, in order
+    modules = []
+    models = []
+    for stmt in ast["body"]:
+        if stmt["type"] == "import" and stmt["lib"] not in modules:
+            modules.append(stmt["lib"])
+        elif stmt["type"] == "load_model" and stmt["model_name"] not in models:
+            models.append(stmt["model_name"])
+    return {"modules": modules, "models": models}
+
+
+def modules_needed(requires):
+    # The modules a run needs, including the model backend when LOAD_MODEL
+    # goes through the default transformers factory
+    from . import models
+    modules = list(requires["modules"])
+    if requires["models"] and models.registry.factory is models.transformers_pipeline:
+        if MODEL_BACKEND not in modules:
+            modules.append(MODEL_BACKEND)
+    return modules
+
+
+def find(name):
+    # Where a module would be imported from, or None if it cannot be found.
+    # Only the top-level package is located: finding a submodule would
+    # import its parent package.
+    top = _top(name)
+    if top in sys.modules:
+        return getattr(sys.modules[top], "__file__", None) or "built-in"
+    try:
+        spec = importlib.util.find_spec(top)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    return spec.origin or "namespace"
+
+
+def check(requires):
+    # {module: origin or None} for every module a run needs
+    return {name: find(name) for name in modules_needed(requires)}
+
+
+def use_vendor(directory):
+    directory = os.path.abspath(directory)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+        importlib.invalidate_caches()
+    return directory
+
+
+def lock_path(filename):
+    return filename + LOCK_SUFFIX
+
+
+def environment():
+    return {"python": sys.version, "executable": sys.executable,
+            "vendor": os.environ.get("EXPLAINCODE_VENDOR")}
+
+
+def write_lock(filename, requires):
+    # Check now and record the result; raises if anything is missing
+    found = check(requires)
+    missing = [name for name, origin in found.items() if origin is None]
+    if missing:
+        raise MissingDependencyError(missing)
+    lock = dict(environment(), requires=requires, modules=found)
+    path = lock_path(filename)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(lock, f, indent=2)
+    return path
+
+
+def _locked(filename, requires):
+    try:
+        with open(lock_path(filename), "r", encoding="utf-8") as f:
+            lock = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (lock.get("requires") == requires
+            and all(lock.get(key) == value for key, value in environment().items()))
+
+
+def ensure(requires, filename=None):
+    # Pre-flight before a run: nothing to do when the program imports
+    # nothing or a matching lockfile exists, one find_spec per module
+    # otherwise
+    if not requires["modules"] and not requires["models"]:
+        return
+    vendor = os.environ.get("EXPLAINCODE_VENDOR")
+    if vendor:
+        use_vendor(vendor)
+    if filename is not None and _locked(filename, requires):
+        return
+    missing = [name for name, origin in check(requires).items() if origin is None]
+    if missing:
+        raise MissingDependencyError(missing)
+
+
+def _top(name):
+    return name.split(".")[0]
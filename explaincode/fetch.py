@@ -0,0 +1,270 @@
+# explaincode/fetch.py
+#
+# HTTP for FETCH steps: a small asyncio HTTP/1.1 client on the standard
+# library, so API_CALL programs need no extra dependency.
+#
+# API_CALL programs compile to ``async def`` functions and await
+# fetch()/fetch_all(); FETCH ALL starts every request at once and waits for
+# all of them, so fanning out to hundreds of endpoints takes about as long as
+# the slowest one. Other programs, and the step interpreter, use the
+# blocking forms, which run the same coroutines to completion.
+#
+# Requests share one Client per event loop: at most MAX_CONNECTIONS requests
+# in flight, each limited to TIMEOUT seconds, and connections are kept alive
+# and reused per (scheme, host, port) for up to KEEPALIVE_SECONDS idle.
+# Runs on the same thread share an event loop (run()), so keep-alive carries
+# over from one run to the next in the server's and batch runner's workers.
+
+import json
+import time
+import asyncio
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+# Requests in flight at once, per client
+MAX_CONNECTIONS = 100
+
+# Seconds for a whole request: connecting, sending and reading the response
+TIMEOUT = 30.0
+
+# Seconds an idle connection is kept for reuse
+KEEPALIVE_SECONDS = 15.0
+
+USER_AGENT = "ExplainCode/2.0"
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class FetchError(OSError):
+    # A response that could not be read as HTTP
+    pass
+
+
+class Response:
+    __slots__ = ("url", "status", "reason", "headers", "body")
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        # Names in lower case
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    @property
+    def text(self):
+        charset = "utf-8"
+        for param in self.headers.get("content-type", "").split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "charset" and value:
+                charset = value.strip('"')
+        return self.body.decode(charset, errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f"<Response {self.status} {self.url}>"
+
+
+class Client:
+    def __init__(self, limit=MAX_CONNECTIONS, timeout=TIMEOUT, keepalive=KEEPALIVE_SECONDS):
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self._slots = asyncio.Semaphore(limit)
+        # (scheme, host, port) -> [(reader, writer, idle since)], most
+        # recently used last
+        self._idle = {}
+        self._ssl = None
+
+    async def get(self, url):
+        return await self.request("GET", url)
+
+    async def request(self, method, url, body=None, headers=None):
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._request(method, url, body, headers), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{method} {url} timed out after {self.timeout}s") from None
+
+    async def fetch_all(self, urls):
+        # Responses in the order of urls. The first failure cancels the
+        # requests still running and is raised.
+        tasks = [asyncio.ensure_future(self.get(url)) for url in urls]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def close(self):
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, writer, _ in connections:
+                writer.close()
+
+    async def _request(self, method, url, body, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {url!r}")
+        key = (scheme, parts.hostname, parts.port or DEFAULT_PORTS[scheme])
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}", f"User-Agent: {USER_AGENT}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+        while True:
+            reader, writer, reused = await self._connect(key)
+            try:
+                writer.write(request)
+                response, reusable = await self._read(reader, url, method)
+            except (ConnectionError, asyncio.IncompleteReadError, FetchError):
+                writer.close()
+                # A kept-alive connection the server has since closed: try
+                # once more on a new one
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if reusable:
+                self._idle.setdefault(key, []).append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+            return response
+
+    async def _connect(self, key):
+        # (reader, writer, reused) for key, from the idle pool if it has a
+        # live connection
+        connections = self._idle.get(key)
+        now = time.monotonic()
+        while connections:
+            reader, writer, since = connections.pop()
+            if now - since < self.keepalive and not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        ssl = self._ssl_context() if scheme == "https" else None
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl)
+        return reader, writer, False
+
+    def _ssl_context(self):
+        if self._ssl is None:
+            import ssl
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    @staticmethod
+    async def _read(reader, url, method):
+        # (response, whether the connection can be reused for another)
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError(f"Connection closed before a response from {url}")
+        try:
+            version, status, *reason = status_line.decode("latin-1").split(None, 2)
+            status = int(status)
+        except ValueError:
+            raise FetchError(f"Bad status line from {url}: {status_line[:80]!r}") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        reason = reason[0].strip() if reason else ""
+        connection = headers.get("connection", "").lower()
+        reusable = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+        if method == "HEAD" or status < 200 or status in (204, 304):
+            body = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            body = await _read_chunked(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            # Delimited by the server closing the connection
+            body = await reader.read()
+            reusable = False
+        return Response(url, status, reason, headers, body), reusable
+
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            # Trailers, up to the blank line
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+# The shared client of each event loop
+_clients = weakref.WeakKeyDictionary()
+
+
+def client():
+    # The running event loop's client, created on first use with the limits
+    # set in this module at the time
+    loop = asyncio.get_running_loop()
+    shared = _clients.get(loop)
+    if shared is None:
+        shared = _clients[loop] = Client(MAX_CONNECTIONS, TIMEOUT, KEEPALIVE_SECONDS)
+    return shared
+
+
+async def fetch(url):
+    return await client().get(url)
+
+
+async def fetch_all(urls):
+    return await client().fetch_all(list(urls))
+
+
+# One event loop per thread for run() and the blocking forms
+_local = threading.local()
+
+
+def run(coroutine):
+    # Runs a coroutine (an API_CALL program's call) to completion on this
+    # thread's event loop
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coroutine)
+
+
+def fetch_blocking(url):
+    return run(fetch(url))
+
+
+def fetch_all_blocking(urls):
+    return run(fetch_all(urls))
+
+
+def close():
+    # Closes this thread's event loop and its pooled connections
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        return
+    shared = _clients.pop(loop, None)
+    if shared is not None:
+        loop.run_until_complete(shared.close())
+    loop.close()
+    _local.loop = None
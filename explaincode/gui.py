@@ -0,0 +1,245 @@
+# explaincode/gui.py
+#
+# The PyQt5 IDE. Only the explaincode-gui entry point imports this module, so
+# the CLI, server and library use of the interpreter never load Qt.
+#
+# Programs run on a worker QThread, never on the event-loop thread, so the
+# window keeps repainting through long loops and LOAD_MODEL. PRINT output is
+# buffered by the worker and drained into the output pane at most once a
+# frame; INPUT prompts are shown on the UI thread while the worker waits for
+# the reply; Stop cancels the run at its next budget check (budget.py).
+
+import os
+import sys
+import queue
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QTextEdit, QPlainTextEdit, QPushButton,
+    QVBoxLayout, QHBoxLayout, QFileDialog, QLabel, QInputDialog, QCheckBox
+)
+from . import fetch, sourcemap
+from .budget import Budget, Cancelled
+from .output import ScrollbackSink
+from .interpreter import ExplainCodeParser, ExplainCodeInterpreter
+
+# Output is appended to the pane at most this often (ms), however fast the
+# program prints
+OUTPUT_INTERVAL_MS = 16
+
+# Lines kept in the output pane; older ones are dropped
+OUTPUT_MAX_LINES = 10000
+
+# Lines appended per drain. A program printing faster than this has the
+# older lines of each frame replaced by a count, which keeps every frame's
+# work bounded (the pane would scroll them away at once anyway).
+OUTPUT_LINES_PER_DRAIN = 500
+
+
+class RunWorker(QObject):
+    # Runs one program on a QThread. Signals are delivered to the UI thread
+    # queued; output, input replies and Stop are passed the other way
+    # through thread-safe methods.
+    output_ready = pyqtSignal()
+    input_requested = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, lines, mode, filename):
+        super().__init__()
+        self.lines = lines
+        self.mode = mode
+        self.filename = filename
+        self.budget = Budget(cancellable=True)
+        self._replies = queue.Queue()
+        # One output_ready per drain, so a tight PRINT loop queues one
+        # signal rather than one per line
+        self.sink = ScrollbackSink(OUTPUT_LINES_PER_DRAIN, self.output_ready.emit)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            tree = ExplainCodeParser().parse(self.lines)
+            interpreter = ExplainCodeInterpreter(tree, gui_input_fn=self._input, mode=self.mode,
+                                                 filename=self.filename, budget=self.budget, sink=self.sink)
+            result = interpreter.run()
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            location = getattr(e, "explaincode_location", None)
+            where = f" ({sourcemap.describe(location)})" if location else ""
+            self.failed.emit(f"{e}{where}")
+        else:
+            if self.budget.cancelled:
+                self.cancelled.emit()
+            else:
+                self.finished.emit(result)
+        finally:
+            # Each run has its own thread; drop its event loop and pooled
+            # connections with it
+            fetch.close()
+
+    def stop(self):
+        # From the UI thread: cancel at the next check, and release a
+        # pending INPUT prompt
+        self.budget.cancel()
+        self._replies.put(("", False))
+
+    def reply(self, text, ok):
+        self._replies.put((text, ok))
+
+    def take_output(self):
+        return self.sink.drain()
+
+    def _input(self, prompt):
+        self.input_requested.emit(prompt)
+        return self._replies.get()
+
+
+class ExplainCodeApp(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("ExplainCode IDE (PyQt5)")
+        self.setGeometry(200, 200, 900, 600)
+        self.path = None
+        self.run_thread = None
+        self.worker = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.editor = QTextEdit()
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(OUTPUT_MAX_LINES)
+        self.status = QLabel("🔹 Ready")
+        self.step_mode = QCheckBox("🐞 Step-by-step interpreter (debug)")
+
+        load_btn = QPushButton("📂 Open File")
+        self.run_btn = QPushButton("▶️ Run Code")
+        self.stop_btn = QPushButton("⏹️ Stop")
+        self.stop_btn.setEnabled(False)
+
+        load_btn.clicked.connect(self.load_file)
+        self.run_btn.clicked.connect(self.run_code)
+        self.stop_btn.clicked.connect(self.stop_code)
+
+        # Drains the worker's output buffer, once per OUTPUT_INTERVAL_MS
+        self.output_timer = QTimer(self)
+        self.output_timer.setSingleShot(True)
+        self.output_timer.setInterval(OUTPUT_INTERVAL_MS)
+        self.output_timer.timeout.connect(self.drain_output)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.run_btn)
+        buttons.addWidget(self.stop_btn)
+
+        layout.addWidget(self.editor)
+        layout.addWidget(load_btn)
+        layout.addLayout(buttons)
+        layout.addWidget(self.step_mode)
+        layout.addWidget(QLabel("🧠 Output:"))
+        layout.addWidget(self.output)
+        layout.addWidget(self.status)
+
+        self.setLayout(layout)
+
+    def gui_input(self, prompt):
+        val, ok = QInputDialog.getText(self, "Input Required", prompt)
+        return val, ok
+
+    def load_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open ExplainCode", "", "ExplainCode Files (*.epd *.eai)")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                self.editor.setText(f.read())
+            self.path = path
+            self.status.setText(f"📄 Loaded: {os.path.basename(path)}")
+
+    def run_code(self):
+        if self.run_thread is not None:
+            return
+        self.output.clear()
+        mode = "step" if self.step_mode.isChecked() else "compiled"
+        self.worker = RunWorker(self.editor.toPlainText().splitlines(), mode, self.path or "<editor>")
+        self.run_thread = QThread(self)
+        self.worker.moveToThread(self.run_thread)
+        self.run_thread.started.connect(self.worker.run)
+        self.worker.output_ready.connect(self.schedule_output)
+        self.worker.input_requested.connect(self.ask_input)
+        self.worker.finished.connect(self.run_finished)
+        self.worker.failed.connect(self.run_failed)
+        self.worker.cancelled.connect(self.run_cancelled)
+        self.run_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.status.setText("⏳ Running...")
+        self.run_thread.start()
+
+    def stop_code(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.stop_btn.setEnabled(False)
+            self.status.setText("⏳ Stopping...")
+
+    @pyqtSlot()
+    def schedule_output(self):
+        if not self.output_timer.isActive():
+            self.output_timer.start()
+
+    @pyqtSlot()
+    def drain_output(self):
+        if self.worker is not None:
+            text = self.worker.take_output()
+            if text:
+                self.output.appendPlainText(text)
+
+    @pyqtSlot(str)
+    def ask_input(self, prompt):
+        if self.worker is not None:
+            self.worker.reply(*self.gui_input(prompt))
+
+    @pyqtSlot(object)
+    def run_finished(self, result):
+        self.drain_output()
+        if result is not None:
+            self.output.appendPlainText(f"\n✅ Output: {result}")
+        self.end_run("✅ Executed successfully.")
+
+    @pyqtSlot(str)
+    def run_failed(self, message):
+        self.drain_output()
+        self.output.appendPlainText(f"\n❌ Error: {message}")
+        self.end_run("❌ Execution failed.")
+
+    @pyqtSlot()
+    def run_cancelled(self):
+        self.drain_output()
+        self.output.appendPlainText("\n⏹️ Stopped.")
+        self.end_run("⏹️ Stopped.")
+
+    def end_run(self, status):
+        self.run_thread.quit()
+        self.run_thread.wait()
+        self.run_thread = None
+        self.worker = None
+        self.run_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.status.setText(status)
+
+    def closeEvent(self, event):
+        # Stop a running program rather than leaving its thread behind; a
+        # step that never returns (a blocking call) cannot be interrupted
+        if self.run_thread is not None:
+            self.worker.stop()
+            self.run_thread.quit()
+            self.run_thread.wait(2000)
+        super().closeEvent(event)
+
+def main():
+    app = QApplication(sys.argv)
+    window = ExplainCodeApp()
+    window.show()
+    sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    main()
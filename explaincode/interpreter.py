@@ -1,176 +1,76 @@
-import sys
-import os
-import re
+# explaincode/interpreter.py
+#
+# The interpreter core: parse, then run compiled or step by step. It has no
+# GUI dependency, so headless callers never load Qt; the IDE is in gui.py.
+
 import ast
+import sys
 import importlib
-from PyQt5.QtWidgets import (
-    QApplication, QWidget, QTextEdit, QPushButton,
-    QVBoxLayout, QFileDialog, QLabel, QMessageBox, QInputDialog
-)
+import functools
+import time
+import tracemalloc
+from .compiler import ExplainAICompiler, call_program, parallel_loop
+from .parser import ExplainParser, link_blocks
+from .nodes import NODE_TYPES
+from . import deps, sourcemap, vector
+from .output import CallbackSink, StreamSink
+from .budget import UNLIMITED, BudgetExceeded
+from .models import load_model, micro_batching, predict, predict_batch, resolve
+from .stream import is_stream, open_stream
+
 
+# Compiled expressions are shared by every interpreter in the process, so a
+# program run twice (or two programs using the same expressions) only pays
+# for compilation once.
+EXPR_CACHE_SIZE = 4096
 
-class ExplainCodeParser:
-    def __init__(self):
-        self.ast = {
-            "function_name": "",
-            "inputs": [],
-            "body": []
-        }
 
+@functools.lru_cache(maxsize=EXPR_CACHE_SIZE)
+def compile_expr(source, mode="eval"):
+    return compile(source, "<explaincode>", mode)
+
+
+class ExplainCodeParser(ExplainParser):
     def parse(self, lines):
-        lines = [line.strip() for line in lines if line.strip()]
-        if not lines[0].startswith(("ALGORITHM", "MODEL", "API_CALL")):
-            raise SyntaxError("File must start with ALGORITHM, MODEL, or API_CALL.")
-        self.ast["function_name"] = lines[0].split()[1]
-        for line in lines[1:]:
-            if line.startswith("INPUT:"):
-                self.ast["inputs"] = [x.strip() for x in line.replace("INPUT:", "").split(",")]
-            elif line.startswith("OUTPUT:"):
-                continue
-            elif line.startswith(("END ALGORITHM", "END MODEL", "END API_CALL")):
-                break
-            elif line.startswith("STEP"):
-                step = self._parse_step(line)
-                if step:
-                    self.ast["body"].append(step)
-        return self.ast
-
-    def _parse_step(self, line):
-        match = re.match(r"STEP\s+\d+:?\s*(.+)", line)
-        if not match: return None
-        content = match.group(1)
-
-        # === ASSIGNMENT ===
-        if content.startswith("Set"):
-            m = re.match(r"Set\s+(.+?)\s+←\s+(.+)", content)
-            return {"type": "assign", "target": m.group(1), "value": m.group(2)}
-        
-        # === IMPORTS ===
-        elif content.startswith("Import"):
-            return {"type": "import", "lib": content.split()[1]}
-        elif content.startswith("KEY:"):
-            return {"type": "apikey", "value": content.replace("KEY:", "").strip()}
-        
-        # === CONTROL FLOW ===
-        elif content.startswith("FOREACH"):
-            m = re.match(r"FOREACH\s+(\w+)\s+IN\s+(.+?)\s+DO", content)
-            if m:
-                return {"type": "foreach", "var": m.group(1), "iterable": m.group(2)}
-        elif content.startswith("FOR"):
-            m = re.match(r"FOR\s+(\w+)\s+←\s+(\d+)\s+to\s+(.+?)\s+DO", content)
-            if m:
-                return {"type": "for", "var": m.group(1), "start": m.group(2), "end": m.group(3)}
-        elif content.startswith("WHILE"):
-            return {"type": "while", "condition": content.replace("WHILE", "").replace("DO", "").strip()}
-        elif content.startswith("IF"):
-            return {"type": "if", "condition": content.replace("IF", "").replace("THEN", "").strip()}
-        elif content.startswith("ELSE"):
-            return {"type": "else"}
-        elif content.startswith("END IF"):
-            return {"type": "endif"}
-        elif content.startswith("END FOREACH"):
-            return {"type": "endforeach"}
-        elif content.startswith("END FOR"):
-            return {"type": "endfor"}
-        elif content.startswith("END WHILE"):
-            return {"type": "endwhile"}
-        elif content.startswith("RETURN"):
-            return {"type": "return", "value": content.replace("RETURN", "").strip()}
-        elif content.startswith("PRINT"):
-            return {"type": "print", "value": content.replace("PRINT", "").strip()}
-        elif content.startswith("BREAK"):
-            return {"type": "break"}
-        elif content.startswith("CONTINUE"):
-            return {"type": "continue"}
-        
-        # === DATA STRUCTURES ===
-        elif content.startswith("LIST"):
-            m = re.match(r"LIST\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_create", "name": m.group(1), "value": m.group(2)}
-        elif content.startswith("DICT"):
-            m = re.match(r"DICT\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "dict_create", "name": m.group(1), "value": m.group(2)}
-        elif content.startswith("APPEND"):
-            m = re.match(r"APPEND\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_append", "list_name": m.group(1), "value": m.group(2)}
-        elif content.startswith("REMOVE"):
-            m = re.match(r"REMOVE\s+(\w+)\s+←\s+(.+)", content)
-            if m:
-                return {"type": "list_remove", "list_name": m.group(1), "value": m.group(2)}
-        elif content.startswith("GET"):
-            m = re.match(r"GET\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "get_value", "source": m.group(1), "target": m.group(2)}
-        
-        # === UTILITIES ===
-        elif content.startswith("SORT"):
-            m = re.match(r"SORT\s+(\w+)\s*(?:→\s*(\w+))?", content)
-            if m:
-                return {"type": "sort", "source": m.group(1), "target": m.group(2) or m.group(1)}
-        elif content.startswith("FILTER"):
-            m = re.match(r"FILTER\s+(\w+)\s+WHERE\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "filter", "source": m.group(1), "condition": m.group(2), "target": m.group(3)}
-        elif content.startswith("MAP"):
-            m = re.match(r"MAP\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "map", "source": m.group(1), "expression": m.group(2), "target": m.group(3)}
-        elif content.startswith("REDUCE"):
-            m = re.match(r"REDUCE\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "reduce", "source": m.group(1), "expression": m.group(2), "target": m.group(3)}
-        
-        # === ERROR HANDLING ===
-        elif content.startswith("TRY"):
-            return {"type": "try"}
-        elif content.startswith("CATCH"):
-            m = re.match(r"CATCH\s+(\w+)", content)
-            error_var = m.group(1) if m else "error"
-            return {"type": "catch", "error_var": error_var}
-        elif content.startswith("END TRY"):
-            return {"type": "endtry"}
-        
-        # === FUNCTIONS ===
-        elif content.startswith("CALL"):
-            m = re.match(r"CALL\s+(\w+)\((.*?)\)\s*(?:→\s*(\w+))?", content)
-            if m:
-                args = [a.strip() for a in m.group(2).split(",")] if m.group(2) else []
-                return {"type": "call", "func_name": m.group(1), "args": args, "result": m.group(3)}
-        
-        # === OOP ===
-        elif content.startswith("CREATE"):
-            m = re.match(r"CREATE\s+(\w+)\s+←\s+(\w+)\((.*?)\)", content)
-            if m:
-                args = [a.strip() for a in m.group(3).split(",")] if m.group(3) else []
-                return {"type": "create_instance", "var": m.group(1), "class_name": m.group(2), "args": args}
-        
-        # === AI PIPELINE ===
-        elif content.startswith("LOAD_MODEL"):
-            m = re.match(r"LOAD_MODEL\s+[\"'](.+?)[\"']\s*(?:→\s*(\w+))?", content)
-            if m:
-                return {"type": "load_model", "model_name": m.group(1), "var": m.group(2) or "model"}
-        elif content.startswith("PREDICT"):
-            m = re.match(r"PREDICT\s+(.+?)\s+→\s+(\w+)", content)
-            if m:
-                return {"type": "predict", "input": m.group(1), "output": m.group(2)}
-        elif content.startswith("TRAIN"):
-            m = re.match(r"TRAIN\s+(\w+)\s+ON\s+(.+)", content)
-            if m:
-                return {"type": "train", "model": m.group(1), "data": m.group(2)}
-        
-        else:
-            return {"type": "raw", "code": content}
+        tree = super().parse(lines)
+        link_blocks(tree["body"])
+        return tree
 
 
 class ExplainCodeInterpreter:
-    def __init__(self, ast, gui_print_fn=None, gui_input_fn=None):
+    # "compiled" turns the AST into a Python function with ExplainAICompiler
+    # and calls it; "step" walks the AST one statement at a time and is kept
+    # for debugging.
+    MODES = ("compiled", "step")
+
+    def __init__(self, ast, gui_print_fn=None, gui_input_fn=None, mode="compiled", vectorize=False,
+                 predict_batch_size=None, profiler=None, filename="<explaincode>", budget=None, sink=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
         self.ast = ast
         self.env = {}
-        self.output = gui_print_fn or print
+        self.globals = {}
+        # Where PRINT output goes (output.py): the given sink, gui_print_fn
+        # called per line, or stdout in batches
+        if sink is None:
+            sink = CallbackSink(gui_print_fn) if gui_print_fn else StreamSink(sys.stdout)
+        self.sink = sink
+        self.output = sink.write
         self.input_dialog = gui_input_fn or input
+        self.mode = mode
+        # Also run FILTER/MAP over large numeric lists through NumPy, which
+        # makes their results arrays (array sources always are in step
+        # mode); compiled programs are compiled with the same option
+        self.vectorize = vectorize
+        # Queue single PREDICT calls and send them to the model in batches
+        self.predict_batch_size = predict_batch_size
+        # A profiler.StepProfiler to charge time and allocations to STEPs
+        self.profiler = profiler
+        # Reported in tracebacks and error locations
+        self.filename = filename
+        # A budget.Budget limiting steps, time and memory per run
+        self.budget = budget or UNLIMITED
+        self._handlers = [getattr(self, '_op_' + node.type) for node in NODE_TYPES]
 
     def run(self):
         for var in self.ast['inputs']:
@@ -180,285 +80,418 @@ class ExplainCodeInterpreter:
                 self.env[var] = ast.literal_eval(val)
             except:
                 self.env[var] = val
-        return self._execute_body(self.ast['body'])
+        deps.ensure(deps.requirements(self.ast))
+        if self.profiler is not None:
+            self.profiler.describe(self.ast)
+        if self.mode == "step":
+            self._prepare_parallel()
+            if self.ast.get('memoize') is not None:
+                # CALLs of the program itself go to its compiled, memoized
+                # function
+                func = self.env[self.ast['function_name']] = self._compiled_function()[0]
+                if self.budget.limited:
+                    self.budget.attach(func.__globals__)
+        with self.sink, micro_batching(self.predict_batch_size):
+            if self.mode == "compiled":
+                return self._run_compiled()
+            return self._execute_body(self.ast['body'])
+
+    def _run_compiled(self):
+        func, steps = self._compiled_function()
+        if self.budget.limited:
+            self.budget.attach(func.__globals__)
+        args = [self.env[var] for var in self.ast['inputs']]
+        try:
+            if self.profiler is not None:
+                with self.profiler.tracing(func, steps):
+                    return call_program(func, args)
+            return call_program(func, args)
+        except Exception as e:
+            raise sourcemap.annotate(e, self.filename, steps)
+
+    def _compiled_function(self):
+        # (the program's function, its line -> STEP map). The code object is
+        # kept on the AST, so running the same parsed program again skips
+        # code generation and compilation. Budgeted runs use their own
+        # build, with checks in every loop.
+        budgeted = self.budget.limited
+        key = 'compiled' + ('_budgeted' if budgeted else '') + ('_vectorized' if self.vectorize else '')
+        code = self.ast.get(key)
+        if code is None:
+            compiler = ExplainAICompiler(self.ast, budgeted=budgeted, vectorize=self.vectorize)
+            py_code = compiler.compile()
+            code = self.ast[key] = sourcemap.compile_mapped(
+                py_code, compiler.source_map, [], self.filename, self.ast.get('line', 1))
+            self.ast[key + '_steps'] = sourcemap.steps_by_line(compiler.source_map)
+        steps = self.ast[key + '_steps']
+        scope = {"print": self.sink.print}
+        exec(code, scope)
+        return scope[self.ast['function_name']], steps
 
     def _execute_body(self, body):
+        # Each handler runs one statement and returns the index of the next
+        # one; the table is indexed by the node's opcode.
+        handlers = self._handlers
+        self._body = body
+        self._stack = []      # open loops: (type, header index, ...)
+        self._try_stack = []  # open TRY header indexes
+        self._result = None
+        if self.profiler is not None:
+            return self._execute_profiled(body)
+        budget = self.budget
+        left = budget.start()
         i = 0
-        stack = []
-        try_stack = []  # For TRY/CATCH handling
-        
-        while i < len(body):
+        end = len(body)
+        while i < end:
             stmt = body[i]
-            t = stmt['type']
-            
             try:
-                # === ASSIGNMENT ===
-                if t == 'assign':
-                    self.env[stmt['target']] = eval(stmt['value'], {}, self.env)
-                
-                # === IMPORTS ===
-                elif t == 'import':
-                    self._try_import(stmt['lib'])
-                elif t == 'apikey':
-                    self.env['api_key'] = stmt['value']
-                
-                # === OUTPUT ===
-                elif t == 'print':
-                    self.output(str(eval(stmt['value'], {}, self.env)))
-                elif t == 'return':
-                    return eval(stmt['value'], {}, self.env)
-                elif t == 'raw':
-                    exec(stmt['code'], {}, self.env)
-                
-                # === CONDITIONALS ===
-                elif t == 'if':
-                    cond = eval(stmt['condition'], {}, self.env)
-                    if not cond:
-                        skip = 1
-                        while skip and i < len(body):
-                            i += 1
-                            if body[i]['type'] in ('else', 'endif'):
-                                skip -= 1
-                                break
-                        continue
-                elif t == 'else':
-                    while i < len(body) and body[i]['type'] != 'endif':
-                        i += 1
-                elif t == 'endif':
-                    pass
-                
-                # === FOR LOOP ===
-                elif t == 'for':
-                    loop_var = stmt['var']
-                    loop_start = int(eval(stmt['start'], {}, self.env))
-                    loop_end = int(eval(stmt['end'], {}, self.env)) + 1
-                    stack.append(('for', i, loop_var, loop_end))
-                    self.env[loop_var] = loop_start
-                elif t == 'endfor':
-                    _, i_start, loop_var, loop_end = stack[-1]
-                    self.env[loop_var] += 1
-                    if self.env[loop_var] < loop_end:
-                        i = i_start
-                        continue
-                    else:
-                        stack.pop()
-                
-                # === FOREACH LOOP ===
-                elif t == 'foreach':
-                    iterable = eval(stmt['iterable'], {}, self.env)
-                    iterator = iter(iterable)
-                    try:
-                        self.env[stmt['var']] = next(iterator)
-                        stack.append(('foreach', i, stmt['var'], iterator))
-                    except StopIteration:
-                        # Empty iterable, skip to end
-                        while i < len(body) and body[i]['type'] != 'endforeach':
-                            i += 1
-                elif t == 'endforeach':
-                    _, i_start, loop_var, iterator = stack[-1]
-                    try:
-                        self.env[loop_var] = next(iterator)
-                        i = i_start
-                        continue
-                    except StopIteration:
-                        stack.pop()
-                
-                # === WHILE LOOP ===
-                elif t == 'while':
-                    cond = eval(stmt['condition'], {}, self.env)
-                    if cond:
-                        stack.append(('while', i))
-                    else:
-                        while i < len(body) and body[i]['type'] != 'endwhile':
-                            i += 1
-                elif t == 'endwhile':
-                    i = stack[-1][1] - 1
-                    stack.pop()
-                
-                # === BREAK/CONTINUE ===
-                elif t == 'break':
-                    while i < len(body) and body[i]['type'] not in ('endwhile', 'endfor', 'endforeach'):
-                        i += 1
-                    if stack:
-                        stack.pop()
-                elif t == 'continue':
-                    if stack:
-                        loop_type = stack[-1][0]
-                        if loop_type == 'for':
-                            while i < len(body) and body[i]['type'] != 'endfor':
-                                i += 1
-                            i -= 1  # Will be incremented
-                        elif loop_type == 'foreach':
-                            while i < len(body) and body[i]['type'] != 'endforeach':
-                                i += 1
-                            i -= 1
-                        elif loop_type == 'while':
-                            while i < len(body) and body[i]['type'] != 'endwhile':
-                                i += 1
-                            i -= 1
-                
-                # === DATA STRUCTURES ===
-                elif t == 'list_create':
-                    self.env[stmt['name']] = eval(stmt['value'], {}, self.env)
-                elif t == 'dict_create':
-                    self.env[stmt['name']] = eval(stmt['value'], {}, self.env)
-                elif t == 'list_append':
-                    self.env[stmt['list_name']].append(eval(stmt['value'], {}, self.env))
-                elif t == 'list_remove':
-                    self.env[stmt['list_name']].remove(eval(stmt['value'], {}, self.env))
-                elif t == 'get_value':
-                    self.env[stmt['target']] = eval(stmt['source'], {}, self.env)
-                
-                # === UTILITIES ===
-                elif t == 'sort':
-                    self.env[stmt['target']] = sorted(self.env[stmt['source']])
-                elif t == 'filter':
-                    source = self.env[stmt['source']]
-                    cond = stmt['condition']
-                    self.env[stmt['target']] = [x for x in source if eval(cond.replace('x', str(x)), {}, self.env)]
-                elif t == 'map':
-                    source = self.env[stmt['source']]
-                    expr = stmt['expression']
-                    self.env[stmt['target']] = [eval(expr.replace('x', str(x)), {}, self.env) for x in source]
-                elif t == 'reduce':
-                    from functools import reduce
-                    source = self.env[stmt['source']]
-                    expr = stmt['expression']
-                    self.env[stmt['target']] = reduce(lambda acc, x: eval(expr, {'acc': acc, 'x': x}, {}), source)
-                
-                # === ERROR HANDLING ===
-                elif t == 'try':
-                    try_stack.append(i)
-                elif t == 'catch':
-                    # If we reach catch normally (no error), skip to END TRY
-                    while i < len(body) and body[i]['type'] != 'endtry':
-                        i += 1
-                elif t == 'endtry':
-                    if try_stack:
-                        try_stack.pop()
-                
-                # === FUNCTIONS ===
-                elif t == 'call':
-                    func = self.env.get(stmt['func_name'])
-                    if callable(func):
-                        args = [eval(a, {}, self.env) for a in stmt['args']] if stmt['args'] else []
-                        result = func(*args)
-                        if stmt.get('result'):
-                            self.env[stmt['result']] = result
-                
-                # === OOP ===
-                elif t == 'create_instance':
-                    cls = self.env.get(stmt['class_name'])
-                    if cls:
-                        args = [eval(a, {}, self.env) for a in stmt['args']] if stmt['args'] else []
-                        self.env[stmt['var']] = cls(*args)
-                
-                # === AI PIPELINE ===
-                elif t == 'load_model':
-                    try:
-                        from transformers import pipeline
-                        self.env[stmt['var']] = pipeline(stmt['model_name'])
-                    except ImportError:
-                        os.system("pip install transformers")
-                        from transformers import pipeline
-                        self.env[stmt['var']] = pipeline(stmt['model_name'])
-                elif t == 'predict':
-                    model = self.env.get('model')
-                    if model:
-                        inp = eval(stmt['input'], {}, self.env)
-                        self.env[stmt['output']] = model(inp)
-                elif t == 'train':
-                    model = self.env.get(stmt['model'])
-                    if model and hasattr(model, 'fit'):
-                        data = eval(stmt['data'], {}, self.env)
-                        model.fit(data)
-                
+                left -= 1
+                if left <= 0:
+                    left = budget.renew(left, stmt.step)
+                i = handlers[stmt.op](stmt, i)
             except Exception as e:
-                # Handle errors in TRY blocks
-                if try_stack:
-                    # Find the CATCH block
-                    while i < len(body) and body[i]['type'] != 'catch':
-                        i += 1
-                    if i < len(body):
-                        self.env[body[i].get('error_var', 'error')] = str(e)
-                else:
-                    raise e
-            
-            i += 1
-
-    def _try_import(self, module):
-        mod_name = module.split('.')[0]
+                i = self._catch(e, stmt)
+        return self._result
+
+    def _execute_profiled(self, body):
+        # _execute_body's loop, timing each statement; kept separate so the
+        # plain loop carries no profiling checks
+        handlers = self._handlers
+        record = self.profiler.record
+        clock = time.perf_counter
+        memory = tracemalloc.get_traced_memory if self.profiler.memory else None
+        budget = self.budget
+        left = budget.start()
+        i = 0
+        end = len(body)
+        with self.profiler.running():
+            while i < end:
+                stmt = body[i]
+                used = memory()[0] if memory else 0
+                start = clock()
+                try:
+                    left -= 1
+                    if left <= 0:
+                        left = budget.renew(left, stmt.step)
+                    i = handlers[stmt.op](stmt, i)
+                except Exception as e:
+                    i = self._catch(e, stmt)
+                record(stmt.step, clock() - start, memory()[0] - used if memory else 0)
+        return self._result
+
+    def _catch(self, error, stmt):
+        # Jump into the CATCH of the innermost TRY, dropping any loops that
+        # were entered inside it. A budget stops the run regardless.
+        if not self._try_stack or isinstance(error, BudgetExceeded):
+            raise sourcemap.mark(error, self.filename, stmt.line, stmt.step)
+        try_at = self._try_stack.pop()
+        stack = self._stack
+        while stack and stack[-1][1] > try_at:
+            stack.pop()
+        catch_at = self._body[try_at].catch_at
+        self.env[self._body[catch_at].error_var] = str(error)
+        return catch_at + 1
+
+    # === ASSIGNMENT ===
+    def _op_assign(self, stmt, i):
+        self.env[stmt.target] = self._eval(stmt, 'value')
+        return i + 1
+
+    # === IMPORTS ===
+    def _op_import(self, stmt, i):
+        self._import(stmt.lib)
+        return i + 1
+
+    def _op_apikey(self, stmt, i):
+        self.env['api_key'] = stmt.value
+        return i + 1
+
+    # === OUTPUT ===
+    def _op_print(self, stmt, i):
+        self.output(str(self._eval(stmt, 'value')))
+        return i + 1
+
+    def _op_return(self, stmt, i):
+        value = self._eval(stmt, 'value')
+        self._result = list(value) if is_stream(value) else resolve(value)
+        return len(self._body)
+
+    def _op_raw(self, stmt, i):
+        exec(self._code(stmt, 'code', 'exec'), self.globals, self.env)
+        return i + 1
+
+    # === CONDITIONALS ===
+    def _op_if(self, stmt, i):
+        if self._eval(stmt, 'condition'):
+            return i + 1
+        # Resume just after ELSE, or after END IF
+        return getattr(stmt, 'else_at', stmt.end_at) + 1
+
+    def _op_else(self, stmt, i):
+        # End of the THEN branch
+        return stmt.end_at + 1
+
+    def _op_endif(self, stmt, i):
+        return i + 1
+
+    # === FOR LOOP ===
+    def _op_for(self, stmt, i):
+        loop_start = int(self._eval(stmt, 'start'))
+        loop_end = int(self._eval(stmt, 'end')) + 1
+        if loop_start >= loop_end:
+            return stmt.end_at + 1
+        self._stack.append(('for', i, stmt.var, loop_end))
+        self.env[stmt.var] = loop_start
+        return i + 1
+
+    def _op_endfor(self, stmt, i):
+        _, i_start, loop_var, loop_end = self._stack[-1]
+        value = self.env[loop_var] + 1
+        self.env[loop_var] = value
+        if value < loop_end:
+            return i_start + 1
+        self._stack.pop()
+        return i + 1
+
+    # === FOREACH LOOP ===
+    def _op_foreach(self, stmt, i):
+        if stmt.parallel:
+            return self._parallel_foreach(stmt, i)
+        iterator = iter(self._eval(stmt, 'iterable'))
         try:
-            mod = importlib.import_module(module)
-        except ImportError:
-            os.system(f"pip install {mod_name}")
-            mod = importlib.import_module(module)
-        self.env[mod_name] = mod
-
-
-class ExplainCodeApp(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("ExplainCode IDE (PyQt5)")
-        self.setGeometry(200, 200, 900, 600)
-        self.init_ui()
-
-    def init_ui(self):
-        layout = QVBoxLayout()
-        self.editor = QTextEdit()
-        self.output = QTextEdit()
-        self.output.setReadOnly(True)
-        self.status = QLabel("🔹 Ready")
-
-        load_btn = QPushButton("📂 Open File")
-        run_btn = QPushButton("▶️ Run Code")
-
-        load_btn.clicked.connect(self.load_file)
-        run_btn.clicked.connect(self.run_code)
-
-        layout.addWidget(self.editor)
-        layout.addWidget(load_btn)
-        layout.addWidget(run_btn)
-        layout.addWidget(QLabel("🧠 Output:"))
-        layout.addWidget(self.output)
-        layout.addWidget(self.status)
-
-        self.setLayout(layout)
-
-    def gui_input(self, prompt):
-        val, ok = QInputDialog.getText(self, "Input Required", prompt)
-        return val, ok
-
-    def gui_print(self, text):
-        self.output.append(text)
-
-    def load_file(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Open ExplainCode", "", "ExplainCode Files (*.epd *.eai)")
-        if path:
-            with open(path, "r", encoding="utf-8") as f:
-                self.editor.setText(f.read())
-            self.status.setText(f"📄 Loaded: {os.path.basename(path)}")
-
-    def run_code(self):
-        self.output.clear()
-        code = self.editor.toPlainText().splitlines()
+            self.env[stmt.var] = next(iterator)
+        except StopIteration:
+            # Empty iterable, skip to end
+            return stmt.end_at + 1
+        self._stack.append(('foreach', i, stmt.var, iterator))
+        return i + 1
+
+    def _op_endforeach(self, stmt, i):
+        _, i_start, loop_var, iterator = self._stack[-1]
         try:
-            parser = ExplainCodeParser()
-            ast_tree = parser.parse(code)
-            interpreter = ExplainCodeInterpreter(ast_tree, self.gui_print, self.gui_input)
-            result = interpreter.run()
+            self.env[loop_var] = next(iterator)
+        except StopIteration:
+            self._stack.pop()
+            return i + 1
+        return i_start + 1
+
+    def _prepare_parallel(self):
+        # Build the worker function of every PARALLEL FOREACH before the
+        # run, so steps it cannot run in parallel fail before anything runs
+        body = self.ast['body']
+        for i, stmt in enumerate(body):
+            if stmt.type == 'foreach' and stmt.parallel and 'parallel' not in (stmt.compiled or {}):
+                if stmt.compiled is None:
+                    stmt.compiled = {}
+                stmt.compiled['parallel'] = parallel_loop(self.ast, i)
+
+    def _parallel_foreach(self, stmt, i):
+        from .parallel import parallel_foreach  # the process pool stays off the startup path
+        loop = stmt.compiled['parallel']
+        env = self.env
+        shared = {name: env[name] for name in loop['shared'] if name in env}
+        for printed, appended in parallel_foreach(loop['source'], self._eval(stmt, 'iterable'), shared):
+            for line in printed:
+                self.output(line)
+            for name, values in zip(loop['appends'], appended):
+                env[name].extend(values)
+        return stmt.end_at + 1
+
+    # === WHILE LOOP ===
+    def _op_while(self, stmt, i):
+        if not self._eval(stmt, 'condition'):
+            return stmt.end_at + 1
+        self._stack.append(('while', i))
+        return i + 1
+
+    def _op_endwhile(self, stmt, i):
+        self._stack.pop()
+        return stmt.start_at
+
+    # === BREAK/CONTINUE ===
+    def _op_break(self, stmt, i):
+        self._unwind(stmt.loop_at)
+        self._stack.pop()
+        return self._body[stmt.loop_at].end_at + 1
+
+    def _op_continue(self, stmt, i):
+        self._unwind(stmt.loop_at)
+        # Run the loop terminator, which advances or exits
+        return self._body[stmt.loop_at].end_at
+
+    def _unwind(self, loop_at):
+        # Leave every loop and TRY opened inside the loop at ``loop_at``,
+        # keeping that loop itself on top of the stack.
+        stack, try_stack = self._stack, self._try_stack
+        while stack[-1][1] != loop_at:
+            stack.pop()
+        while try_stack and try_stack[-1] > loop_at:
+            try_stack.pop()
+
+    # === DATA STRUCTURES ===
+    def _op_list_create(self, stmt, i):
+        self.env[stmt.name] = self._eval(stmt, 'value')
+        return i + 1
+
+    _op_dict_create = _op_list_create
+
+    def _op_list_append(self, stmt, i):
+        self.env[stmt.list_name].append(self._eval(stmt, 'value'))
+        return i + 1
+
+    def _op_list_remove(self, stmt, i):
+        self.env[stmt.list_name].remove(self._eval(stmt, 'value'))
+        return i + 1
+
+    def _op_get_value(self, stmt, i):
+        self.env[stmt.target] = self._eval(stmt, 'source')
+        return i + 1
+
+    # === UTILITIES ===
+    def _op_sort(self, stmt, i):
+        self.env[stmt.target] = sorted(self.env[stmt.source])
+        return i + 1
+
+    def _op_filter(self, stmt, i):
+        self.env[stmt.target] = self._filter(stmt, self.env[stmt.source])
+        return i + 1
+
+    def _op_map(self, stmt, i):
+        self.env[stmt.target] = self._map(stmt, self.env[stmt.source])
+        return i + 1
+
+    def _op_reduce(self, stmt, i):
+        source = self.env[stmt.source]
+        self.env[stmt.target] = functools.reduce(self._lambda(stmt, 'expression', 'acc, x'), source)
+        return i + 1
+
+    # === STREAMS ===
+    def _op_stream(self, stmt, i):
+        self.env[stmt.target] = open_stream(self._eval(stmt, 'source'), stmt.lines)
+        return i + 1
+
+    def _op_collect(self, stmt, i):
+        self.env[stmt.target] = list(self.env[stmt.source])
+        return i + 1
+
+    # === ERROR HANDLING ===
+    def _op_try(self, stmt, i):
+        self._try_stack.append(i)
+        return i + 1
+
+    def _op_catch(self, stmt, i):
+        # Reached normally (no error): the TRY is over, skip past END TRY
+        self._try_stack.pop()
+        return stmt.end_at + 1
+
+    def _op_endtry(self, stmt, i):
+        return i + 1
+
+    # === FUNCTIONS ===
+    def _op_call(self, stmt, i):
+        func = self.env.get(stmt.func_name)
+        if callable(func):
+            result = func(*self._eval_args(stmt))
+            if stmt.result:
+                self.env[stmt.result] = result
+        return i + 1
+
+    # === OOP ===
+    def _op_create_instance(self, stmt, i):
+        cls = self.env.get(stmt.class_name)
+        if cls:
+            self.env[stmt.var] = cls(*self._eval_args(stmt))
+        return i + 1
+
+    # === AI PIPELINE ===
+    def _op_load_model(self, stmt, i):
+        self.env[stmt.var] = load_model(stmt.model_name)
+        return i + 1
+
+    def _op_predict(self, stmt, i):
+        model = self.env.get('model')
+        if model:
+            inp = self._eval(stmt, 'input')
+            if stmt.batch:
+                self.env[stmt.output] = predict_batch(model, inp)
+            else:
+                self.env[stmt.output] = predict(model, inp)
+        return i + 1
+
+    def _op_train(self, stmt, i):
+        model = self.env.get(stmt.model)
+        if model and hasattr(model, 'fit'):
+            model.fit(self._eval(stmt, 'data'))
+        return i + 1
+
+    # === HTTP ===
+    def _op_fetch(self, stmt, i):
+        from .fetch import fetch_all_blocking, fetch_blocking  # asyncio stays off the startup path
+        source = self._eval(stmt, 'source')
+        self.env[stmt.target] = fetch_all_blocking(source) if stmt.all else fetch_blocking(source)
+        return i + 1
+
+    def _code(self, stmt, field, mode="eval"):
+        # Each node keeps the code objects for its own expression fields, so
+        # a step inside a loop is compiled once rather than once per pass.
+        compiled = stmt.compiled
+        if compiled is None:
+            compiled = stmt.compiled = {}
+        code = compiled.get(field)
+        if code is None:
+            code = compiled[field] = compile_expr(getattr(stmt, field), mode)
+        return code
+
+    def _eval(self, stmt, field):
+        return eval(self._code(stmt, field), self.globals, self.env)
+
+    def _eval_args(self, stmt):
+        compiled = stmt.compiled
+        if compiled is None:
+            compiled = stmt.compiled = {}
+        codes = compiled.get('args')
+        if codes is None:
+            codes = compiled['args'] = [compile_expr(a) for a in stmt.args]
+        return [eval(c, self.globals, self.env) for c in codes]
+
+    def _lambda(self, stmt, field, params):
+        # FILTER/MAP/REDUCE expressions become a real function of ``x`` (and
+        # ``acc``), compiled once, that sees the current variables.
+        compiled = stmt.compiled
+        if compiled is None:
+            compiled = stmt.compiled = {}
+        key = field + '_fn'
+        code = compiled.get(key)
+        if code is None:
+            code = compiled[key] = compile_expr(f"lambda {params}: ({getattr(stmt, field)})")
+        return eval(code, dict(self.env))
+
+    def _filter(self, stmt, source):
+        if is_stream(source):
+            test = self._lambda(stmt, 'condition', 'x')
+            return (x for x in source if test(x))
+        array = vector.as_array(source, stmt.condition, self.env, self.vectorize)
+        if array is not None:
+            result = vector.vector_filter(array, self._code(stmt, 'condition'), dict(self.env))
             if result is not None:
-                self.output.append(f"\n✅ Output: {result}")
-            self.status.setText("✅ Executed successfully.")
-        except Exception as e:
-            self.output.append(f"\n❌ Error: {str(e)}")
-            self.status.setText("❌ Execution failed.")
+                return result
+        test = self._lambda(stmt, 'condition', 'x')
+        return [x for x in vector.elements(source) if test(x)]
 
-def main():
-    app = QApplication(sys.argv)
-    window = ExplainCodeApp()
-    window.show()
-    sys.exit(app.exec_())
+    def _map(self, stmt, source):
+        if is_stream(source):
+            return map(self._lambda(stmt, 'expression', 'x'), source)
+        array = vector.as_array(source, stmt.expression, self.env, self.vectorize)
+        if array is not None:
+            result = vector.vector_map(array, self._code(stmt, 'expression'), dict(self.env))
+            if result is not None:
+                return result
+        fn = self._lambda(stmt, 'expression', 'x')
+        return [fn(x) for x in vector.elements(source)]
 
-if __name__ == "__main__":
-    main()
+    def _import(self, module):
+        # Binds the top-level name, like ``import a.b`` does; run() has
+        # already checked that the module can be found
+        importlib.import_module(module)
+        mod_name = module.split('.')[0]
+        self.env[mod_name] = importlib.import_module(mod_name)
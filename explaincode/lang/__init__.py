@@ -1,6 +1,5 @@
-# explaincode_lang/__init__.py
+# explaincode/lang/__init__.py
 
-from .lsp_server import explain_server
 from .parser import is_valid_explaincode, validate_lines
 
 __all__ = [
@@ -8,3 +7,12 @@ __all__ = [
     "is_valid_explaincode",
     "validate_lines"
 ]
+
+
+def __getattr__(name):
+    # The server needs pygls; load it only when asked for, so the diagnostics
+    # and symbol index can be used without it
+    if name == "explain_server":
+        from .lsp_server import explain_server
+        return explain_server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,37 +1,132 @@
-# explaincode_lang/
+# explaincode/lang/lsp_server.py
 
 from pygls.server import LanguageServer
-from pygls.lsp.types import Diagnostic, DiagnosticSeverity, Position, Range, DidOpenTextDocumentParams
-from .parser import is_valid_explaincode, validate_lines
+from pygls.lsp.types import (
+    Diagnostic, DiagnosticSeverity, Position, Range, Location,
+    CompletionItem, CompletionItemKind, CompletionList, DocumentSymbol, SymbolKind,
+    DidOpenTextDocumentParams, DidChangeTextDocumentParams, DidCloseTextDocumentParams,
+    DefinitionParams, ReferenceParams, CompletionParams, DocumentSymbolParams,
+)
+from .parser import Document, STEP_FORMS
+
+# Diagnostics are published once edits pause for this long, so a burst of
+# keystrokes re-links the document once instead of once per key
+DEBOUNCE_SECONDS = 0.15
+
 
 class ExplainCodeServer(LanguageServer):
+    # pygls advertises incremental text sync by default, so didChange
+    # carries only the edited ranges.
     def __init__(self):
         super().__init__()
+        self.documents = {}
+        self.pending = {}
+
+    def schedule_diagnostics(self, uri):
+        handle = self.pending.pop(uri, None)
+        if handle is not None:
+            handle.cancel()
+        self.pending[uri] = self.loop.call_later(DEBOUNCE_SECONDS, self.publish, uri)
+
+    def publish(self, uri):
+        self.pending.pop(uri, None)
+        document = self.documents.get(uri)
+        if document is None:
+            return
+        diagnostics = []
+        for line, severity, message in document.diagnostics():
+            diagnostics.append(Diagnostic(
+                range=_range(line, 0, len(document.lines[line])),
+                message=message,
+                severity=DiagnosticSeverity(severity)
+            ))
+        self.publish_diagnostics(uri, diagnostics)
+
+
+def _range(line, start, end):
+    return Range(start=Position(line=line, character=start), end=Position(line=line, character=end))
+
 
 explain_server = ExplainCodeServer()
 
+
 @explain_server.feature("textDocument/didOpen")
 def did_open(ls: ExplainCodeServer, params: DidOpenTextDocumentParams):
-    text = params.text_document.text
-    lines = text.splitlines()
-    diagnostics = []
-
-    if not is_valid_explaincode(lines):
-        diagnostics.append(Diagnostic(
-            range=Range(start=Position(line=0, character=0), end=Position(line=0, character=100)),
-            message="File must start with 'ALGORITHM' and end with 'END ALGORITHM'",
-            severity=DiagnosticSeverity.Error
-        ))
+    uri = params.text_document.uri
+    ls.documents[uri] = Document(params.text_document.text)
+    ls.publish(uri)
 
-    issues = validate_lines(lines)
-    for line_num, msg in issues:
-        diagnostics.append(Diagnostic(
-            range=Range(
-                start=Position(line=line_num, character=0),
-                end=Position(line=line_num, character=len(lines[line_num]))
-            ),
-            message=msg,
-            severity=DiagnosticSeverity.Warning
-        ))
 
-    ls.publish_diagnostics(params.text_document.uri, diagnostics)
+@explain_server.feature("textDocument/didChange")
+def did_change(ls: ExplainCodeServer, params: DidChangeTextDocumentParams):
+    uri = params.text_document.uri
+    document = ls.documents.setdefault(uri, Document())
+    for change in params.content_changes:
+        if getattr(change, "range", None) is None:
+            document.set_text(change.text)
+        else:
+            start, end = change.range.start, change.range.end
+            document.apply_change(start.line, start.character, end.line, end.character, change.text)
+    ls.schedule_diagnostics(uri)
+
+
+@explain_server.feature("textDocument/didClose")
+def did_close(ls: ExplainCodeServer, params: DidCloseTextDocumentParams):
+    uri = params.text_document.uri
+    handle = ls.pending.pop(uri, None)
+    if handle is not None:
+        handle.cancel()
+    ls.documents.pop(uri, None)
+    ls.publish_diagnostics(uri, [])
+
+
+@explain_server.feature("textDocument/definition")
+def definition(ls: ExplainCodeServer, params: DefinitionParams):
+    uri = params.text_document.uri
+    document = ls.documents.get(uri)
+    if document is None:
+        return []
+    position = params.position
+    return [Location(uri=uri, range=_range(*span))
+            for span in document.definition(position.line, position.character)]
+
+
+@explain_server.feature("textDocument/references")
+def references(ls: ExplainCodeServer, params: ReferenceParams):
+    uri = params.text_document.uri
+    document = ls.documents.get(uri)
+    if document is None:
+        return []
+    position = params.position
+    spans = document.references(position.line, position.character,
+                                params.context.include_declaration)
+    return [Location(uri=uri, range=_range(*span)) for span in spans]
+
+
+@explain_server.feature("textDocument/completion")
+def completion(ls: ExplainCodeServer, params: CompletionParams):
+    document = ls.documents.get(params.text_document.uri)
+    if document is None:
+        return CompletionList(is_incomplete=False, items=[])
+    names, keywords = document.completions()
+    items = [CompletionItem(label=name, kind=CompletionItemKind.Variable) for name in names]
+    items += [CompletionItem(label=word, kind=CompletionItemKind.Keyword, detail=STEP_FORMS[word])
+              for word in keywords]
+    return CompletionList(is_incomplete=False, items=items)
+
+
+@explain_server.feature("textDocument/documentSymbol")
+def document_symbol(ls: ExplainCodeServer, params: DocumentSymbolParams):
+    document = ls.documents.get(params.text_document.uri)
+    if document is None:
+        return []
+    symbols = []
+    for name, kind, line, start, end in document.symbols():
+        symbols.append(DocumentSymbol(
+            name=name,
+            kind=SymbolKind.Variable if kind == "variable" else SymbolKind.Event,
+            range=_range(line, 0, len(document.lines[line])),
+            selection_range=_range(line, start, end),
+            detail=document.lines[line].strip() if kind == "step" else None
+        ))
+    return symbols
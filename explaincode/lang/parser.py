@@ -1,13 +1,361 @@
-# explaincode_lang/parser.py
+# explaincode/lang/parser.py
+#
+# Diagnostics for the language server, produced by the same step parser the
+# engines use. Each line is checked on its own and the result is cached by
+# its text, so an edit only re-checks the lines it touched; block structure
+# (IF/END IF, loops, TRY/CATCH) is then re-linked over the cached steps.
+# The symbol index behind navigation and completion is built the same way,
+# from cached per-line definitions and references.
+
+import functools
+import keyword
+import re
+
+from ..parser import (
+    HEADERS, FOOTERS, STEP_RE, STEP_PARSERS, END_TYPES, KEYWORDS, link_blocks, parse_content,
+)
+
+# LSP DiagnosticSeverity values
+ERROR = 1
+WARNING = 2
+
+LINE_CACHE_SIZE = 65536
+
+NAME_RE = re.compile(r"[A-Za-z_]\w*")
+
+# Words in a step that are never variable names
+RESERVED = frozenset(STEP_PARSERS) | frozenset(keyword.kwlist) | {
+    "STEP", "THEN", "DO", "IN", "to", "WHERE", "WITH", "ON", "ALL", "FILE",
+}
+
+# Node type -> the field naming the variable that step defines
+DEFINES = {
+    "assign": "target",
+    "list_create": "name",
+    "dict_create": "name",
+    "get_value": "target",
+    "map": "target",
+    "filter": "target",
+    "reduce": "target",
+    "sort": "target",
+    "call": "result",
+    "foreach": "var",
+    "for": "var",
+    "catch": "error_var",
+    "stream": "target",
+    "collect": "target",
+    "create_instance": "var",
+    "load_model": "var",
+    "predict": "output",
+    "fetch": "target",
+}
+
+# The expected form of each step keyword, shown when a step is malformed
+STEP_FORMS = {
+    "Set": "Set name ← value",
+    "Import": "Import module",
+    "FOREACH": "FOREACH x IN items DO",
+    "PARALLEL": "PARALLEL FOREACH x IN items DO",
+    "FOR": "FOR i ← start to end DO",
+    "WHILE": "WHILE condition DO",
+    "IF": "IF condition THEN",
+    "END": "END " + "|".join(END_TYPES),
+    "LIST": "LIST name ← [...]",
+    "DICT": "DICT name ← {...}",
+    "APPEND": "APPEND list ← value",
+    "REMOVE": "REMOVE list ← value",
+    "GET": "GET expression → name",
+    "SORT": "SORT list [→ name]",
+    "FILTER": "FILTER list WHERE condition → name",
+    "MAP": "MAP list WITH expression → name",
+    "REDUCE": "REDUCE list WITH expression → name",
+    "STREAM": "STREAM [FILE] source → name",
+    "COLLECT": "COLLECT stream [→ name]",
+    "CALL": "CALL function(args) [→ name]",
+    "CREATE": "CREATE name ← Class(args)",
+    "LOAD_MODEL": "LOAD_MODEL \"name\" [→ model]",
+    "PREDICT": "PREDICT [ALL] input → name",
+    "TRAIN": "TRAIN model ON data",
+    "FETCH": "FETCH [ALL] url → name",
+}
+
+
+@functools.lru_cache(maxsize=LINE_CACHE_SIZE)
+def check_line(line):
+    # (node, problem) for one line of source: the parsed STEP node or None,
+    # and (severity, message) or None. Nodes are shared between every line
+    # with the same text, so callers must not modify them.
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None, None
+    if not line.startswith("STEP"):
+        if line.startswith(HEADERS + FOOTERS + ("INPUT:", "OUTPUT:")):
+            return None, None
+        return None, (WARNING, "Not a STEP; this line is ignored")
+    match = STEP_RE.match(line)
+    if not match:
+        return None, (ERROR, "Expected 'STEP n: ...'")
+    number, keyword, content = match.groups()
+    node = parse_content(content)
+    if node is None:
+        return None, (ERROR, f"Malformed {keyword} step, expected '{STEP_FORMS.get(keyword, keyword)}'")
+    node.step = int(number)
+    if node.type == "raw" and keyword not in STEP_PARSERS:
+        # Anything that is not a keyword step runs as Python
+        try:
+            compile(content, "<step>", "exec")
+        except SyntaxError as e:
+            return node, (ERROR, f"Not a known step and not valid Python: {e.msg}")
+    return node, None
+
+
+@functools.lru_cache(maxsize=LINE_CACHE_SIZE)
+def line_symbols(line):
+    # (step, definitions, references) for one line of source. Both are
+    # tuples of (name, start, end) character spans; a definition is also
+    # counted as a reference.
+    stripped = line.lstrip()
+    if stripped.startswith("INPUT:"):
+        names = tuple(_names(line, line.index("INPUT:") + 6))
+        return None, names, names
+    node, _ = check_line(line)
+    if node is None:
+        return None, (), ()
+    refs = tuple(_names(line, STEP_RE.search(line).start(3)))
+    defs = ()
+    name = node.get(DEFINES.get(node.type, "_"))
+    if name and NAME_RE.fullmatch(name):
+        spans = [span for span in refs if span[0] == name]
+        if spans:
+            # "… → name" defines its last occurrence, "Set name ← …" its first
+            defs = (spans[-1] if "→" in line else spans[0],)
+    return node.step, defs, refs
+
+
+def _names(line, start):
+    return [(m.group(), m.start(), m.end()) for m in NAME_RE.finditer(line, start)
+            if m.group() not in RESERVED]
+
+
+class _Line:
+    # One line's check result and symbols. Lines are renumbered lazily,
+    # after an edit that adds or removes lines and before the next lookup.
+    __slots__ = ("number", "checked", "step", "defs", "refs")
+
+    def __init__(self, text):
+        self.number = None
+        self.checked = check_line(text)
+        self.step, self.defs, self.refs = line_symbols(text)
+
+
+class Index:
+    # Where each variable is defined and used, and the line of each STEP.
+    # Every table maps a name to the set of lines mentioning it, and an edit
+    # only moves the lines it replaced in and out of those sets. Lines with
+    # a problem are kept in a set the same way, and the block structure is
+    # only re-linked after an edit that touches a control-flow step.
+
+    def __init__(self):
+        self.lines = []
+        self.definitions = {}
+        self.references = {}
+        self.steps = {}
+        self.problems = set()
+        self.numbered = True
+        # link_blocks' error as (message, line entry), None when the blocks
+        # are well formed; recomputed when _flow_changed
+        self._flow_error = None
+        self._flow_changed = True
+
+    def replace(self, start, end, texts):
+        # Swap lines[start:end] for the given texts
+        for entry in self.lines[start:end]:
+            self._update(entry, set.discard)
+        new = [_Line(text) for text in texts]
+        for entry in new:
+            self._update(entry, set.add)
+        if len(new) == end - start:
+            for number, entry in enumerate(new, start):
+                entry.number = number
+        else:
+            self.numbered = False
+        self.lines[start:end] = new
+
+    def _update(self, entry, op):
+        node, problem = entry.checked
+        if problem is not None:
+            op(self.problems, entry)
+        if node is not None and node.type in KEYWORDS:
+            self._flow_changed = True
+        if entry.step is not None:
+            op(self.steps.setdefault(entry.step, set()), entry)
+        for table, spans in ((self.definitions, entry.defs), (self.references, entry.refs)):
+            for name, _, _ in spans:
+                op(table.setdefault(name, set()), entry)
+
+    def _number(self):
+        if not self.numbered:
+            for number, entry in enumerate(self.lines):
+                entry.number = number
+            self.numbered = True
+
+    def locate(self, table, name):
+        # [(line, start, end)] of every span of ``name`` in ``table``, in
+        # document order
+        self._number()
+        spans = "defs" if table is self.definitions else "refs"
+        return sorted((entry.number, start, end)
+                      for entry in table.get(name, ())
+                      for span_name, start, end in getattr(entry, spans)
+                      if span_name == name)
+
+    def step_line(self, step):
+        self._number()
+        entries = self.steps.get(step)
+        return min(entry.number for entry in entries) if entries else None
+
+    def names(self):
+        return sorted(name for name, entries in self.definitions.items() if entries)
+
+    def problem_lines(self):
+        # [(line, severity, message)] in document order
+        self._number()
+        return sorted((entry.number,) + entry.checked[1] for entry in self.problems)
+
+    def flow_error(self):
+        # (line, message) of the first block nesting error, or None
+        if self._flow_changed:
+            self._flow_error = self._link()
+            self._flow_changed = False
+        if self._flow_error is None:
+            return None
+        self._number()
+        message, entry = self._flow_error
+        return (entry.number if entry is not None else 0), message
+
+    def _link(self):
+        blocks = []
+        step_entries = {}
+        for entry in self.lines:
+            node = entry.checked[0]
+            if node is not None and node.type in KEYWORDS:
+                # Only control flow matters to link_blocks, and it records
+                # jump targets on what it is given, so hand it throwaway
+                # stand-ins rather than the cached nodes
+                blocks.append({"type": node.type, "step": node.step})
+                step_entries.setdefault(node.step, entry)
+        try:
+            link_blocks(blocks)
+        except SyntaxError as e:
+            number = str(e).split(":", 1)[0].split()[-1]
+            return str(e), (step_entries.get(int(number)) if number.isdigit() else None)
+        return None
+
+
+class Document:
+    # One open file: its lines, the cached check of each line and the symbol
+    # index, all kept in step with incremental edits.
+
+    def __init__(self, text=""):
+        self.lines = []
+        self.index = Index()
+        self.set_text(text)
+
+    def set_text(self, text):
+        self.lines = text.split("\n")
+        self.index.replace(0, len(self.index.lines), self.lines)
+
+    def apply_change(self, start_line, start_char, end_line, end_char, text):
+        # Replace the text between two (line, character) positions, as sent
+        # by an incremental didChange, and re-check only the lines it spans
+        lines = self.lines
+        if start_line >= len(lines):
+            lines.append("")
+            self.index.replace(len(lines) - 1, len(lines) - 1, [""])
+            start_line = end_line = len(lines) - 1
+            start_char = end_char = 0
+        end_line = min(end_line, len(lines) - 1)
+        head = lines[start_line][:start_char]
+        tail = lines[end_line][end_char:]
+        new = (head + text + tail).split("\n")
+        lines[start_line:end_line + 1] = new
+        self.index.replace(start_line, end_line + 1, new)
+
+    def word_at(self, line, character):
+        if line >= len(self.lines):
+            return None
+        for m in re.finditer(r"\w+", self.lines[line]):
+            if m.start() <= character <= m.end():
+                return m.group()
+        return None
+
+    def definition(self, line, character):
+        # [(line, start, end)] for the variable or STEP number under the cursor
+        word = self.word_at(line, character)
+        if word is None:
+            return []
+        if word.isdigit():
+            at = self.index.step_line(int(word))
+            return [] if at is None else [(at, 0, len(self.lines[at]))]
+        return self.index.locate(self.index.definitions, word)
+
+    def references(self, line, character, include_definition=True):
+        word = self.word_at(line, character)
+        if word is None:
+            return []
+        refs = self.index.locate(self.index.references, word)
+        if not include_definition:
+            defs = set(self.index.locate(self.index.definitions, word))
+            refs = [ref for ref in refs if ref not in defs]
+        return refs
+
+    def completions(self):
+        # Defined variable names and step keywords
+        return self.index.names(), sorted(STEP_FORMS)
+
+    def symbols(self):
+        # [(name, kind, line, start, end)] with kind "variable" (at its first
+        # definition) or "step"
+        index = self.index
+        found = [(name, "variable") + index.locate(index.definitions, name)[0]
+                 for name in index.names()]
+        for step, entries in index.steps.items():
+            if entries:
+                line = index.step_line(step)
+                found.append((f"STEP {step}", "step", line, 0, len(self.lines[line])))
+        found.sort(key=lambda symbol: symbol[2])
+        return found
+
+    def diagnostics(self):
+        # [(line, severity, message)] for the whole document, from the lines
+        # the index knows have problems and its cached block check
+        found = self.index.problem_lines()
+        code = [i for i in (self._first_line(), self._last_line()) if i is not None]
+        if not code or not self.lines[code[0]].strip().startswith(HEADERS):
+            found.append((code[0] if code else 0, ERROR, "File must start with ALGORITHM, MODEL, or API_CALL"))
+        elif not self.lines[code[1]].strip().startswith(FOOTERS):
+            found.append((code[1], ERROR, "File must end with END ALGORITHM, END MODEL, or END API_CALL"))
+        flow = self.index.flow_error()
+        if flow is not None:
+            found.append((flow[0], ERROR, flow[1]))
+        return found
+
+    def _first_line(self):
+        return next((i for i, line in enumerate(self.lines) if _is_code(line)), None)
+
+    def _last_line(self):
+        return next((i for i in range(len(self.lines) - 1, -1, -1) if _is_code(self.lines[i])), None)
+
+
+def _is_code(line):
+    line = line.strip()
+    return bool(line) and not line.startswith("#")
+
 
 def is_valid_explaincode(lines):
-    return lines[0].startswith("ALGORITHM") and lines[-1].strip() == "END ALGORITHM"
+    lines = [line.strip() for line in lines if line.strip()]
+    return bool(lines) and lines[0].startswith(HEADERS) and lines[-1].startswith(FOOTERS)
+
 
 def validate_lines(lines):
-    diagnostics = []
-    for i, line in enumerate(lines):
-        if "Set" in line and "←" not in line:
-            diagnostics.append((i, "Missing assignment operator '←'"))
-        if "IF" in line and "THEN" not in line:
-            diagnostics.append((i, "Missing THEN in IF statement"))
-    return diagnostics
+    return [(line, message) for line, _, message in Document("\n".join(lines)).diagnostics()]
@@ -0,0 +1,202 @@
+# explaincode/memo.py
+#
+# Result caching for ALGORITHMs declared pure with a MEMOIZE header:
+#
+#     ALGORITHM Fib MEMOIZE(maxsize=10000, disk=True)
+#
+# The cache lives inside the compiled function: it starts by looking its
+# inputs up (Memo.lookup) and every RETURN stores what it returns
+# (Memo.store). Recursive CALLs go through the cache too, so an exponential
+# recursion becomes linear, and a call costs no extra frames, so recursion
+# runs as deep as it would without MEMOIZE.
+#
+# Results are kept in an in-memory LRU of maxsize entries and, with
+# disk=True, in a SQLite file next to the program in __pycache__/
+# (cache.memo_path), which keeps them across runs. Disk entries are keyed by
+# a digest of the program's steps, so editing the program stops old results
+# from being used; --clear-cache removes them. Calls with unhashable inputs
+# (a list, a dict) are not cached.
+
+import os
+import atexit
+import pickle
+import weakref
+from collections import OrderedDict
+
+from . import cache
+
+# In-memory entries per function when MEMOIZE gives no maxsize
+MAXSIZE = 1024
+
+# Disk writes are batched; at most this many results wait to be written
+PENDING_WRITES = 1000
+
+# What lookup() returns for inputs that are not cached
+MISS = object()
+
+
+class Memo:
+    MISS = MISS
+
+    def __init__(self, function, maxsize=MAXSIZE, disk=None):
+        # maxsize: None for unbounded, 0 for no in-memory entries. disk: the
+        # program digest to key stored results by, or None for memory only.
+        # The function gets the Memo as ``memo``.
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self._entries = OrderedDict()
+        self.disk = None
+        if disk is not None:
+            path = function.__code__.co_filename
+            if os.path.isfile(path):
+                self.disk = DiskCache(cache.memo_path(path), disk)
+        function.memo = self
+
+    def lookup(self, key):
+        # The result cached for key (the inputs as a tuple), or MISS
+        try:
+            value = self._entries.get(key, MISS)
+        except TypeError:
+            self.uncached += 1
+            return MISS
+        if value is not MISS:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+        self.misses += 1
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISS:
+                self._remember(key, value)
+        return value
+
+    def store(self, key, value):
+        # Called on every RETURN with the result; returns it
+        try:
+            hash(key)
+        except TypeError:
+            return value
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+        return value
+
+    def _remember(self, key, value):
+        if self.maxsize == 0:
+            return
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if self.maxsize is not None and len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize,
+                 "uncached": self.uncached}
+        if self.disk is not None:
+            stats.update(disk_hits=self.disk.hits, disk_misses=self.disk.misses, disk_path=self.disk.path)
+        return stats
+
+
+def memoize(function, maxsize=MAXSIZE, disk=None):
+    return Memo(function, maxsize, disk)
+
+
+def format_stats(name, stats):
+    text = (f"{name}: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['size']}/{stats['maxsize'] if stats['maxsize'] is not None else '∞'} cached")
+    if "disk_hits" in stats:
+        text += f"; disk: {stats['disk_hits']} hits, {stats['disk_misses']} misses ({stats['disk_path']})"
+    if stats["uncached"]:
+        text += f"; {stats['uncached']} calls with unhashable inputs"
+    return text
+
+
+class DiskCache:
+    # Results stored in SQLite by (program digest, pickled inputs). Any
+    # error (a read-only tree, an unpicklable value, a locked database)
+    # only means that result is not stored.
+    def __init__(self, path, digest):
+        self.path = path
+        self.digest = digest
+        self.hits = 0
+        self.misses = 0
+        # Calls that missed and have not returned yet. Results are written
+        # when the outermost one returns, or every PENDING_WRITES results,
+        # so a recursion makes one transaction.
+        self.computing = 0
+        self._db = None
+        self._pending = {}
+        _open_caches.add(self)
+
+    def get(self, key):
+        try:
+            blob = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return MISS
+        value = self._pending.get(blob)
+        if value is None:
+            db = self._connect()
+            try:
+                row = db and db.execute("SELECT value FROM memo WHERE digest = ? AND key = ?",
+                                        (self.digest, blob)).fetchone()
+            except Exception:
+                row = None
+            value = row[0] if row else None
+        if value is None:
+            self.misses += 1
+            self.computing += 1
+            return MISS
+        self.hits += 1
+        return pickle.loads(value)
+
+    def put(self, key, value):
+        self.computing = max(0, self.computing - 1)
+        try:
+            self._pending[pickle.dumps(key, pickle.HIGHEST_PROTOCOL)] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass
+        if not self.computing or len(self._pending) >= PENDING_WRITES:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        db = self._connect()
+        if db is None or not pending:
+            return
+        try:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO memo (digest, key, value) VALUES (?, ?, ?)",
+                               [(self.digest, key, value) for key, value in pending.items()])
+        except Exception:
+            pass
+
+    def _connect(self):
+        if self._db is None:
+            import sqlite3  # only programs with MEMOIZE(disk=True) load it
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                db = sqlite3.connect(self.path, timeout=30)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS memo (digest TEXT, key BLOB, value BLOB,"
+                           " PRIMARY KEY (digest, key))")
+            except (OSError, sqlite3.Error):
+                self._db = False
+            else:
+                self._db = db
+        return self._db or None
+
+
+_open_caches = weakref.WeakSet()
+
+
+@atexit.register
+def flush():
+    # Write every pending result (left by a call that raised)
+    for disk in list(_open_caches):
+        disk.flush()
@@ -0,0 +1,292 @@
+# explaincode/models.py
+#
+# Process-wide registry of loaded AI pipelines. LOAD_MODEL in both engines
+# goes through load_model(), so a model is loaded once per process and kept
+# warm for later steps, runs and interpreter instances. Least recently used
+# models are dropped when the registry goes over its memory budget
+# (EXPLAINCODE_MODEL_MEMORY_MB) or model count.
+#
+# The factory that actually builds a pipeline is replaceable, e.g. with a
+# local stub to run programs offline:
+#
+#     from explaincode import models
+#     models.registry.factory = lambda name, device: (lambda text: [{"label": "POSITIVE"}])
+
+import os
+import operator
+import threading
+from collections import OrderedDict
+
+
+def transformers_pipeline(name, device=None):
+    from transformers import pipeline
+    if device is None:
+        return pipeline(name)
+    return pipeline(name, device=device)
+
+
+def model_size(model):
+    # Bytes held by the parameters of a torch-backed pipeline; 0 when the
+    # object does not expose them (stubs, non-torch callables).
+    inner = getattr(model, "model", model)
+    parameters = getattr(inner, "parameters", None)
+    if not callable(parameters):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    def __init__(self, factory=None, max_bytes=None, max_models=None):
+        self.factory = factory or transformers_pipeline
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()  # (name, device) -> (model, size)
+        self._lock = threading.RLock()
+
+    def get(self, name, device=None):
+        key = (name, device)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            # Loading under the lock keeps concurrent runs from loading the
+            # same model twice
+            model = self.factory(name, device)
+            self._models[key] = (model, model_size(model))
+            self._evict()
+            return model
+
+    def _evict(self):
+        # The model just loaded is always kept, even if it alone is over budget
+        while len(self._models) > 1 and self._over_budget():
+            self._models.popitem(last=False)
+
+    def _over_budget(self):
+        if self.max_models is not None and len(self._models) > self.max_models:
+            return True
+        if self.max_bytes is not None:
+            return sum(size for _, size in self._models.values()) > self.max_bytes
+        return False
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "bytes": sum(size for _, size in self._models.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _budget_from_env():
+    megabytes = os.environ.get("EXPLAINCODE_MODEL_MEMORY_MB")
+    return int(float(megabytes) * 1024 * 1024) if megabytes else None
+
+
+registry = ModelRegistry(max_bytes=_budget_from_env())
+
+
+def load_model(name, device=None):
+    if device is None:
+        device = os.environ.get("EXPLAINCODE_DEVICE") or None
+    return registry.get(name, device)
+
+
+# ------------------------------
+# Batched prediction
+# ------------------------------
+
+PREDICT_BATCH_SIZE = 32
+
+
+def _call_batch(model, inputs):
+    # transformers pipelines only batch the forward pass when told to;
+    # any other callable just receives the list
+    if type(model).__module__.startswith("transformers."):
+        return model(inputs, batch_size=len(inputs))
+    return model(inputs)
+
+
+def predict_batch(model, inputs, batch_size=None):
+    # One call per batch of inputs; results come back in input order
+    batch_size = batch_size or PREDICT_BATCH_SIZE
+    inputs = list(inputs)
+    results = []
+    for start in range(0, len(inputs), batch_size):
+        chunk = inputs[start:start + batch_size]
+        outputs = list(_call_batch(model, chunk))
+        if len(outputs) != len(chunk):
+            raise ValueError(f"Model returned {len(outputs)} results for a batch of {len(chunk)} inputs")
+        results.extend(outputs)
+    return results
+
+
+class Prediction:
+    # Placeholder for a queued PREDICT. Using it in any way (printing,
+    # indexing, comparing, arithmetic, ...) flushes the queue it belongs to.
+    __slots__ = ("_batcher", "_value", "_done")
+
+    def __init__(self, batcher):
+        self._batcher = batcher
+        self._value = None
+        self._done = False
+
+    @property
+    def value(self):
+        if not self._done:
+            self._batcher.flush()
+        return self._value
+
+    def _set(self, value):
+        self._value = value
+        self._done = True
+
+    def __repr__(self):
+        return repr(self.value)
+
+    def __str__(self):
+        return str(self.value)
+
+    def __eq__(self, other):
+        return self.value == other
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __getattr__(self, name):
+        return getattr(self.value, name)
+
+    def __contains__(self, item):
+        return item in self.value
+
+    def __format__(self, spec):
+        return format(self.value, spec)
+
+    def __round__(self, ndigits=None):
+        return round(self.value, ndigits)
+
+
+def _forward(op, reflected=False):
+    # An operator method of Prediction applying op to the resolved value
+    # (Python looks these up on the type, never through __getattr__)
+    def method(self, other):
+        if isinstance(other, Prediction):
+            other = other.value
+        return op(other, self.value) if reflected else op(self.value, other)
+    return method
+
+
+def _forward_unary(op):
+    def method(self):
+        return op(self.value)
+    return method
+
+
+for _name, _op in (("lt", operator.lt), ("le", operator.le), ("gt", operator.gt), ("ge", operator.ge),
+                   ("ne", operator.ne)):
+    setattr(Prediction, f"__{_name}__", _forward(_op))
+for _name in ("add", "sub", "mul", "truediv", "floordiv", "mod", "pow", "matmul", "and", "or", "xor",
+              "lshift", "rshift"):
+    _op = getattr(operator, f"{_name}_" if _name in ("and", "or") else _name)
+    setattr(Prediction, f"__{_name}__", _forward(_op))
+    setattr(Prediction, f"__r{_name}__", _forward(_op, reflected=True))
+for _name, _op in (("neg", operator.neg), ("pos", operator.pos), ("abs", abs), ("invert", operator.invert),
+                   ("int", int), ("float", float), ("complex", complex), ("index", operator.index)):
+    setattr(Prediction, f"__{_name}__", _forward_unary(_op))
+del _name, _op
+
+
+class MicroBatcher:
+    # Collects single PREDICT calls (typically one per loop iteration) and
+    # sends them to the model batch_size at a time.
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or PREDICT_BATCH_SIZE
+        self._pending = []  # (model, input, Prediction)
+
+    def submit(self, model, value):
+        prediction = Prediction(self)
+        self._pending.append((model, value, prediction))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return prediction
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        # Keep submission order within each model
+        by_model = {}
+        for model, value, prediction in pending:
+            by_model.setdefault(id(model), (model, []))[1].append((value, prediction))
+        for model, items in by_model.values():
+            outputs = predict_batch(model, [value for value, _ in items], self.batch_size)
+            for (_, prediction), output in zip(items, outputs):
+                prediction._set(output)
+
+
+_local = threading.local()
+
+
+class micro_batching:
+    # with micro_batching(64): ...  queues every PREDICT made on this thread
+    # until 64 are pending or a result is used. A batch size of None leaves
+    # PREDICT unbatched.
+    def __init__(self, batch_size):
+        self.batcher = MicroBatcher(batch_size) if batch_size else None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "batcher", None)
+        _local.batcher = self.batcher
+        return self.batcher
+
+    def __exit__(self, *exc):
+        _local.batcher = self._previous
+        if self.batcher is not None:
+            self.batcher.flush()
+        return False
+
+
+def predict(model, value):
+    batcher = getattr(_local, "batcher", None)
+    if batcher is None:
+        return model(value)
+    return batcher.submit(model, value)
+
+
+def resolve(value):
+    # Replace queued predictions inside a returned value by their results
+    if isinstance(value, Prediction):
+        return value.value
+    if isinstance(value, list):
+        return [resolve(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(resolve(v) for v in value)
+    if isinstance(value, dict):
+        return {k: resolve(v) for k, v in value.items()}
+    return value
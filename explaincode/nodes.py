@@ -0,0 +1,132 @@
+# explaincode/nodes.py
+#
+# AST node classes. Every step type is a small class with __slots__ (no
+# per-node __dict__) and an integer opcode, which the step interpreter uses
+# to index its handler table directly instead of comparing type strings.
+#
+# Nodes still read like the dicts the parsers used to produce -
+# node["type"], node.get("result"), "catch_at" in node - so code generation
+# and tooling address fields by name either way.
+
+
+class Node:
+    # step:     STEP number from the source
+    # line:     line number in the source file
+    # compiled: code objects for this node's expressions, filled on first use
+    # *_at:     jump targets written by parser.link_blocks
+    __slots__ = ("step", "line", "compiled", "else_at", "end_at", "start_at", "catch_at", "loop_at")
+
+    type = None
+    op = None
+    fields = ()
+
+    def __init__(self, *values):
+        self.step = None
+        self.line = None
+        self.compiled = None
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        node = {"type": self.type}
+        for name in self.fields + Node.__slots__:
+            if hasattr(self, name):
+                node[name] = getattr(self, name)
+        return node
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.fields)
+        return f"{type(self).__name__}({values})"
+
+
+NODE_TYPES = []
+
+
+def node_type(name, type_name, fields=()):
+    cls = type(name, (Node,), {
+        "__slots__": fields,
+        "__module__": __name__,
+        "type": type_name,
+        "op": len(NODE_TYPES),
+        "fields": fields,
+    })
+    NODE_TYPES.append(cls)
+    return cls
+
+
+# === ASSIGNMENT ===
+Assign = node_type("Assign", "assign", ("target", "value"))
+
+# === IMPORTS ===
+Import = node_type("Import", "import", ("lib",))
+ApiKey = node_type("ApiKey", "apikey", ("value",))
+
+# === CONTROL FLOW ===
+If = node_type("If", "if", ("condition",))
+Else = node_type("Else", "else")
+EndIf = node_type("EndIf", "endif")
+For = node_type("For", "for", ("var", "start", "end"))
+EndFor = node_type("EndFor", "endfor")
+# parallel: PARALLEL FOREACH, whose body runs on a process pool (parallel.py)
+ForEach = node_type("ForEach", "foreach", ("var", "iterable", "parallel"))
+EndForEach = node_type("EndForEach", "endforeach")
+While = node_type("While", "while", ("condition",))
+EndWhile = node_type("EndWhile", "endwhile")
+Break = node_type("Break", "break")
+Continue = node_type("Continue", "continue")
+Return = node_type("Return", "return", ("value",))
+Print = node_type("Print", "print", ("value",))
+Raw = node_type("Raw", "raw", ("code",))
+
+# === DATA STRUCTURES ===
+ListCreate = node_type("ListCreate", "list_create", ("name", "value"))
+DictCreate = node_type("DictCreate", "dict_create", ("name", "value"))
+ListAppend = node_type("ListAppend", "list_append", ("list_name", "value"))
+ListRemove = node_type("ListRemove", "list_remove", ("list_name", "value"))
+GetValue = node_type("GetValue", "get_value", ("source", "target"))
+
+# === UTILITIES ===
+Sort = node_type("Sort", "sort", ("source", "target"))
+Filter = node_type("Filter", "filter", ("source", "condition", "target"))
+Map = node_type("Map", "map", ("source", "expression", "target"))
+Reduce = node_type("Reduce", "reduce", ("source", "expression", "target"))
+
+# === STREAMS ===
+Stream = node_type("Stream", "stream", ("source", "target", "lines"))
+Collect = node_type("Collect", "collect", ("source", "target"))
+
+# === ERROR HANDLING ===
+Try = node_type("Try", "try")
+Catch = node_type("Catch", "catch", ("error_var",))
+EndTry = node_type("EndTry", "endtry")
+
+# === FUNCTIONS ===
+Call = node_type("Call", "call", ("func_name", "args", "result"))
+
+# === OOP ===
+CreateInstance = node_type("CreateInstance", "create_instance", ("var", "class_name", "args"))
+
+# === AI PIPELINE ===
+LoadModel = node_type("LoadModel", "load_model", ("model_name", "var"))
+Predict = node_type("Predict", "predict", ("input", "output", "batch"))
+Train = node_type("Train", "train", ("model", "data"))
+
+# === HTTP ===
+Fetch = node_type("Fetch", "fetch", ("source", "target", "all"))
+
+NODES = {cls.type: cls for cls in NODE_TYPES}
@@ -0,0 +1,476 @@
+# explaincode/optimizer.py
+#
+# Optimization pass over a parsed program, run before the compiler emits
+# Python (explaincode -O). Step expressions are rewritten with Python's ast
+# module; the passes, in order:
+#
+#   fold     constant subexpressions become their value (Set x ← 2 * 60 * 60)
+#   prune    IF/WHILE/FOR blocks whose condition or bounds are constant, and
+#            steps after a RETURN, BREAK or CONTINUE in the same block
+#   hoist    leading Set steps of a loop body whose value is a pure
+#            expression of names the loop never changes (by binding them,
+#            or through a call or attribute) move in front of it
+#   dead     Set/LIST/DICT steps binding a name nothing reads, when their
+#            value is a literal
+#
+# Only transformations that cannot change what a program prints, returns or
+# raises are made: anything involving calls, subscripts or attribute access
+# is left alone. Kept and moved steps keep their STEP and line, so source
+# maps and profiles still point at the .epd file.
+
+import ast
+import re
+
+from .nodes import NODES
+
+# Expression fields of each step type
+EXPRESSIONS = {
+    "assign": ("value",),
+    "if": ("condition",),
+    "while": ("condition",),
+    "for": ("start", "end"),
+    "foreach": ("iterable",),
+    "print": ("value",),
+    "return": ("value",),
+    "list_create": ("value",),
+    "dict_create": ("value",),
+    "list_append": ("value",),
+    "list_remove": ("value",),
+    "get_value": ("source",),
+    "filter": ("condition",),
+    "map": ("expression",),
+    "reduce": ("expression",),
+    "predict": ("input",),
+    "train": ("data",),
+    "fetch": ("source",),
+}
+
+# Node type -> the field naming the variable a step binds or changes
+STORES = {
+    "assign": "target",
+    "list_create": "name",
+    "dict_create": "name",
+    "list_append": "list_name",
+    "list_remove": "list_name",
+    "get_value": "target",
+    "sort": "target",
+    "filter": "target",
+    "map": "target",
+    "reduce": "target",
+    "stream": "target",
+    "collect": "target",
+    "for": "var",
+    "foreach": "var",
+    "catch": "error_var",
+    "call": "result",
+    "create_instance": "var",
+    "load_model": "var",
+    "predict": "output",
+    "train": "model",
+    "fetch": "target",
+}
+
+# Steps that run arbitrary code; a loop containing one is never hoisted from
+OPAQUE = ("raw", "call", "create_instance", "load_model", "predict", "train", "stream", "collect",
+          "fetch")
+
+OPENERS = ("if", "for", "foreach", "while", "try")
+CLOSERS = ("endif", "endfor", "endforeach", "endwhile", "endtry")
+TERMINAL = ("return", "break", "continue")
+
+# Dead stores that can be dropped: the binding is the step's only effect
+DROPPABLE = ("assign", "list_create", "dict_create")
+
+NAME_RE = re.compile(r"[A-Za-z_]\w*")
+
+# Folded values larger than this are left as written
+MAX_FOLDED = 256
+
+PURE_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load, ast.Tuple,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+
+def optimize(tree):
+    # A copy of the parsed program with the passes applied; the input is
+    # not modified. Needs ast.unparse (Python 3.9+); on older versions the
+    # program is returned unchanged.
+    if not hasattr(ast, "unparse"):
+        return tree
+    body = [fold(stmt) for stmt in tree["body"]]
+    if _balanced(body):
+        body = hoist(prune(body))
+    body = drop_dead_stores(body)
+    return dict(tree, body=body)
+
+
+# ------------------------------
+# Constant folding
+# ------------------------------
+
+class _Folder(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow) and _constant(node.right) and abs(_number(node.right.value)) > 64:
+            return node
+        return self._fold(node, node.left, node.right)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return self._fold(node, node.operand)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return self._fold(node, *node.values)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        return self._fold(node, node.left, *node.comparators)
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        if _constant(node.test):
+            return node.body if node.test.value else node.orelse
+        return node
+
+    def _fold(self, node, *operands):
+        if not all(_constant(operand) for operand in operands):
+            return node
+        if any(isinstance(operand.value, (str, bytes)) for operand in operands) and isinstance(
+                getattr(node, "op", None), (ast.Mult, ast.LShift, ast.Pow)):
+            return node
+        try:
+            value = eval(compile(ast.fix_missing_locations(ast.Expression(node)), "<fold>", "eval"), {})
+        except Exception:
+            # Left for the program to raise at run time, as written
+            return node
+        if not isinstance(value, (int, float, complex, str, bytes, bool, type(None))) \
+                or len(repr(value)) > MAX_FOLDED:
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+
+def fold_expression(text):
+    # The expression with constant subexpressions folded, or the text as
+    # written if it does not parse or nothing folds
+    if not isinstance(text, str) or not text.strip():
+        return text
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError:
+        return text
+    if isinstance(tree.body, ast.Tuple):
+        # unparse would put parentheses around the whole tuple, and PRINT
+        # "Total:", 1 + 1 would print them; fold each element where it is
+        source = text.strip().encode("utf-8")
+        for element in reversed(tree.body.elts):
+            part = source[element.col_offset:element.end_col_offset].decode("utf-8")
+            folded = fold_expression(part)
+            if folded is not part:
+                source = source[:element.col_offset] + folded.encode("utf-8") + source[element.end_col_offset:]
+        return text if source == text.strip().encode("utf-8") else source.decode("utf-8")
+    before = ast.dump(tree)
+    tree = _Folder().visit(tree)
+    if ast.dump(tree) == before:
+        return text
+    return ast.unparse(tree)
+
+
+def fold(stmt):
+    fields = EXPRESSIONS.get(stmt.type, ())
+    values = {name: fold_expression(stmt[name]) for name in fields}
+    if all(values[name] is stmt[name] for name in fields):
+        return stmt
+    return _replace(stmt, **values)
+
+
+# ------------------------------
+# Unreachable code
+# ------------------------------
+
+def prune(body):
+    # Remove blocks that can never run and steps after a jump out of their
+    # block. Nesting is tracked so the matching END (or ELSE/CATCH) of the
+    # block a jump sits in ends the skipped run.
+    out = []
+    depth = 0
+    skipping = None
+    i = 0
+    while i < len(body):
+        stmt = body[i]
+        t = stmt.type
+        if skipping is not None:
+            if t in OPENERS:
+                depth += 1
+            elif t in CLOSERS:
+                depth -= 1
+                if depth < skipping:
+                    skipping = None
+                    out.append(stmt)
+            elif t in ("else", "catch") and depth == skipping:
+                skipping = None
+                out.append(stmt)
+            i += 1
+            continue
+
+        known = _known_condition(stmt)
+        if known is not None:
+            else_at, end_at = _match(body, i)
+            if stmt.type == "if":
+                kept = body[i + 1:else_at or end_at] if known else (
+                    body[else_at + 1:end_at] if else_at is not None else [])
+                out.extend(prune(kept))
+                i = end_at + 1
+                continue
+            if not known:
+                # A loop that never runs
+                i = end_at + 1
+                continue
+
+        out.append(stmt)
+        if t in OPENERS:
+            depth += 1
+        elif t in CLOSERS:
+            depth -= 1
+        elif t in TERMINAL:
+            skipping = depth
+        i += 1
+    return out
+
+
+def _known_condition(stmt):
+    # True/False when whether an IF branch or a loop runs is known before
+    # the program starts, None otherwise
+    if stmt.type in ("if", "while"):
+        value = _literal(stmt.condition)
+        if value is _UNKNOWN:
+            return None
+        if stmt.type == "while" and value:
+            return None  # runs until a BREAK; nothing to remove
+        return bool(value)
+    if stmt.type == "for":
+        start, end = _literal(stmt.start), _literal(stmt.end)
+        if isinstance(start, int) and isinstance(end, int) and start > end:
+            return False
+    return None
+
+
+# ------------------------------
+# Loop-invariant hoisting
+# ------------------------------
+
+def hoist(body):
+    # Move the leading Set steps of each loop body out in front of the loop
+    # when their value is a pure expression of names the loop never binds
+    # or mutates. Hoisted steps still run once if and only if the loop body
+    # would run at least once: they sit behind an IF on the loop's own entry
+    # test unless that test is known to pass.
+    out = []
+    i = 0
+    while i < len(body):
+        stmt = body[i]
+        if stmt.type not in ("for", "foreach", "while"):
+            out.append(stmt)
+            i += 1
+            continue
+        _, end_at = _match(body, i)
+        inner = hoist(body[i + 1:end_at])
+        moved, guard = _invariants(stmt, inner)
+        if moved:
+            if guard is not None:
+                out.append(_node("if", stmt, condition=guard))
+            out.extend(moved)
+            if guard is not None:
+                out.append(_node("endif", stmt))
+            inner = inner[len(moved):]
+        out.append(stmt)
+        out.extend(inner)
+        out.append(body[end_at])
+        i = end_at + 1
+    return out
+
+
+def _invariants(loop, inner):
+    # (leading steps of the loop body that can be hoisted, the guard
+    # expression to run them behind or None)
+    guard = _entry_test(loop)
+    if guard is _UNKNOWN or any(stmt.type in OPAQUE for stmt in inner):
+        return [], None
+    changed = {stmt[STORES[stmt.type]] for stmt in inner if stmt.type in STORES}
+    changed.add(loop[STORES[loop.type]] if loop.type in STORES else None)
+    # Anything a step calls, passes to a call or takes an attribute of may
+    # be changed in place (PRINT a.pop())
+    for stmt in inner:
+        for name in EXPRESSIONS.get(stmt.type, ()):
+            changed |= _touched_names(stmt[name])
+    header = set()
+    for name in EXPRESSIONS.get(loop.type, ()):
+        header |= _names(loop[name])
+    bound_once = {}
+    for stmt in inner:
+        if stmt.type in STORES:
+            target = stmt[STORES[stmt.type]]
+            bound_once[target] = bound_once.get(target, 0) + 1
+
+    moved = []
+    for stmt in inner:
+        if stmt.type != "assign" or not stmt.target.isidentifier():
+            break
+        names = _pure_names(stmt.value)
+        if names is None or names & changed or stmt.target in header or bound_once[stmt.target] != 1:
+            break
+        moved.append(stmt)
+    return moved, guard
+
+
+def _entry_test(loop):
+    # The expression that decides whether a loop body runs at least once,
+    # None when it always does, _UNKNOWN when it cannot be evaluated up front
+    if loop.type == "while":
+        return loop.condition if _pure_names(loop.condition) is not None else _UNKNOWN
+    if loop.type == "for":
+        if _pure_names(loop.start) is None or _pure_names(loop.end) is None:
+            return _UNKNOWN
+        start, end = _literal(loop.start), _literal(loop.end)
+        if isinstance(start, int) and isinstance(end, int):
+            return None if start <= end else _UNKNOWN
+        # The range the loop iterates, which fails the same way if the
+        # bounds are not integers
+        return f"range({loop.start}, {loop.end}+1)"
+    # FOREACH: only over a non-empty literal, whose iteration cannot fail
+    items = _literal(loop.iterable)
+    if isinstance(items, (list, tuple, str)) and items:
+        return None
+    return _UNKNOWN
+
+
+# ------------------------------
+# Dead stores
+# ------------------------------
+
+def drop_dead_stores(body):
+    # Drop Set/LIST/DICT steps binding a name that no step reads, when the
+    # value is a literal (evaluating it has no effect and cannot fail).
+    # Subscript, attribute and tuple targets (a[0], obj.x, p, q) change or
+    # bind other names, so only plain names are dropped.
+    read = set()
+    for stmt in body:
+        store = STORES.get(stmt.type)
+        for name in stmt.fields:
+            value = stmt[name]
+            if name == store and isinstance(value, str) and value.isidentifier():
+                continue
+            for text in value if isinstance(value, list) else [value]:
+                if isinstance(text, str):
+                    read.update(NAME_RE.findall(text))
+    return [stmt for stmt in body
+            if not (stmt.type in DROPPABLE and stmt[STORES[stmt.type]].isidentifier()
+                    and stmt[STORES[stmt.type]] not in read and _literal(stmt[EXPRESSIONS[stmt.type][0]]) is not _UNKNOWN)]
+
+
+# ------------------------------
+# Helpers
+# ------------------------------
+
+_UNKNOWN = object()
+
+
+def _literal(text):
+    # The value of a literal expression, or _UNKNOWN
+    try:
+        return ast.literal_eval(text.strip())
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError, AttributeError):
+        return _UNKNOWN
+
+
+def _names(text):
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, AttributeError):
+        return set()
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def _touched_names(text):
+    # Names in calls (the function and its arguments) and attribute bases
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, AttributeError):
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Call, ast.Attribute)):
+            names.update(inner.id for inner in ast.walk(node) if isinstance(inner, ast.Name))
+    return names
+
+
+def _pure_names(text):
+    # The names a side-effect-free expression reads (arithmetic, comparisons
+    # and boolean logic over names and constants), or None if it is anything
+    # else
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, AttributeError):
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, PURE_NODES):
+            return None
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+    return names
+
+
+def _constant(node):
+    return isinstance(node, ast.Constant)
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _balanced(body):
+    # Whether every block opener has its terminator, so blocks can be
+    # matched; malformed programs are only folded
+    depth = 0
+    for stmt in body:
+        if stmt.type in OPENERS:
+            depth += 1
+        elif stmt.type in CLOSERS:
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def _match(body, i):
+    # (index of the ELSE/CATCH, index of the END) of the block opened at i
+    depth = 0
+    middle = None
+    for j in range(i + 1, len(body)):
+        t = body[j].type
+        if t in OPENERS:
+            depth += 1
+        elif t in CLOSERS:
+            if depth == 0:
+                return middle, j
+            depth -= 1
+        elif t in ("else", "catch") and depth == 0:
+            middle = j
+    raise SyntaxError(f"STEP {body[i].step}: unterminated block")
+
+
+def _replace(stmt, **values):
+    node = type(stmt)(*[values.get(name, stmt[name]) for name in stmt.fields])
+    node.step, node.line = stmt.step, stmt.line
+    return node
+
+
+def _node(type_name, origin, **values):
+    # A new step of the given type, positioned at the step it was made for
+    cls = NODES[type_name]
+    node = cls(*[values[name] for name in cls.fields])
+    node.step, node.line = origin.step, origin.line
+    return node
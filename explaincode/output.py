@@ -0,0 +1,160 @@
+# explaincode/output.py
+#
+# Output sinks for PRINT. Both engines hand every printed line to a sink's
+# write(); compiled programs get the sink's print() in place of the builtin.
+# Sinks decide how lines are batched and where they end up:
+#
+#   StreamSink      a text stream (stdout by default), buffered
+#   FileSink        a file, buffered
+#   ListSink        a list of lines (batch runner, server responses)
+#   CallbackSink    a function called per line (the old gui_print_fn)
+#   ScrollbackSink  a bounded ring for UIs that drain it once per frame
+#
+# A stream is written directly, so PRINT output stays in order with
+# anything else the program writes to it (a raw print(), sys.stdout.write).
+# While a run is in progress (``with sink:``) a line-buffered stream (a
+# terminal) is switched to block buffering, so a PRINT costs the same
+# C-level print() call as before but reaches the terminal only when the
+# buffer fills, and a flusher thread empties the buffer every
+# FLUSH_SECONDS, so output still appears while a program keeps computing.
+
+import sys
+import builtins
+import functools
+import threading
+from collections import deque
+
+# Bytes buffered before a file is written
+BUFFER_SIZE = 1 << 16
+
+# Longest printed output waits in the buffer during a run
+FLUSH_SECONDS = 0.1
+
+
+class Sink:
+    def write(self, text):
+        # One PRINTed line, without its newline
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        # A run in progress
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def print(self, *values, sep=" ", end="\n", file=None, flush=False):
+        # Stands in for print() in compiled programs. Printing to an explicit
+        # file is passed through to the builtin.
+        if file is not None:
+            builtins.print(*values, sep=sep, end=end, file=file, flush=flush)
+            return
+        text = sep.join(map(str, values))
+        self.write(text if end == "\n" else text + end)
+
+
+class CallbackSink(Sink):
+    def __init__(self, callback):
+        self.write = callback
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.lines = []
+        self.write = self.lines.append
+
+
+class StreamSink(Sink):
+    def __init__(self, stream=None, interval=FLUSH_SECONDS):
+        self.stream = stream if stream is not None else sys.stdout
+        self.interval = interval
+        # The builtin print, straight into the stream
+        self.print = functools.partial(builtins.print, file=self.stream)
+        self._flusher = None
+        self._stop = None
+        self._line_buffering = None
+
+    def write(self, text):
+        self.stream.write(text + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def __enter__(self):
+        if getattr(self.stream, "line_buffering", False) and hasattr(self.stream, "reconfigure"):
+            # Flushed by the flusher thread instead of on every line
+            self.stream.reconfigure(line_buffering=False)
+            self._line_buffering = True
+        if self.interval and self._flusher is None:
+            self._stop = threading.Event()
+            self._flusher = threading.Thread(target=self._flush_every, args=(self._stop,), daemon=True)
+            self._flusher.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._line_buffering:
+            self.stream.reconfigure(line_buffering=True)
+            self._line_buffering = None
+
+    def _flush_every(self, stop):
+        while not stop.wait(self.interval):
+            try:
+                self.stream.flush()
+            except ValueError:  # closed under us
+                return
+
+
+class FileSink(StreamSink):
+    def __init__(self, path, interval=FLUSH_SECONDS, buffer_size=BUFFER_SIZE):
+        self.path = path
+        super().__init__(open(path, "w", encoding="utf-8", buffering=buffer_size), interval)
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+
+
+class ScrollbackSink(Sink):
+    # For a UI that shows the last lines only: keeps at most max_lines
+    # between drains, counting the ones it drops, and calls notify() (from
+    # the writing thread) when the first line after a drain arrives, so one
+    # notification covers any number of lines
+    def __init__(self, max_lines, notify=None):
+        self.notify = notify
+        self._lines = deque(maxlen=max_lines)
+        self._written = 0
+        self._notified = False
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._lines.append(text)
+            self._written += 1
+            if self._notified or self.notify is None:
+                return
+            self._notified = True
+        self.notify()
+
+    def drain(self):
+        # The lines written since the last drain, as text; dropped lines are
+        # replaced by a count
+        with self._lock:
+            lines = list(self._lines)
+            skipped = self._written - len(lines)
+            self._lines.clear()
+            self._written = 0
+            self._notified = False
+        if skipped:
+            lines.insert(0, f"… {skipped} lines not shown …")
+        return "\n".join(lines)
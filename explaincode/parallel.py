@@ -0,0 +1,92 @@
+# explaincode/parallel.py
+#
+# PARALLEL FOREACH: the loop body, compiled into a worker function of the
+# loop variable (compiler.parallel_loop), runs over the items on a process
+# pool. Each chunk of items is sent with the source of the worker function
+# and a pickled snapshot of the variables the body reads; each iteration
+# returns what it PRINTed and what it APPENDed to lists outside the loop,
+# which the caller replays in item order, so the result is the same as a
+# serial FOREACH whatever order the workers finish in.
+#
+# The pool is started on first use and kept for the life of the process.
+# Processes that are themselves pool workers (the batch runner's, the
+# server's) call mark_worker() when they start and run loops in process,
+# rather than each starting a pool of its own.
+
+import os
+import pickle
+import functools
+
+from .output import ListSink
+
+# Worker processes; None for one per core
+WORKERS = None
+
+# Chunks per worker, so a slow chunk does not leave the others idle
+CHUNKS_PER_WORKER = 4
+
+_pool = None
+_pool_workers = None
+# Set by mark_worker()
+_in_worker = False
+
+
+def mark_worker():
+    # Initializer for worker processes of other pools
+    global _in_worker
+    _in_worker = True
+
+
+def parallel_foreach(source, items, shared):
+    # [(printed lines, (appended values per list, ...)), ...] in item order
+    items = list(items)
+    try:
+        payload = pickle.dumps(shared, pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise TypeError(f"PARALLEL FOREACH cannot send {_unpicklable(shared)} to worker processes: {e}") from None
+    workers = WORKERS or os.cpu_count() or 1
+    size = max(1, -(-len(items) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    if len(chunks) <= 1 or workers == 1 or _in_worker:
+        return [result for chunk in chunks for result in _run_chunk(source, payload, chunk)]
+    results = []
+    for part in _executor(workers).map(_run_chunk, [source] * len(chunks), [payload] * len(chunks), chunks):
+        results.extend(part)
+    return results
+
+
+def _executor(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        from concurrent.futures import ProcessPoolExecutor
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_workers = ProcessPoolExecutor(workers, initializer=mark_worker), workers
+    return _pool
+
+
+def _unpicklable(shared):
+    # The first variable that cannot be pickled, for the error message
+    for name, value in shared.items():
+        try:
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return name
+    return "the loop's variables"
+
+
+@functools.lru_cache(maxsize=64)
+def _compiled(source):
+    return compile(source, "<parallel>", "exec")
+
+
+def _run_chunk(source, payload, items):
+    scope = pickle.loads(payload)
+    exec(_compiled(source), scope)
+    iteration = scope["_iteration"]
+    results = []
+    for item in items:
+        output = ListSink()
+        scope["print"] = output.print
+        results.append((output.lines, iteration(item)))
+    return results
@@ -0,0 +1,481 @@
+# explaincode/parser.py
+#
+# The ExplainCode parser shared by both engines. A step's leading keyword
+# selects its handler from STEP_PARSERS in one dict lookup, and every
+# pattern is compiled once at import time. Exact keyword lookup also means
+# FOR can no longer shadow FOREACH (or Set shadow an identifier like
+# "Settings"); anything that is not a known keyword is raw Python.
+
+import re
+
+from .nodes import (
+    Assign, Import, ApiKey, If, Else, EndIf, For, EndFor, ForEach, EndForEach,
+    While, EndWhile, Break, Continue, Return, Print, Raw,
+    ListCreate, DictCreate, ListAppend, ListRemove, GetValue,
+    Sort, Filter, Map, Reduce, Stream, Collect, Try, Catch, EndTry,
+    Call, CreateInstance, LoadModel, Predict, Train, Fetch,
+)
+
+HEADERS = ("ALGORITHM", "MODEL", "API_CALL")
+FOOTERS = ("END ALGORITHM", "END MODEL", "END API_CALL")
+
+# Step number, leading keyword (looked ahead, so it stays part of the
+# content) and content, in a single match
+STEP_RE = re.compile(r"STEP\s+(\d+):?\s*(?=(\w*))(.+)")
+KEYWORD_RE = re.compile(r"\w+")
+# Annotation after the program name in the header
+MEMOIZE_RE = re.compile(r"MEMOIZE\s*(?:\((.*)\))?\s*$")
+MEMOIZE_OPTIONS = {
+    "maxsize": lambda v: v is None or (type(v) is int and v >= 0),
+    "disk": lambda v: type(v) is bool,
+}
+
+ASSIGN_RE = re.compile(r"Set\s+(.+?)\s+←\s+(.+)")
+IMPORT_RE = re.compile(r"Import\s+(\S+)")
+KEY_RE = re.compile(r"KEY:\s*(.*)")
+FOREACH_RE = re.compile(r"FOREACH\s+(\w+)\s+IN\s+(.+?)\s+DO")
+PARALLEL_RE = re.compile(r"PARALLEL\s+(FOREACH\b.*)")
+FOR_RE = re.compile(r"FOR\s+(.+?)\s+←\s+(.+?)\s+to\s+(.+?)\s+DO")
+WHILE_RE = re.compile(r"WHILE\b\s*(.+?)(?:\s*\bDO)?\s*$")
+IF_RE = re.compile(r"IF\b\s*(.+?)(?:\s*\bTHEN)?\s*$")
+END_RE = re.compile(r"END\s+(\w+)")
+RETURN_RE = re.compile(r"RETURN\s*(.*)")
+PRINT_RE = re.compile(r"PRINT\s*(.*)")
+LIST_RE = re.compile(r"LIST\s+(\w+)\s+←\s+(.+)")
+DICT_RE = re.compile(r"DICT\s+(\w+)\s+←\s+(.+)")
+APPEND_RE = re.compile(r"APPEND\s+(\w+)\s+←\s+(.+)")
+REMOVE_RE = re.compile(r"REMOVE\s+(\w+)\s+←\s+(.+)")
+GET_RE = re.compile(r"GET\s+(.+?)\s+→\s+(\w+)")
+SORT_RE = re.compile(r"SORT\s+(\w+)\s*(?:→\s*(\w+))?")
+FILTER_RE = re.compile(r"FILTER\s+(\w+)\s+WHERE\s+(.+?)\s+→\s+(\w+)")
+MAP_RE = re.compile(r"MAP\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)")
+REDUCE_RE = re.compile(r"REDUCE\s+(\w+)\s+WITH\s+(.+?)\s+→\s+(\w+)")
+STREAM_RE = re.compile(r"STREAM\s+(?:(FILE)\s+)?(.+?)\s+→\s+(\w+)")
+COLLECT_RE = re.compile(r"COLLECT\s+(\w+)\s*(?:→\s*(\w+))?")
+CATCH_RE = re.compile(r"CATCH\s+(\w+)")
+CALL_RE = re.compile(r"CALL\s+(\w+)\((.*?)\)\s*(?:→\s*(\w+))?")
+CREATE_RE = re.compile(r"CREATE\s+(\w+)\s+←\s+(\w+)\((.*?)\)")
+LOAD_MODEL_RE = re.compile(r"LOAD_MODEL\s+[\"'](.+?)[\"']\s*(?:→\s*(\w+))?")
+PREDICT_RE = re.compile(r"PREDICT\s+(?:(ALL)\s+)?(.+?)\s+→\s+(\w+)")
+TRAIN_RE = re.compile(r"TRAIN\s+(\w+)\s+ON\s+(.+)")
+FETCH_RE = re.compile(r"FETCH\s+(?:(ALL)\s+)?(.+?)\s+→\s+(\w+)")
+
+END_TYPES = {
+    "IF": EndIf,
+    "FOR": EndFor,
+    "FOREACH": EndForEach,
+    "WHILE": EndWhile,
+    "TRY": EndTry,
+}
+
+
+def _args(text):
+    return [a.strip() for a in text.split(",")] if text else []
+
+
+# Each handler gets the step content and returns the node, or None when the
+# keyword is right but the rest of the step is malformed.
+
+# === ASSIGNMENT ===
+def _assign(content):
+    m = ASSIGN_RE.match(content)
+    if m:
+        return Assign(m.group(1), m.group(2))
+
+
+# === IMPORTS ===
+def _import(content):
+    m = IMPORT_RE.match(content)
+    if m:
+        return Import(m.group(1))
+
+
+def _apikey(content):
+    m = KEY_RE.match(content)
+    if m:
+        return ApiKey(m.group(1).strip())
+    return _raw(content)
+
+
+# === CONTROL FLOW ===
+def _foreach(content, parallel=False):
+    m = FOREACH_RE.match(content)
+    if m:
+        return ForEach(m.group(1), m.group(2), parallel)
+
+
+def _parallel(content):
+    m = PARALLEL_RE.match(content)
+    if m:
+        return _foreach(m.group(1), True)
+
+
+def _for(content):
+    m = FOR_RE.match(content)
+    if m:
+        return For(m.group(1), m.group(2), m.group(3))
+
+
+def _while(content):
+    m = WHILE_RE.match(content)
+    if m:
+        return While(m.group(1))
+
+
+def _if(content):
+    m = IF_RE.match(content)
+    if m:
+        return If(m.group(1))
+
+
+def _else(content):
+    return Else()
+
+
+def _end(content):
+    m = END_RE.match(content)
+    if m and m.group(1) in END_TYPES:
+        return END_TYPES[m.group(1)]()
+
+
+def _return(content):
+    return Return(RETURN_RE.match(content).group(1).strip())
+
+
+def _print(content):
+    return Print(PRINT_RE.match(content).group(1).strip())
+
+
+def _break(content):
+    return Break()
+
+
+def _continue(content):
+    return Continue()
+
+
+# === DATA STRUCTURES ===
+def _list(content):
+    m = LIST_RE.match(content)
+    if m:
+        return ListCreate(m.group(1), m.group(2))
+
+
+def _dict(content):
+    m = DICT_RE.match(content)
+    if m:
+        return DictCreate(m.group(1), m.group(2))
+
+
+def _append(content):
+    m = APPEND_RE.match(content)
+    if m:
+        return ListAppend(m.group(1), m.group(2))
+
+
+def _remove(content):
+    m = REMOVE_RE.match(content)
+    if m:
+        return ListRemove(m.group(1), m.group(2))
+
+
+def _get(content):
+    m = GET_RE.match(content)
+    if m:
+        return GetValue(m.group(1), m.group(2))
+
+
+# === UTILITIES ===
+def _sort(content):
+    m = SORT_RE.match(content)
+    if m:
+        return Sort(m.group(1), m.group(2) or m.group(1))
+
+
+def _filter(content):
+    m = FILTER_RE.match(content)
+    if m:
+        return Filter(m.group(1), m.group(2), m.group(3))
+
+
+def _map(content):
+    m = MAP_RE.match(content)
+    if m:
+        return Map(m.group(1), m.group(2), m.group(3))
+
+
+def _reduce(content):
+    m = REDUCE_RE.match(content)
+    if m:
+        return Reduce(m.group(1), m.group(2), m.group(3))
+
+
+# === STREAMS ===
+def _stream(content):
+    m = STREAM_RE.match(content)
+    if m:
+        return Stream(m.group(2), m.group(3), bool(m.group(1)))
+
+
+def _collect(content):
+    m = COLLECT_RE.match(content)
+    if m:
+        return Collect(m.group(1), m.group(2) or m.group(1))
+
+
+# === ERROR HANDLING ===
+def _try(content):
+    return Try()
+
+
+def _catch(content):
+    m = CATCH_RE.match(content)
+    return Catch(m.group(1) if m else "error")
+
+
+# === FUNCTIONS ===
+def _call(content):
+    m = CALL_RE.match(content)
+    if m:
+        return Call(m.group(1), _args(m.group(2)), m.group(3))
+
+
+# === OOP ===
+def _create(content):
+    m = CREATE_RE.match(content)
+    if m:
+        return CreateInstance(m.group(1), m.group(2), _args(m.group(3)))
+
+
+# === AI PIPELINE ===
+def _load_model(content):
+    m = LOAD_MODEL_RE.match(content)
+    if m:
+        return LoadModel(m.group(1), m.group(2) or "model")
+
+
+def _predict(content):
+    m = PREDICT_RE.match(content)
+    if m:
+        return Predict(m.group(2), m.group(3), bool(m.group(1)))
+
+
+def _train(content):
+    m = TRAIN_RE.match(content)
+    if m:
+        return Train(m.group(1), m.group(2))
+
+
+# === HTTP ===
+def _fetch(content):
+    m = FETCH_RE.match(content)
+    if m:
+        return Fetch(m.group(2), m.group(3), bool(m.group(1)))
+
+
+def _raw(content):
+    return Raw(content)
+
+
+STEP_PARSERS = {
+    "Set": _assign,
+    "Import": _import,
+    "KEY": _apikey,
+    "FOREACH": _foreach,
+    "PARALLEL": _parallel,
+    "FOR": _for,
+    "WHILE": _while,
+    "IF": _if,
+    "ELSE": _else,
+    "END": _end,
+    "RETURN": _return,
+    "PRINT": _print,
+    "BREAK": _break,
+    "CONTINUE": _continue,
+    "LIST": _list,
+    "DICT": _dict,
+    "APPEND": _append,
+    "REMOVE": _remove,
+    "GET": _get,
+    "SORT": _sort,
+    "FILTER": _filter,
+    "MAP": _map,
+    "REDUCE": _reduce,
+    "STREAM": _stream,
+    "COLLECT": _collect,
+    "TRY": _try,
+    "CATCH": _catch,
+    "CALL": _call,
+    "CREATE": _create,
+    "LOAD_MODEL": _load_model,
+    "PREDICT": _predict,
+    "TRAIN": _train,
+    "FETCH": _fetch,
+}
+
+
+def parse_content(content):
+    # The node for one step's content (the text after "STEP n:"), or None if
+    # it starts with a keyword but is malformed
+    m = KEYWORD_RE.match(content)
+    handler = STEP_PARSERS.get(m.group()) if m else None
+    if handler is None:
+        return _raw(content)
+    return handler(content)
+
+
+def parse_memoize(text):
+    # The options given to a MEMOIZE annotation ("maxsize=10000, disk=True")
+    # as a dict; memo.memoize has the defaults for the rest
+    import ast  # only headers with options need it
+    options = {}
+    for part in filter(None, (p.strip() for p in (text or "").split(","))):
+        name, _, value = (x.strip() for x in part.partition("="))
+        if name not in MEMOIZE_OPTIONS:
+            raise SyntaxError(f"MEMOIZE: unknown option {name!r} (expected maxsize or disk)")
+        try:
+            options[name] = ast.literal_eval(value)
+            valid = MEMOIZE_OPTIONS[name](options[name])
+        except (ValueError, SyntaxError):
+            valid = False
+        if not valid:
+            raise SyntaxError(f"MEMOIZE: invalid {name} {value!r}")
+    return options
+
+
+class ExplainParser:
+    def __init__(self):
+        self.ast = {
+            "function_name": "",
+            # The header keyword: ALGORITHM, MODEL or API_CALL
+            "kind": "",
+            # MEMOIZE options from the header, None without MEMOIZE
+            "memoize": None,
+            "inputs": [],
+            "body": []
+        }
+
+    def parse(self, lines):
+        # Source line numbers are kept for source maps and error positions
+        lines = [(number, line.strip()) for number, line in enumerate(lines, 1)]
+        lines = [(number, line) for number, line in lines if line and not line.startswith("#")]
+
+        if not lines or not lines[0][1].startswith(HEADERS):
+            raise SyntaxError("File must start with ALGORITHM, MODEL, or API_CALL.")
+
+        header = lines[0][1].split(None, 2)
+        self.ast["kind"], self.ast["function_name"] = header[:2]
+        memoize = MEMOIZE_RE.match(header[2]) if len(header) > 2 else None
+        if memoize:
+            if self.ast["kind"] == "API_CALL":
+                raise SyntaxError("MEMOIZE is not supported for API_CALL programs")
+            self.ast["memoize"] = parse_memoize(memoize.group(1))
+        self.ast["line"] = lines[0][0]
+
+        body = self.ast["body"]
+        for number, line in lines[1:]:
+            if line.startswith("STEP"):
+                step = self._parse_step(line, number)
+                if step:
+                    step.line = number
+                    body.append(step)
+            elif line.startswith("INPUT:"):
+                self.ast["inputs"] = [x.strip() for x in line[len("INPUT:"):].split(",")]
+            elif line.startswith("OUTPUT:"):
+                continue  # Optional
+            elif line.startswith(FOOTERS):
+                break
+
+        return self.ast
+
+    def _parse_step(self, line, line_number):
+        match = STEP_RE.match(line)
+        if not match:
+            return None
+        number, keyword, content = match.groups()
+        handler = STEP_PARSERS.get(keyword)
+        step = handler(content) if handler is not None else _raw(content)
+        if step is None:
+            # A keyword step that does not match its form (APPEND out←n)
+            raise SyntaxError(f"STEP {number} (line {line_number}): malformed {keyword} step: {content}")
+        step.step = int(number)
+        return step
+
+
+# ------------------------------
+# Block structure
+# ------------------------------
+
+# Which terminator closes which header, and the keywords used for them in
+# nesting errors.
+BLOCK_ENDS = {
+    "endif": "if",
+    "endfor": "for",
+    "endforeach": "foreach",
+    "endwhile": "while",
+    "endtry": "try",
+}
+LOOP_TYPES = ("for", "foreach", "while")
+KEYWORDS = {
+    "if": "IF", "else": "ELSE", "endif": "END IF",
+    "for": "FOR", "endfor": "END FOR",
+    "foreach": "FOREACH", "endforeach": "END FOREACH",
+    "while": "WHILE", "endwhile": "END WHILE",
+    "try": "TRY", "catch": "CATCH", "endtry": "END TRY",
+    "break": "BREAK", "continue": "CONTINUE",
+}
+
+
+def link_blocks(body):
+    # One pass over the body that records jump targets on every
+    # control-flow node, so the interpreter never scans for a matching
+    # terminator at run time:
+    #   if      -> else_at (optional), end_at
+    #   else    -> end_at
+    #   loops   -> end_at;   their terminators -> start_at
+    #   try     -> catch_at, end_at;   catch -> end_at
+    #   break / continue -> loop_at (the enclosing loop header)
+    blocks = []
+    loops = []
+    for i, stmt in enumerate(body):
+        t = stmt["type"]
+        if t in ("if", "try") or t in LOOP_TYPES:
+            blocks.append(i)
+            if t in LOOP_TYPES:
+                loops.append(i)
+        elif t in ("else", "catch"):
+            opener_type = "if" if t == "else" else "try"
+            if not blocks or body[blocks[-1]]["type"] != opener_type:
+                _nesting_error(stmt, f"{KEYWORDS[t]} outside of {KEYWORDS[opener_type]}")
+            opener = body[blocks[-1]]
+            key = t + "_at"
+            if key in opener:
+                _nesting_error(stmt, f"duplicate {KEYWORDS[t]} for {KEYWORDS[opener_type]}")
+            opener[key] = i
+        elif t in BLOCK_ENDS:
+            opener_type = BLOCK_ENDS[t]
+            if not blocks or body[blocks[-1]]["type"] != opener_type:
+                _nesting_error(stmt, f"{KEYWORDS[t]} without matching {KEYWORDS[opener_type]}")
+            start = blocks.pop()
+            opener = body[start]
+            if opener_type == "try" and "catch_at" not in opener:
+                _nesting_error(opener, "TRY without CATCH")
+            opener["end_at"] = i
+            stmt["start_at"] = start
+            for key in ("else_at", "catch_at"):
+                if key in opener:
+                    body[opener[key]]["end_at"] = i
+            if opener_type in LOOP_TYPES:
+                loops.pop()
+        elif t in ("break", "continue"):
+            if not loops:
+                _nesting_error(stmt, f"{KEYWORDS[t]} outside of a loop")
+            stmt["loop_at"] = loops[-1]
+    if blocks:
+        opener = body[blocks[-1]]
+        closer = next(k for k, v in BLOCK_ENDS.items() if v == opener["type"])
+        _nesting_error(opener, f"{KEYWORDS[opener['type']]} without {KEYWORDS[closer]}")
+
+
+def _nesting_error(stmt, message):
+    raise SyntaxError(f"STEP {stmt.get('step', '?')}: {message}")
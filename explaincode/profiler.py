@@ -0,0 +1,151 @@
+# explaincode/profiler.py
+#
+# Per-STEP profiling for both engines. The step interpreter times each
+# statement it runs; compiled programs are traced line by line, and since
+# their code carries .epd line numbers (see sourcemap.py) each line is
+# charged to its STEP. Every STEP gets a hit count, cumulative wall time and,
+# with memory=True, the net bytes allocated while it ran (tracemalloc).
+#
+# Nothing here is touched unless a profiler is passed in, so runs without
+# --profile pay nothing for it.
+
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StepProfiler:
+    def __init__(self, memory=True):
+        self.memory = memory
+        # step -> [hits, seconds, allocated bytes]
+        self.stats = {}
+        # step -> label shown in reports, and its source line
+        self.labels = {}
+        self.lines = {}
+        self._started_tracemalloc = False
+
+    def describe(self, ast):
+        for stmt in ast["body"]:
+            if stmt.get("step") is not None:
+                self.labels.setdefault(stmt["step"], stmt["type"])
+                if stmt.get("line") is not None:
+                    self.lines.setdefault(stmt["step"], stmt["line"])
+
+    @contextmanager
+    def running(self):
+        # tracemalloc is only started (and stopped) here if nothing else
+        # already runs it
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        try:
+            yield self
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def record(self, step, seconds, allocated=0):
+        entry = self.stats.get(step)
+        if entry is None:
+            entry = self.stats[step] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += allocated
+
+    @contextmanager
+    def tracing(self, function, steps):
+        # Profile calls to a compiled program's function: every line event
+        # in its frame closes the previous line's interval and charges it to
+        # that line's STEP. Inner frames (comprehensions, library calls) are
+        # not traced; their time lands on the line that made the call.
+        code = function.__code__
+        clock = time.perf_counter
+        memory = tracemalloc.get_traced_memory if self.memory else None
+        record = self.record
+
+        def local(frame, event, arg):
+            state = frame_state.get(frame)
+            now = clock()
+            used = memory()[0] if memory else 0
+            if state is not None:
+                step, since, used_before = state
+                if step is not None:
+                    record(step, now - since, used - used_before)
+            if event == "line":
+                frame_state[frame] = (steps.get(frame.f_lineno), now, used)
+            elif event == "return":
+                frame_state.pop(frame, None)
+            return local
+
+        def trace(frame, event, arg):
+            if frame.f_code is code:
+                return local
+            return None
+
+        frame_state = {}
+        previous = sys.gettrace()
+        with self.running():
+            sys.settrace(trace)
+            try:
+                yield self
+            finally:
+                sys.settrace(previous)
+
+    def rows(self):
+        # [(step, hits, seconds, allocated)], most time first
+        rows = [(step, hits, seconds, allocated)
+                for step, (hits, seconds, allocated) in self.stats.items()]
+        rows.sort(key=lambda row: -row[2])
+        return rows
+
+    def report(self, limit=None):
+        total = sum(seconds for _, _, seconds, _ in self.rows()) or 1.0
+        lines = [f"{'STEP':>6} {'hits':>10} {'total ms':>10} {'%':>6} {'us/hit':>9} {'alloc KiB':>10}  what"]
+        for step, hits, seconds, allocated in self.rows()[:limit]:
+            lines.append(f"{step:>6} {hits:>10} {seconds * 1e3:>10.2f} {seconds / total * 100:>6.1f}"
+                         f" {seconds / hits * 1e6:>9.2f} {allocated / 1024:>10.1f}  {self.labels.get(step, '')}")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return {"steps": [
+            {"step": step, "line": self.lines.get(step), "label": self.labels.get(step, ""), "hits": hits,
+             "seconds": seconds, "allocated_bytes": allocated}
+            for step, hits, seconds, allocated in self.rows()
+        ]}
+
+    def to_speedscope(self, name="explaincode"):
+        # A sampled profile with one weighted sample per STEP, nested under
+        # the program, which speedscope shows as a flame graph and table
+        rows = self.rows()
+        frames = [{"name": name}]
+        for step, *_ in rows:
+            frame = {"name": f"STEP {step}: {self.labels.get(step, '')}"}
+            if step in self.lines:
+                frame.update(file=name, line=self.lines[step])
+            frames.append(frame)
+        weights = [seconds for _, _, seconds, _ in rows]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "explaincode",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": [[0, i + 1] for i in range(len(rows))],
+                "weights": weights,
+            }],
+        }
+
+    def save(self, path, name="explaincode"):
+        # *.speedscope.json gets the speedscope format, anything else the
+        # plain per-STEP JSON
+        data = self.to_speedscope(name) if path.endswith(".speedscope.json") else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
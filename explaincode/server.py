@@ -0,0 +1,205 @@
+# explaincode/server.py
+#
+# Long-running execution server. Programs are compiled once and kept in
+# memory (keyed by source hash), loaded models stay in each worker's model
+# registry, and every request runs on a warm worker pool:
+#
+#     explaincode-server --port 8765 --workers 4
+#
+#     POST /run  {"program": "<ExplainCode source>", "inputs": {"A": [3, 9, 2], "n": 3}}
+#            or  {"path": "examples/find_max.epd", "inputs": [[3, 9, 2], 3]}
+#       -> 200 {"result": 9, "output": [], "elapsed_ms": 0.2}
+#     GET  /health
+#
+# Inputs come from the request (by name or by position), never from stdin.
+#
+# The server has no authentication: any client can run arbitrary Python and
+# read any file the server can. It only listens on loopback addresses unless
+# started with --allow-remote.
+#
+# Every run can be held to a budget (--max-steps, --max-seconds,
+# --max-memory); a run that exceeds it gets a 500 with "type":
+# "BudgetExceeded" and a "budget" object with the kind, limit and amount used.
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import cache, deps, parallel
+from .budget import Budget, BudgetExceeded
+from .compiler import bind_inputs, call_program, compile_program, load_program
+from .output import ListSink
+
+PROGRAM_CACHE_SIZE = 256
+
+# Per worker process (or shared by worker threads)
+_programs = OrderedDict()
+_programs_lock = threading.Lock()
+
+
+def get_program(source=None, path=None, budgeted=False):
+    if path is not None:
+        # The on-disk cache already avoids recompiling unchanged files
+        return load_program(path, budgeted=budgeted)
+    key = (cache.source_hash(source), budgeted)
+    with _programs_lock:
+        program = _programs.get(key)
+        if program is not None:
+            _programs.move_to_end(key)
+            return program
+    program = compile_program(source, "<request>", budgeted=budgeted)
+    with _programs_lock:
+        _programs[key] = program
+        if len(_programs) > PROGRAM_CACHE_SIZE:
+            _programs.popitem(last=False)
+    return program
+
+
+def execute(source=None, path=None, inputs=None, limits=None):
+    # Runs in a worker; returns something JSON-serializable
+    start = time.perf_counter()
+    try:
+        program = get_program(source, path, budgeted=limits is not None)
+    except (SyntaxError, OSError, ValueError) as e:
+        return {"status": 400, "error": str(e), "type": type(e).__name__}
+    try:
+        args = bind_inputs(program, inputs)
+    except ValueError as e:
+        return {"status": 400, "error": str(e), "type": type(e).__name__}
+
+    output = ListSink()
+    scope = {"print": output.print}
+    try:
+        deps.ensure(program["requires"], path)
+        exec(program["code"], scope)
+        if limits is not None:
+            Budget(**limits).attach(scope)
+        result = call_program(scope[program["function_name"]], args)
+    except BudgetExceeded as e:
+        return {"status": 500, "error": str(e), "type": type(e).__name__, "budget": e.to_dict(), "output": output.lines}
+    except Exception as e:
+        return {"status": 500, "error": str(e), "type": type(e).__name__, "output": output.lines}
+    return {
+        "status": 200,
+        "result": _jsonable(result),
+        "output": output.lines,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return json.loads(json.dumps(value, default=str))
+
+
+class ExplainCodeHandler(BaseHTTPRequestHandler):
+    server_version = "ExplainCode/2.0"
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": "Not found"})
+        self._reply(200, {"status": "ok", "workers": self.server.workers})
+
+    def do_POST(self):
+        if self.path != "/run":
+            return self._reply(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            source, path = request.get("program"), request.get("path")
+            if (source is None) == (path is None):
+                raise ValueError("give exactly one of 'program' or 'path'")
+        except ValueError as e:
+            return self._reply(400, {"error": f"Bad request: {e}"})
+
+        response = self.server.pool.submit(execute, source, path, request.get("inputs"), self.server.limits).result()
+        self._reply(response.pop("status"), response)
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ExplainCodeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, processes=True, verbose=False, budget=None):
+        super().__init__(address, ExplainCodeHandler)
+        self.workers = workers or os.cpu_count() or 1
+        if processes:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=parallel.mark_worker)
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.verbose = verbose
+        # Each run gets its own Budget built from these
+        self.limits = budget.limits() if budget is not None else None
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def is_loopback(host):
+    # Whether every address host resolves to is a loopback address
+    import socket
+    import ipaddress
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split("%")[0]).is_loopback for info in infos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ExplainCode 2.0 Execution Server")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow --host to be an address other machines can reach; anyone who can connect can run arbitrary code")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("-w", "--workers", type=int, help="Number of workers (default: one per core)")
+    parser.add_argument("--threads", action="store_true", help="Run programs on worker threads in this process instead of worker processes")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    parser.add_argument("--max-steps", type=int, metavar="N", help="Stop a run with an error after N steps")
+    parser.add_argument("--max-seconds", type=float, metavar="S", help="Stop a run with an error after S seconds of wall time")
+    parser.add_argument("--max-memory", type=float, metavar="MB", help="Stop a run with an error once its worker process has grown by MB megabytes")
+    args = parser.parse_args()
+    if not is_loopback(args.host):
+        if not args.allow_remote:
+            parser.error(f"--host {args.host} is reachable from other machines, and the server runs any code it is"
+                         " sent without authentication; pass --allow-remote to listen there anyway")
+        print(f"⚠️  WARNING: listening on {args.host} without authentication; anyone who can connect can run"
+              " arbitrary code and read files as this user", file=sys.stderr)
+
+    budget = Budget(args.max_steps, args.max_seconds,
+                    int(args.max_memory * 1024 * 1024) if args.max_memory is not None else None)
+    server = ExplainCodeServer((args.host, args.port), args.workers, processes=not args.threads, verbose=args.verbose,
+                               budget=budget if budget.limited else None)
+    print(f"🚀 ExplainCode server on http://{args.host}:{args.port} ({server.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
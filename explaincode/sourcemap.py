@@ -0,0 +1,75 @@
+# explaincode/sourcemap.py
+#
+# Source maps for compiled programs. The compiler records, for every line of
+# generated Python, the .epd line and STEP it came from. The code object is
+# then built with those positions and the program's real filename, so
+# tracebacks, cProfile, py-spy and coverage all report file.epd:line directly
+# and show the STEP text; the table itself stays available for mapping
+# generated (saved) Python back to the source.
+
+import ast
+import json
+
+
+def steps_by_line(source_map):
+    # {source line: STEP} from a generated-line table of (line, step) or None
+    return {entry[0]: entry[1] for entry in source_map if entry is not None}
+
+
+def compile_mapped(py_code, source_map, source_lines, filename, header_line=1):
+    # Compile generated code so each node carries the position of the .epd
+    # line it came from. The column range spans the whole source line, so
+    # tracebacks quote the STEP without a misleading caret.
+    tree = ast.parse(py_code, filename)
+    for node in ast.walk(tree):
+        if not hasattr(node, "lineno"):
+            continue
+        entry = source_map[node.lineno] if node.lineno < len(source_map) else None
+        line = entry[0] if entry is not None else header_line
+        text = source_lines[line - 1] if 0 < line <= len(source_lines) else ""
+        node.lineno = node.end_lineno = line
+        node.col_offset = 0
+        node.end_col_offset = len(text.encode("utf-8"))
+    return compile(tree, filename, "exec")
+
+
+def locate(error, filename, steps):
+    # (line, step) of the innermost traceback frame in the program, or None
+    found = None
+    tb = error.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == filename:
+            found = (tb.tb_lineno, steps.get(tb.tb_lineno))
+        tb = tb.tb_next
+    return found
+
+
+def annotate(error, filename, steps):
+    # Record where in the .epd file a runtime error happened, as
+    # ``error.explaincode_location`` = (filename, line, step) and, where
+    # supported, a traceback note
+    found = locate(error, filename, steps)
+    if found is None:
+        return error
+    return mark(error, filename, *found)
+
+
+def mark(error, filename, line, step):
+    if getattr(error, "explaincode_location", None) is None:
+        error.explaincode_location = (filename, line, step)
+        if hasattr(error, "add_note"):
+            error.add_note(describe(error.explaincode_location))
+    return error
+
+
+def describe(location):
+    filename, line, step = location
+    return f"at STEP {step} ({filename}:{line})" if step is not None else f"at {filename}:{line}"
+
+
+def save(path, filename, source_map):
+    # The table as JSON: generated line -> [source line, STEP], for tools
+    # reading saved Python
+    lines = {str(number): list(entry) for number, entry in enumerate(source_map) if entry is not None}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"file": filename, "lines": lines}, f, indent=2)
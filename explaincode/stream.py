@@ -0,0 +1,22 @@
+# explaincode/stream.py
+#
+# Lazy data sources for STREAM steps. FILTER and MAP over a stream produce
+# generators instead of lists, so a chain of them is a single pass over the
+# input; the data is only materialized by SORT, COLLECT or RETURN.
+
+from collections.abc import Iterator
+
+
+def is_stream(value):
+    return isinstance(value, Iterator)
+
+
+def read_lines(path):
+    # One line at a time, without the trailing newline, in constant memory
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def open_stream(value, lines=False):
+    return read_lines(value) if lines else iter(value)
@@ -0,0 +1,251 @@
+# explaincode/vector.py
+#
+# NumPy fast path for FILTER and MAP. When the source is an array and the
+# expression only does element-wise arithmetic and comparisons on ``x``, the
+# expression is evaluated once with ``x`` bound to the whole array instead of
+# once per element. On request, large homogeneous numeric lists are turned
+# into arrays first; the results then stay arrays, so a chain of steps runs
+# vectorized end to end (converting back per step would cost as much as the
+# plain loop). NumPy is optional and only imported when this path is taken.
+#
+# The step interpreter calls as_array() and vector_filter()/vector_map()
+# itself; programs compiled with vectorize=True call compiled_filter() and
+# compiled_map(), which take the same path and fall back to the plain loop.
+#
+# Results must be the ones Python gives. NumPy integers wrap around at 64
+# bits, so integer expressions are only vectorized when bounds worked out
+# from the array's minimum and maximum show every value fits. Division by
+# zero, negative integer powers and float overflow, which Python raises for,
+# are left to the plain loop, which then raises the same errors.
+
+import ast
+import functools
+
+# Lists shorter than this are not worth converting
+VECTOR_MIN_SIZE = 10000
+
+INT64_MAX = 2 ** 63 - 1
+
+# Integers up to this size convert to float64 exactly, so comparing them
+# with floats or dividing them gives what Python gives
+EXACT_FLOAT_INT = 2 ** 53
+
+_ELEMENTWISE_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Name, ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def is_array(value):
+    cls = type(value)
+    return cls.__name__ == "ndarray" and cls.__module__ == "numpy"
+
+
+@functools.lru_cache(maxsize=1024)
+def _tree(expr):
+    try:
+        return ast.parse(expr, mode="eval")
+    except SyntaxError:
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def _free_names(expr):
+    # Names an element-wise expression reads besides ``x``, or None when the
+    # expression is not element-wise (calls, subscripts, and/or, ...).
+    tree = _tree(expr)
+    if tree is None:
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ELEMENTWISE_NODES):
+            return None
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float, bool):
+            return None
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Compare) and len(node.ops) > 1:
+            # a < x < b has no element-wise equivalent
+            return None
+    if "x" not in names:
+        return None
+    names.discard("x")
+    return frozenset(names)
+
+
+def as_array(source, expr, env, lists=False):
+    # The array to evaluate ``expr`` over, or None to fall back to the
+    # per-element path.
+    names = _free_names(expr)
+    if names is None:
+        return None
+    if any(type(env.get(name)) not in (int, float, bool) for name in names):
+        return None
+    if is_array(source):
+        return source if _fits(expr, source, env) else None
+    if not lists or not isinstance(source, list) or len(source) < VECTOR_MIN_SIZE:
+        return None
+    # Only homogeneous lists keep their element types through NumPy
+    kinds = set(map(type, source))
+    if kinds != {int} and kinds != {float}:
+        return None
+    numpy = _numpy()
+    if numpy is None:
+        return None
+    dtype = numpy.int64 if kinds == {int} else numpy.float64
+    try:
+        array = numpy.fromiter(source, dtype=dtype, count=len(source))
+    except OverflowError:
+        return None
+    return array if _fits(expr, array, env) else None
+
+
+def _fits(expr, array, env):
+    # Whether NumPy gives Python's result for expr over every element
+    if array.dtype.kind == "f":
+        x = False
+    elif array.dtype.kind == "i":
+        x = (int(array.min()), int(array.max())) if array.size else (0, 0)
+    else:
+        return False
+    return _bounds(_tree(expr).body, x, env) is not None
+
+
+def _bounds(node, x, env):
+    # (low, high) for an integer expression, False for a float one, or None
+    # when NumPy could give a different result than Python. x is that for
+    # the array's elements.
+    if isinstance(node, ast.Name):
+        if node.id == "x":
+            return x
+        node = ast.Constant(env[node.id])
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, float):
+            return False
+        value = int(node.value)
+        return (value, value) if -INT64_MAX <= value <= INT64_MAX else None
+    if any(isinstance(child, ast.Compare) for child in (getattr(node, "operand", None),
+                                                       getattr(node, "left", None), getattr(node, "right", None))):
+        # Arithmetic on NumPy booleans is logical: True + True is True
+        return None
+    if isinstance(node, ast.UnaryOp):
+        operand = _bounds(node.operand, x, env)
+        if operand and isinstance(node.op, ast.USub):
+            return -operand[1], -operand[0]
+        return operand
+    if isinstance(node, ast.Compare):
+        left, right = _bounds(node.left, x, env), _bounds(node.comparators[0], x, env)
+        if left is None or right is None:
+            return None
+        # Python compares an int with a float exactly, NumPy as floats
+        if (left is False) != (right is False) and not _exact(left or right):
+            return None
+        return 0, 1
+    left, right = _bounds(node.left, x, env), _bounds(node.right, x, env)
+    if left is None or right is None:
+        return None
+    op = node.op
+    if isinstance(op, (ast.Div, ast.FloorDiv, ast.Mod)) and right and right[0] <= 0 <= right[1]:
+        # Python raises ZeroDivisionError
+        return None
+    if left is False or right is False:
+        # Float arithmetic, where NumPy and Python agree; what they do not
+        # agree on is caught by the errstate() in _evaluate
+        return False
+    (a, b), (c, d) = left, right
+    if isinstance(op, ast.Div):
+        return False if _exact(left) and _exact(right) else None
+    if isinstance(op, ast.Pow):
+        if c < 0:
+            # A float in Python, an error in NumPy
+            return None
+        base = max(abs(a), abs(b))
+        if base > 1 and d > 63:
+            return None
+        high = base ** d
+        low = -high
+    elif isinstance(op, ast.Add):
+        low, high = a + c, b + d
+    elif isinstance(op, ast.Sub):
+        low, high = a - d, b - c
+    elif isinstance(op, ast.Mult):
+        products = (a * c, a * d, b * c, b * d)
+        low, high = min(products), max(products)
+    elif isinstance(op, ast.FloorDiv):
+        high = max(abs(a), abs(b))
+        low = -high
+    else:
+        high = max(abs(c), abs(d)) - 1
+        low = -high
+    return (low, high) if -INT64_MAX <= low and high <= INT64_MAX else None
+
+
+def _exact(bounds):
+    return -EXACT_FLOAT_INT <= bounds[0] and bounds[1] <= EXACT_FLOAT_INT
+
+
+def _evaluate(code, scope, array):
+    # The expression over the whole array, or None when NumPy flagged
+    # something (division by zero, overflow) that Python raises for or
+    # treats differently, so the plain loop runs instead
+    numpy = _numpy()
+    try:
+        with numpy.errstate(divide="raise", over="raise", invalid="raise"):
+            return eval(code, scope, {"x": array})
+    except FloatingPointError:
+        return None
+
+
+def elements(source):
+    # What the plain loop iterates over: an array's elements as Python
+    # numbers, so they behave as they do without vectorize
+    return source.tolist() if is_array(source) else source
+
+
+def vector_filter(array, code, scope):
+    mask = _evaluate(code, scope, array)
+    if not is_array(mask) or mask.shape != array.shape or mask.dtype != bool:
+        return None
+    return array[mask]
+
+
+def vector_map(array, code, scope):
+    result = _evaluate(code, scope, array)
+    if not is_array(result) or result.shape != array.shape:
+        return None
+    return result
+
+
+@functools.lru_cache(maxsize=1024)
+def _compiled(expr):
+    return compile(expr, "<vector>", "eval")
+
+
+def compiled_filter(source, expr, scope, test):
+    # FILTER in compiled code: scope holds the function's variables, test
+    # is the condition as a function of x
+    array = as_array(source, expr, scope, True)
+    if array is not None:
+        result = vector_filter(array, _compiled(expr), scope)
+        if result is not None:
+            return result
+    return [x for x in elements(source) if test(x)]
+
+
+def compiled_map(source, expr, scope, fn):
+    array = as_array(source, expr, scope, True)
+    if array is not None:
+        result = vector_map(array, _compiled(expr), scope)
+        if result is not None:
+            return result
+    return [fn(x) for x in elements(source)]
@@ -1,6 +1,6 @@
 
 
-from explaincode_lang.lsp_server import explain_server
+from explaincode.lang.lsp_server import explain_server
 
 if __name__ == "__main__":
     explain_server.start_io()